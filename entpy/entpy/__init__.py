@@ -2,6 +2,7 @@ from .framework.action import Action  # noqa: F401
 from .framework.composite_index import CompositeIndex  # noqa: F401
 from .framework.decision import Decision  # noqa: F401
 from .framework.ent import Ent  # noqa: F401
+from .framework.ent_cache import CachePolicy  # noqa: F401
 from .framework.errors import (  # noqa: F401
     EntNotFoundError,
     ExecutionError,
@@ -20,9 +21,29 @@ from .framework.fields.text_field import TextField  # noqa: F401
 from .framework.fields.time_field import TimeField  # noqa: F401
 from .framework.fields.uuid_field import UuidField  # noqa: F401
 from .framework.fields.validator import FieldValidator  # noqa: F401
-from .framework.id_factory import generate_uuid  # noqa: F401
+from .framework.id_factory import (  # noqa: F401
+    configure_uuids,
+    generate_uuid,
+    generate_uuids,
+)
+from .framework.identity_map import IdentityMap, use_identity_map  # noqa: F401
+from .framework.loader import batched_loads  # noqa: F401
 from .framework.pattern import Pattern  # noqa: F401
-from .framework.privacy_rule import PrivacyRule  # noqa: F401
+from .framework.privacy_rule import (  # noqa: F401
+    PrivacyRule,
+    concurrent_privacy_evaluation,
+)
 from .framework.rules import AllowAll  # noqa: F401
 from .framework.schema import Schema  # noqa: F401
+from .framework.session import (  # noqa: F401
+    configure_sessions,
+    get_scoped_session,
+    read_your_writes,
+    session_scope,
+)
+from .framework.sharding import (  # noqa: F401
+    configure_shards,
+    get_shard_session,
+    use_shard,
+)
 from .framework.viewer_context import ViewerContext  # noqa: F401
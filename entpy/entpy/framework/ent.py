@@ -1,8 +1,10 @@
 from abc import ABC, abstractmethod
+from collections.abc import Mapping, Sequence
 from datetime import datetime
 from typing import Generic, Self, TypeVar
 from uuid import UUID
 
+from entpy.framework.errors import ValidationError
 from entpy.framework.viewer_context import ViewerContext
 
 VC = TypeVar("VC", bound=ViewerContext)
@@ -33,3 +35,33 @@ class Ent(ABC, Generic[VC]):
     @abstractmethod
     async def genx(cls, vc: VC, ent_id: UUID | str) -> Self:
         pass
+
+    @classmethod
+    async def gen_many(
+        cls, vc: VC, ent_ids: Sequence[UUID | str]
+    ) -> Mapping[UUID, Self | None]:
+        """
+        Load several Ents. The generated Ents load them in one query, this default
+        loads them one by one.
+        """
+        ents: dict[UUID, Self | None] = {}
+        for ent_id in ent_ids:
+            try:
+                ent_uuid = UUID(ent_id) if isinstance(ent_id, str) else ent_id
+            except ValueError as e:
+                raise ValidationError(f"Invalid ID format for {ent_id}") from e
+            if ent_uuid not in ents:
+                ents[ent_uuid] = await cls.gen(vc, ent_uuid)
+        return ents
+
+    @classmethod
+    async def gen_prefetch(
+        cls, vc: VC, ents: Sequence[Self], edge_names: Sequence[str]
+    ) -> None:
+        """
+        Load the given edges of all the ents at once, so that the `gen_<edge>`
+        functions of the ents return without querying the database. By default,
+        the Ent has no edge to prefetch.
+        """
+        for edge_name in edge_names:
+            raise ValidationError(f"Unknown edge for {cls.__name__}: {edge_name}")
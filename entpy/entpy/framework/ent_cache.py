@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from copy import deepcopy
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any
+from uuid import UUID
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Describes how the rows of an Ent can be cached across requests. The rows are
+    kept for at most `ttl_seconds` and the `max_size` most recently used rows are
+    kept in memory.
+    """
+
+    ttl_seconds: float
+    max_size: int = 1000
+
+
+class EntCache:
+    """
+    A process-level LRU cache of the column values of an Ent type.
+
+    We only cache the raw values, never the decisions: the privacy rules are still
+    evaluated each time an Ent is loaded from the cache.
+    """
+
+    def __init__(self, policy: CachePolicy) -> None:
+        self.policy = policy
+        self._entries: OrderedDict[UUID, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    def get(self, ent_id: UUID) -> dict[str, Any] | None:
+        entry = self._entries.get(ent_id)
+        if not entry:
+            return None
+        expires_at, values = entry
+        if expires_at < monotonic():
+            del self._entries[ent_id]
+            return None
+        self._entries.move_to_end(ent_id)
+        # Some values (e.g. JSON) are mutable, callers get their own copy
+        return deepcopy(values)
+
+    def set(self, ent_id: UUID, values: dict[str, Any]) -> None:
+        # The values come from a live model, which can still be changed in place
+        expires_at = monotonic() + self.policy.ttl_seconds
+        self._entries[ent_id] = (expires_at, deepcopy(values))
+        self._entries.move_to_end(ent_id)
+        while len(self._entries) > self.policy.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, ent_id: UUID) -> None:
+        self._entries.pop(ent_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_caches: dict[type[Any], EntCache] = {}
+
+
+def configure_ent_cache(model_class: type[Any], policy: CachePolicy | None) -> None:
+    if policy:
+        _caches[model_class] = EntCache(policy)
+    else:
+        _caches.pop(model_class, None)
+
+
+def get_ent_cache(model_class: type[Any]) -> EntCache | None:
+    return _caches.get(model_class)
+
+
+def clear_ent_caches() -> None:
+    for cache in _caches.values():
+        cache.clear()
@@ -9,6 +9,7 @@ from entpy.framework.fields.core import Field
 class EdgeField(Field):
     edge_class: type[Descriptor]
     should_generate_example: bool = True
+    reverse_name: str | None = None
 
     def __init__(self, name: str, edge_class: type[Descriptor]):
         super().__init__(name=name, actual_name=name + "_id")
@@ -26,3 +27,11 @@ class EdgeField(Field):
     def no_example(self) -> Self:
         self.should_generate_example = False
         return self
+
+    def reverse_edge(self, name: str) -> Self:
+        """
+        Set the name of the functions generated on the target Ent to load the Ents
+        pointing at it (e.g. `query_<name>` and `gen_<name>`).
+        """
+        self.reverse_name = name
+        return self
@@ -1,28 +1,112 @@
-import struct
 from datetime import datetime
+from functools import cache
 from hashlib import sha256
-from secrets import token_bytes
+from secrets import randbits, token_bytes
+from threading import Lock
 from time import time
 from uuid import UUID
 
 from entpy.framework.ent import Ent
+from entpy.framework.sharding import (
+    MAX_SHARD_ID,
+    get_current_shard,
+    get_default_shard,
+)
+
+_TIMESTAMP_MASK = (1 << 48) - 1
+_RANDOM_BITS = 48
+# In monotonic mode, the first ID of each millisecond starts in the lower half of
+# the random range, so that the following ones rarely overflow it.
+_MONOTONIC_SEED_BITS = 47
+
+
+class _MonotonicClock:
+    """Hands out strictly increasing (timestamp, random) pairs for this process."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def next(self, timestamp_ms: int, count: int) -> list[tuple[int, int]]:
+        with self._lock:
+            if timestamp_ms < self._last_ms:
+                # IDs for a date in the past (or a clock going backwards) cannot be
+                # ordered after the ones we already generated.
+                return [(timestamp_ms, randbits(_RANDOM_BITS)) for _ in range(count)]
+            if timestamp_ms > self._last_ms:
+                self._last_ms = timestamp_ms
+                self._last_random = randbits(_MONOTONIC_SEED_BITS) - 1
+            pairs = []
+            for _ in range(count):
+                self._last_random += 1
+                if self._last_random >> _RANDOM_BITS:
+                    # The millisecond is full, borrow the next one
+                    self._last_ms += 1
+                    self._last_random = randbits(_MONOTONIC_SEED_BITS)
+                pairs.append((self._last_ms, self._last_random))
+            return pairs
+
+
+_monotonic_clock: _MonotonicClock | None = None
+
+
+def configure_uuids(monotonic: bool) -> None:
+    """
+    In monotonic mode, the IDs generated by this process for the same millisecond
+    are strictly increasing instead of random, so inserts append at the end of
+    the primary key index.
+    """
+    global _monotonic_clock
+    _monotonic_clock = _MonotonicClock() if monotonic else None
 
 
 def generate_uuid(
-    entity_type: type[Ent], uuid_datetime: datetime | None = None
+    entity_type: type[Ent],
+    uuid_datetime: datetime | None = None,
+    shard_id: int | None = None,
 ) -> UUID:
     """
     Our UUIDs are composed of the following:
     6 bytes: Unix timestamp in milliseconds, big-endian
     2 bytes: Object type, first 2 bytes of SHA256 hash of table name
-    2 bytes: Reserved for future use as a shard ID, currently \x00\x00
+    2 bytes: Shard ID, defaults to the shard of `use_shard` or the default one
     6 bytes: Random bytes
     """
-    uuid_type = sha256(entity_type.__name__.encode()).digest()[:2]
+    return generate_uuids(entity_type, 1, uuid_datetime, shard_id)[0]
+
+
+def generate_uuids(
+    entity_type: type[Ent],
+    count: int,
+    uuid_datetime: datetime | None = None,
+    shard_id: int | None = None,
+) -> list[UUID]:
+    """Generate `count` UUIDs at once, see `generate_uuid` for the layout."""
     timestamp = uuid_datetime.timestamp() if uuid_datetime else time()
-    return UUID(
-        bytes=struct.pack("!Q", int(timestamp * 1000))[2:]
-        + uuid_type
-        + b"\x00\x00"
-        + token_bytes(6)
-    )
+    timestamp_ms = int(timestamp * 1000) & _TIMESTAMP_MASK
+    if shard_id is None:
+        shard_id = get_current_shard()
+        if shard_id is None:
+            shard_id = get_default_shard()
+    if not 0 <= shard_id <= MAX_SHARD_ID:
+        raise ValueError(f"Invalid shard ID {shard_id}")
+    prefix = (_get_uuid_type(entity_type) << 64) | (shard_id << 48)
+    clock = _monotonic_clock
+    if clock:
+        return [
+            UUID(int=(ms << 80) | prefix | random)
+            for ms, random in clock.next(timestamp_ms, count)
+        ]
+    prefix |= timestamp_ms << 80
+    # Read the random bytes of the whole batch at once
+    random = token_bytes(6 * count)
+    return [
+        UUID(int=prefix | int.from_bytes(random[i : i + 6]))
+        for i in range(0, 6 * count, 6)
+    ]
+
+
+@cache
+def _get_uuid_type(entity_type: type[Ent]) -> int:
+    return int.from_bytes(sha256(entity_type.__name__.encode()).digest()[:2])
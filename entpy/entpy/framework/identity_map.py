@@ -0,0 +1,112 @@
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+from uuid import UUID
+
+from entpy.framework.decision import Decision
+from entpy.framework.ent import Ent
+from entpy.framework.privacy_rule import PrivacyRule, gen_evaluate_rules
+from entpy.framework.viewer_context import ViewerContext
+
+M = TypeVar("M")
+VC = TypeVar("VC", bound=ViewerContext)
+T = TypeVar("T", bound=Ent)
+
+
+class IdentityMap:
+    """
+    A cache that lives for the duration of a request. It holds the models that
+    have been loaded, keyed by (model type, ID), and the READ privacy decisions,
+    keyed by (viewer context, Ent type, ID), so that an Ent reached through
+    several edges is only loaded and checked once.
+    """
+
+    def __init__(self) -> None:
+        self._models: dict[tuple[type[Any], UUID], Any] = {}
+        self._decisions: dict[UUID, dict[tuple[int, type[Ent]], Decision]] = {}
+        # Decisions are keyed by id(vc), we keep the VCs around so that the IDs
+        # cannot be reused while the map is alive.
+        self._vcs: dict[int, ViewerContext] = {}
+
+    def get_model(self, model_class: type[M], ent_id: UUID) -> M | None:
+        model: M | None = self._models.get((model_class, ent_id))
+        return model
+
+    def add_model(self, model_class: type[M], ent_id: UUID, model: M) -> None:
+        self._models[(model_class, ent_id)] = model
+
+    def get_decision(
+        self, vc: ViewerContext, ent_class: type[Ent], ent_id: UUID
+    ) -> Decision | None:
+        return self._decisions.get(ent_id, {}).get((id(vc), ent_class))
+
+    def set_decision(
+        self, vc: ViewerContext, ent_class: type[Ent], ent_id: UUID, decision: Decision
+    ) -> None:
+        self._vcs[id(vc)] = vc
+        self._decisions.setdefault(ent_id, {})[(id(vc), ent_class)] = decision
+
+    def invalidate(self, model_class: type[Any], ent_id: UUID) -> None:
+        self._models.pop((model_class, ent_id), None)
+        self._decisions.pop(ent_id, None)
+
+
+_identity_map: ContextVar[IdentityMap | None] = ContextVar(
+    "entpy_identity_map", default=None
+)
+
+
+@contextmanager
+def use_identity_map() -> Iterator[IdentityMap]:
+    """
+    Within this context, the Ents are loaded and their READ privacy rules are
+    evaluated at most once. Mutations invalidate the Ents they touch.
+
+    ```python
+    with use_identity_map():
+        await handle_request(vc)
+    ```
+    """
+    identity_map = IdentityMap()
+    token = _identity_map.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        _identity_map.reset(token)
+
+
+def get_identity_map() -> IdentityMap | None:
+    return _identity_map.get()
+
+
+def remember_models(models: Sequence[Any]) -> None:
+    """Add the models loaded by a query to the current identity map, if any."""
+    identity_map = _identity_map.get()
+    if identity_map:
+        for model in models:
+            if model is not None:
+                identity_map.add_model(type(model), model.id, model)
+
+
+async def gen_read_decisions(
+    vc: VC, rules: Sequence[PrivacyRule[VC, T]], ents: Sequence[T]
+) -> list[Decision]:
+    """
+    Evaluate the READ privacy rules for the ents, reusing the decisions from the
+    current identity map if there is one.
+    """
+    identity_map = _identity_map.get()
+    if not identity_map:
+        return await gen_evaluate_rules(vc, rules, ents)
+
+    decisions: list[Decision | None] = [
+        identity_map.get_decision(vc, type(ent), ent.id) for ent in ents
+    ]
+    missing = [i for i, decision in enumerate(decisions) if decision is None]
+    if missing:
+        evaluated = await gen_evaluate_rules(vc, rules, [ents[i] for i in missing])
+        for i, decision in zip(missing, evaluated, strict=True):
+            identity_map.set_decision(vc, type(ents[i]), ents[i].id, decision)
+            decisions[i] = decision
+    return [decision or Decision.DENY for decision in decisions]
@@ -0,0 +1,306 @@
+import asyncio
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import chain
+from typing import Any, TypeVar
+from uuid import UUID
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+
+from entpy.framework.ent_cache import get_ent_cache
+from entpy.framework.identity_map import get_identity_map
+
+M = TypeVar("M")
+
+# Keep the IN clauses to a reasonable size, some drivers have a hard limit on the
+# number of bound parameters per statement.
+MAX_IDS_PER_QUERY = 500
+
+_LOADER_KEY = "entpy_model_loader"
+# Set on the sessions whose transaction wrote something
+_HAS_WRITES_KEY = "entpy_has_writes"
+# The models to cache once the transaction is committed
+_PENDING_CACHE_KEY = "entpy_pending_cache"
+# The Ents written by the transaction, invalidated again once it is committed
+_WRITTEN_KEY = "entpy_written_ents"
+# Set on the sessions whose rows must not be cached, e.g. the replicas
+_NO_CACHE_KEY = "entpy_no_ent_cache"
+
+_batching_enabled: ContextVar[bool] = ContextVar(
+    "entpy_batching_enabled", default=False
+)
+
+
+@contextmanager
+def batched_loads() -> Iterator[None]:
+    """
+    Within this context, the `gen()` calls issued during the same iteration of the
+    event loop are coalesced into a single `SELECT ... WHERE id IN (...)` per Ent
+    type. Privacy rules are still evaluated for each Ent.
+
+    ```python
+    with batched_loads():
+        ents = await asyncio.gather(*[EntMyObject.gen(vc, id) for id in ids])
+    ```
+    """
+    token = _batching_enabled.set(True)
+    try:
+        yield
+    finally:
+        _batching_enabled.reset(token)
+
+
+async def gen_model_by_id(
+    session: AsyncSession, model_class: type[M], ent_id: UUID
+) -> M | None:
+    """Load a single model by ID, batching the lookup if `batched_loads` is on."""
+    identity_map = get_identity_map()
+    if identity_map:
+        model = identity_map.get_model(model_class, ent_id)
+        if model is not None:
+            return model
+
+    model = _get_cached_model(session, model_class, ent_id)
+    if model is None:
+        if not _batching_enabled.get() or (
+            # Already loaded, no need to wait for the next batch
+            identity_key(model_class, ent_id) in session.identity_map
+        ):
+            model = await session.get(model_class, ent_id)
+        else:
+            model = await _get_loader(session).gen_load(model_class, ent_id)
+        if model is not None:
+            _cache_model(session, model_class, ent_id, model)
+
+    if identity_map and model is not None:
+        identity_map.add_model(model_class, ent_id, model)
+    return model
+
+
+def invalidate_ent(model_class: type[Any], ent_id: UUID) -> None:
+    """Drop an Ent from the caches, called by the mutators after each write."""
+    identity_map = get_identity_map()
+    if identity_map:
+        identity_map.invalidate(model_class, ent_id)
+    cache = get_ent_cache(model_class)
+    if cache:
+        cache.invalidate(ent_id)
+
+
+def disable_ent_cache(session: AsyncSession) -> None:
+    """
+    Do not cache the rows read by this session. A replica can lag behind the
+    primary and would cache the rows that the primary just invalidated.
+    """
+    session.info[_NO_CACHE_KEY] = True
+
+
+class LoadedModels:
+    """
+    Records the models loaded into a session while it is not paused, so that
+    `gen_stream` only expunges the models it loaded itself, not the ones its
+    caller already had.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session.sync_session
+        self._models: list[Any] = []
+        self._paused = False
+        event.listen(self.session, "loaded_as_persistent", self._on_loaded)
+
+    def _on_loaded(self, session: Session, model: Any) -> None:
+        if not self._paused:
+            self._models.append(model)
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """The models loaded in this context (e.g. by the caller) are not recorded."""
+        self._paused = True
+        try:
+            yield
+        finally:
+            self._paused = False
+
+    def expunge(self) -> None:
+        """Remove the recorded models from the session."""
+        for model in self._models:
+            if model in self.session:
+                self.session.expunge(model)
+        self._models = []
+
+    def close(self) -> None:
+        event.remove(self.session, "loaded_as_persistent", self._on_loaded)
+
+
+def _get_cached_model(
+    session: AsyncSession, model_class: type[M], ent_id: UUID
+) -> M | None:
+    cache = get_ent_cache(model_class)
+    if not cache:
+        return None
+    key = identity_key(model_class, ent_id)
+    if key in session.identity_map:
+        # Only reuse the instance of the session if it does not need a refresh
+        model: M | None = session.identity_map.get(key)
+        state = inspect(model) if model is not None else None
+        return model if state and not state.expired else None
+    values = cache.get(ent_id)
+    if values is None:
+        return None
+    # Attach the model to the session as if it had just been loaded, without
+    # going to the database.
+    model = model_class(**values)
+    make_transient_to_detached(model)
+    session.add(model)
+    return model
+
+
+def _cache_model(
+    session: AsyncSession, model_class: type[Any], ent_id: UUID, model: Any
+) -> None:
+    cache = get_ent_cache(model_class)
+    if not cache or session.info.get(_NO_CACHE_KEY):
+        return
+    state = inspect(model)
+    if state.modified or state.unloaded:
+        # Only cache what we know is in the database
+        return
+    values = {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs}
+    if session.info.get(_HAS_WRITES_KEY):
+        # The row may have been written by this transaction, which can still be
+        # rolled back: wait for the commit, see _after_commit
+        session.info.setdefault(_PENDING_CACHE_KEY, {})[(model_class, ent_id)] = values
+    else:
+        cache.set(ent_id, values)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context: Any) -> None:
+    session.info[_HAS_WRITES_KEY] = True
+    written = session.info.setdefault(_WRITTEN_KEY, set())
+    pending = session.info.get(_PENDING_CACHE_KEY) or {}
+    for model in chain(session.new, session.dirty, session.deleted):
+        key = (type(model), getattr(model, "id", None))
+        # The values waiting for the commit are not the latest ones anymore
+        pending.pop(key, None)
+        written.add(key)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    # Until the commit, the other sessions still read the previous values of the
+    # rows, and may have cached them since the mutators invalidated them
+    for model_class, ent_id in session.info.pop(_WRITTEN_KEY, None) or ():
+        cache = get_ent_cache(model_class)
+        if cache:
+            cache.invalidate(ent_id)
+    pending = session.info.pop(_PENDING_CACHE_KEY, None) or {}
+    for (model_class, ent_id), values in pending.items():
+        cache = get_ent_cache(model_class)
+        if cache:
+            cache.set(ent_id, values)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        # Committed or rolled back, the values of a rollback are dropped here
+        session.info.pop(_PENDING_CACHE_KEY, None)
+        session.info.pop(_WRITTEN_KEY, None)
+        session.info.pop(_HAS_WRITES_KEY, None)
+
+
+def _get_loader(session: AsyncSession) -> "_ModelLoader":
+    loop = asyncio.get_running_loop()
+    loader = session.info.get(_LOADER_KEY)
+    if not isinstance(loader, _ModelLoader) or loader.loop is not loop:
+        loader = _ModelLoader(session=session, loop=loop)
+        session.info[_LOADER_KEY] = loader
+    return loader
+
+
+class _ModelLoader:
+    """
+    Collects the IDs requested during one iteration of the event loop and
+    resolves them with one query per model class.
+    """
+
+    def __init__(self, session: AsyncSession, loop: asyncio.AbstractEventLoop):
+        self.session = session
+        self.loop = loop
+        self._pending: dict[type[Any], dict[UUID, asyncio.Future[Any]]] = {}
+        # The session does not support concurrent operations, so the batches are
+        # dispatched one after the other.
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def gen_load(self, model_class: type[M], ent_id: UUID) -> M | None:
+        if not self._pending:
+            self.loop.call_soon(self._schedule_dispatch)
+        batch = self._pending.setdefault(model_class, {})
+        future = batch.get(ent_id)
+        if future is None:
+            future = self.loop.create_future()
+            batch[ent_id] = future
+        result: M | None = await future
+        return result
+
+    def _schedule_dispatch(self) -> None:
+        pending = self._pending
+        self._pending = {}
+        task = self.loop.create_task(self._gen_dispatch(pending))
+        # Keep a reference to the task until it is done so it is not garbage
+        # collected while the callers are waiting on it.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _gen_dispatch(
+        self, pending: dict[type[Any], dict[UUID, asyncio.Future[Any]]]
+    ) -> None:
+        async with self._lock:
+            for model_class, batch in pending.items():
+                try:
+                    models = await gen_models_by_ids(
+                        self.session, model_class, list(batch.keys())
+                    )
+                except Exception as e:
+                    for future in batch.values():
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for ent_id, future in batch.items():
+                    if not future.done():
+                        future.set_result(models.get(ent_id))
+
+
+async def gen_models_by_ids(
+    session: AsyncSession, model_class: type[M], ent_ids: list[UUID]
+) -> dict[UUID, M]:
+    """Load the models for the given IDs, in chunks of `MAX_IDS_PER_QUERY`."""
+    models: dict[UUID, M] = {}
+    identity_map = get_identity_map()
+    for ent_id in ent_ids:
+        model = identity_map.get_model(model_class, ent_id) if identity_map else None
+        if model is None:
+            model = _get_cached_model(session, model_class, ent_id)
+            if identity_map and model is not None:
+                identity_map.add_model(model_class, ent_id, model)
+        if model is not None:
+            models[ent_id] = model
+    ent_ids = [ent_id for ent_id in ent_ids if ent_id not in models]
+
+    column: Any = model_class.id  # type: ignore[attr-defined]
+    for i in range(0, len(ent_ids), MAX_IDS_PER_QUERY):
+        chunk = ent_ids[i : i + MAX_IDS_PER_QUERY]
+        result = await session.execute(select(model_class).where(column.in_(chunk)))
+        for model in result.scalars():
+            ent_id = model.id  # type: ignore[attr-defined]
+            models[ent_id] = model
+            _cache_model(session, model_class, ent_id, model)
+            if identity_map:
+                identity_map.add_model(model_class, ent_id, model)
+    return models
@@ -0,0 +1,190 @@
+import base64
+import binascii
+import heapq
+import json
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from enum import Enum
+from functools import cmp_to_key
+from typing import Any, Generic, TypeVar
+from uuid import UUID
+
+from sqlalchemy import Dialect, and_, false, or_
+from sqlalchemy.orm import QueryableAttribute
+from sqlalchemy.sql.expression import ColumnElement
+
+from entpy.framework.errors import ValidationError
+
+T = TypeVar("T")
+
+# gen_filled doubles the number of rows it fetches until it reaches this size
+MAX_FILL_BATCH_SIZE = 1000
+
+# A column of the keyset and whether it is sorted in descending order
+KeysetColumn = tuple[ColumnElement[Any] | QueryableAttribute[Any], bool]
+
+
+@dataclass
+class Page(Generic[T]):
+    """
+    A page of Ents returned by `gen_page`.
+
+    The cursors point at the first and last rows of the page, even if those rows
+    were filtered out by the privacy rules, so that the next page starts right
+    after them.
+    """
+
+    ents: list[T]
+    start_cursor: str | None
+    end_cursor: str | None
+    has_next: bool
+    has_previous: bool
+
+
+@dataclass
+class FilledPage(Generic[T]):
+    """
+    The result of `gen_filled`: the visible Ents, and how many rows had to be
+    read to find them. A large gap between the two means that the privacy rules
+    filter out most of the rows of the query.
+    """
+
+    ents: list[T]
+    scanned: int
+    has_more: bool
+    # Pass it to `offset()` to load the next page
+    next_offset: int
+
+    @property
+    def visible(self) -> int:
+        return len(self.ents)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Build an opaque cursor from the keyset values of a row."""
+    payload = json.dumps([_to_json(value) for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, keyset: Sequence[KeysetColumn]) -> list[Any]:
+    """Read the keyset values of a cursor built by `encode_cursor`."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValidationError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != len(keyset):
+        raise ValidationError(f"Invalid cursor: {cursor}")
+    try:
+        return [
+            _from_json(value, column.expression.type.python_type)
+            for value, (column, _) in zip(values, keyset, strict=True)
+        ]
+    except (TypeError, ValueError) as e:
+        raise ValidationError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_condition(
+    keyset: Sequence[KeysetColumn],
+    values: Sequence[Any],
+    forward: bool,
+    nulls_are_largest: bool,
+) -> ColumnElement[bool]:
+    """
+    Build the condition that selects the rows after (or before, if `forward` is
+    False) the given keyset values, in the order of the keyset:
+    `c1 > v1 OR (c1 = v1 AND c2 > v2) OR ...`
+    The NULLs are placed where the database sorts them, see `nulls_sort_as_largest`.
+    """
+    conditions: list[ColumnElement[bool]] = []
+    for i, (column, descending) in enumerate(keyset):
+        after = _sorts_after(
+            column, values[i], descending != forward, nulls_are_largest
+        )
+        # `column == None` is rendered as `column IS NULL`
+        equals = [keyset[j][0] == values[j] for j in range(i)]
+        conditions.append(and_(*equals, after))
+    return or_(*conditions)
+
+
+def _sorts_after(
+    column: ColumnElement[Any] | QueryableAttribute[Any],
+    value: Any,
+    ascending: bool,
+    nulls_are_largest: bool,
+) -> ColumnElement[bool]:
+    """The values of the column that come after `value` in the given order."""
+    nulls_come_last = nulls_are_largest == ascending
+    if value is None:
+        return false() if nulls_come_last else column.is_not(None)
+    after = column > value if ascending else column < value
+    return or_(after, column.is_(None)) if nulls_come_last else after
+
+
+def merge_keyset_rows(
+    row_lists: Sequence[Sequence[Sequence[Any]]],
+    keyset: Sequence[KeysetColumn],
+    nulls_are_largest: bool,
+) -> Iterator[Sequence[Any]]:
+    """
+    Merge lists of rows that are each sorted by the keyset. The first column of
+    each row is the Ent, the next ones are the values of the keyset. The NULLs
+    are sorted like the database does, see `nulls_sort_as_largest`.
+
+    The values are compared in Python: the strings are sorted by code point,
+    which may not be the order of the collation of the database.
+    """
+
+    def compare(row: Sequence[Any], other: Sequence[Any]) -> int:
+        for (_, descending), value, other_value in zip(
+            keyset, row[1:], other[1:], strict=True
+        ):
+            if value == other_value:
+                continue
+            if value is None or other_value is None:
+                result = 1 if (value is None) == nulls_are_largest else -1
+            else:
+                result = -1 if value < other_value else 1
+            return -result if descending else result
+        return 0
+
+    return heapq.merge(*row_lists, key=cmp_to_key(compare))
+
+
+def nulls_sort_as_largest(dialect: Dialect) -> bool:
+    """
+    PostgreSQL and Oracle sort the NULLs after the other values in ascending
+    order, the other databases sort them first.
+    """
+    return dialect.name in ("postgresql", "oracle")
+
+
+def supports_window_functions(dialect: Dialect) -> bool:
+    """`count(*) OVER ()` needs SQLite 3.25, MySQL 8 or MariaDB 10.2."""
+    version = dialect.server_version_info or ()
+    if dialect.name == "sqlite":
+        return version >= (3, 25)
+    if dialect.name in ("mysql", "mariadb"):
+        is_mariadb = getattr(dialect, "is_mariadb", False)
+        return version >= ((10, 2) if is_mariadb else (8,))
+    return True
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return value.hex
+    if isinstance(value, datetime | date | time):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _from_json(value: Any, python_type: type[Any]) -> Any:
+    if value is None:
+        return None
+    if issubclass(python_type, UUID):
+        return UUID(value)
+    if issubclass(python_type, datetime | date | time):
+        return python_type.fromisoformat(value)
+    return python_type(value)
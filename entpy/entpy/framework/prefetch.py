@@ -0,0 +1,23 @@
+from collections.abc import Sequence
+from typing import Any
+
+from entpy.framework.ent import Ent
+from entpy.framework.viewer_context import ViewerContext
+
+
+async def gen_prefetch(
+    vc: ViewerContext, ents: Sequence[Ent[Any] | None], edge_names: Sequence[str]
+) -> None:
+    """
+    Prefetch the edges of a list of Ents, which can be of different types (e.g.
+    the results of a pattern query). Each type loads each of its edges with one
+    query.
+    """
+    if not edge_names:
+        return
+    ents_by_class: dict[type[Ent[Any]], list[Ent[Any]]] = {}
+    for ent in ents:
+        if ent:
+            ents_by_class.setdefault(type(ent), []).append(ent)
+    for ent_class, class_ents in ents_by_class.items():
+        await ent_class.gen_prefetch(vc, class_ents, edge_names)
@@ -1,15 +1,104 @@
+import asyncio
 from abc import ABC, abstractmethod
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Generic, TypeVar
 
 from entpy.framework.decision import Decision
 from entpy.framework.ent import Ent
+from entpy.framework.errors import ExecutionError
 from entpy.framework.viewer_context import ViewerContext
 
 VC = TypeVar("VC", bound=ViewerContext)
 T = TypeVar("T", bound=Ent)
 
+_max_concurrency: ContextVar[int] = ContextVar(
+    "entpy_privacy_max_concurrency", default=1
+)
+
+
+@contextmanager
+def concurrent_privacy_evaluation(max_concurrency: int) -> Iterator[None]:
+    """
+    Within this context, `gen_evaluate_many` runs up to `max_concurrency` calls
+    to `gen_evaluate` at the same time instead of one after the other.
+
+    Only use it with rules that can safely run concurrently: an `AsyncSession`
+    does not support concurrent operations.
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+    token = _max_concurrency.set(max_concurrency)
+    try:
+        yield
+    finally:
+        _max_concurrency.reset(token)
+
 
 class PrivacyRule(ABC, Generic[VC, T]):
     @abstractmethod
     async def gen_evaluate(self, vc: VC, ent: T) -> Decision:
         pass
+
+    async def gen_evaluate_many(self, vc: VC, ents: Sequence[T]) -> list[Decision]:
+        """
+        Evaluate the rule for a list of ents and return one decision per ent, in
+        the same order.
+
+        By default, we call `gen_evaluate` for each ent. Override this function if
+        the rule can be evaluated for all the ents at once, for example with a
+        single `IN` query instead of one query per ent.
+
+        Within `concurrent_privacy_evaluation`, the calls to `gen_evaluate` run
+        concurrently, up to the configured limit. The rules of the Ents they
+        load still run one at a time.
+        """
+        max_concurrency = _max_concurrency.get()
+        # The caller only opted in for this rule: the Ents that the rule loads
+        # evaluate their own rules one at a time
+        token = _max_concurrency.set(1)
+        try:
+            if max_concurrency == 1 or len(ents) <= 1:
+                return [await self.gen_evaluate(vc, ent) for ent in ents]
+
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def gen_decision(ent: T) -> Decision:
+                async with semaphore:
+                    return await self.gen_evaluate(vc, ent)
+
+            # gather keeps the order of the ents
+            return list(await asyncio.gather(*[gen_decision(ent) for ent in ents]))
+        finally:
+            _max_concurrency.reset(token)
+
+
+async def gen_evaluate_rules(
+    vc: VC, rules: Sequence[PrivacyRule[VC, T]], ents: Sequence[T]
+) -> list[Decision]:
+    """
+    Evaluate the rules for all the ents, one rule at a time.
+
+    For each ent, the first rule that does not PASS decides. If all the rules
+    PASS, we default to denying.
+    """
+    decisions = [Decision.DENY] * len(ents)
+    pending = list(range(len(ents)))
+    for rule in rules:
+        if not pending:
+            break
+        rule_decisions = await rule.gen_evaluate_many(vc, [ents[i] for i in pending])
+        if len(rule_decisions) != len(pending):
+            raise ExecutionError(
+                f"{rule.__class__.__name__} returned {len(rule_decisions)} "
+                + f"decisions for {len(pending)} ents"
+            )
+        still_pending = []
+        for i, decision in zip(pending, rule_decisions, strict=True):
+            if decision == Decision.PASS:
+                still_pending.append(i)
+            else:
+                decisions[i] = decision
+        pending = still_pending
+    return decisions
@@ -0,0 +1,65 @@
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any
+
+from entpy.framework.descriptor import Descriptor
+from entpy.framework.ent import Ent
+from entpy.framework.fields.core import Field
+from entpy.framework.fields.validator import FieldValidator
+
+
+@dataclass(frozen=True)
+class DescriptorMetadata:
+    """
+    Everything we need to know about a descriptor at runtime, computed once per
+    process so that the lookups don't have to rebuild and sort the fields.
+    """
+
+    descriptor: Descriptor
+    fields: Mapping[str, Field]
+    validators: Mapping[str, tuple[FieldValidator[Any], ...]]
+
+    def get_field(self, field_name: str) -> Field:
+        field = self.fields.get(field_name)
+        if not field:
+            raise ValueError(f"Unknown field: {field_name}")
+        return field
+
+
+_metadata: dict[type[Descriptor], DescriptorMetadata] = {}
+_descriptor_classes: dict[type[Ent], type[Descriptor]] = {}
+
+
+def get_descriptor_metadata(descriptor_class: type[Descriptor]) -> DescriptorMetadata:
+    metadata = _metadata.get(descriptor_class)
+    if metadata is None:
+        metadata = _build_metadata(descriptor_class)
+        _metadata[descriptor_class] = metadata
+    return metadata
+
+
+def register_ent(ent_class: type[Ent], descriptor_class: type[Descriptor]) -> None:
+    _descriptor_classes[ent_class] = descriptor_class
+
+
+def get_descriptor_class(ent_class: type[Ent]) -> type[Descriptor]:
+    descriptor_class = _descriptor_classes.get(ent_class)
+    if not descriptor_class:
+        raise ValueError(f"No descriptor registered for {ent_class.__name__}")
+    return descriptor_class
+
+
+def _build_metadata(descriptor_class: type[Descriptor]) -> DescriptorMetadata:
+    descriptor = descriptor_class()
+    fields = {field.name: field for field in descriptor.get_all_fields()}
+    return DescriptorMetadata(
+        descriptor=descriptor,
+        fields=MappingProxyType(fields),
+        validators=MappingProxyType(
+            {
+                name: tuple(field._validators)  # noqa: SLF001
+                for name, field in fields.items()
+            }
+        ),
+    )
@@ -3,6 +3,7 @@ from abc import ABC, abstractmethod
 from entpy import Action, PrivacyRule
 from entpy.framework.composite_index import CompositeIndex
 from entpy.framework.descriptor import Descriptor
+from entpy.framework.ent_cache import CachePolicy
 
 
 class Schema(Descriptor, ABC):
@@ -13,5 +14,15 @@ class Schema(Descriptor, ABC):
     def get_composite_indexes(self) -> list[CompositeIndex]:
         return []
 
+    def get_cache_policy(self) -> CachePolicy | None:
+        """Return a policy to cache the rows of this Ent across requests."""
+        return None
+
     def is_immutable(self) -> bool:
         return False
+
+    def has_dynamic_privacy_rules(self) -> bool:
+        """By default, the privacy rules of each action are computed once and
+        reused for the lifetime of the process. Return `True` if
+        `get_privacy_rules` can return different rules over time."""
+        return False
@@ -0,0 +1,152 @@
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.attributes import instance_state
+
+from entpy.framework.errors import EntNotFoundError, ExecutionError
+from entpy.framework.identity_map import use_identity_map
+from entpy.framework.loader import disable_ent_cache
+
+M = TypeVar("M")
+S = TypeVar("S")
+
+
+_session_factory: async_sessionmaker[AsyncSession] | None = None
+
+_scoped_session: ContextVar[AsyncSession | None] = ContextVar(
+    "entpy_scoped_session", default=None
+)
+
+
+def configure_sessions(session_factory: async_sessionmaker[AsyncSession]) -> None:
+    """
+    Declare how `session_scope` creates its sessions. They take their connections
+    from the pool of the engine of the factory.
+    """
+    global _session_factory
+    _session_factory = session_factory
+
+
+@asynccontextmanager
+async def session_scope(
+    commit: bool = True, identity_map: bool = True
+) -> AsyncIterator[AsyncSession]:
+    """
+    Open a session for a request or a task. Within the context, the session
+    getter can return it with `get_scoped_session()`. At the end, the session is
+    committed (unless an error was raised or `commit` is False) and closed, which
+    returns its connection to the pool. The identity map (unless `identity_map`
+    is False) and the read-your-writes pin of the scope end with it.
+
+    ```python
+    async with session_scope():
+        await handle_request(vc)
+    ```
+    """
+    if _session_factory is None:
+        raise ExecutionError("Sessions are not configured, call configure_sessions()")
+    session = _session_factory()
+    token = _scoped_session.set(session)
+    try:
+        with ExitStack() as stack:
+            if identity_map:
+                stack.enter_context(use_identity_map())
+            stack.enter_context(read_your_writes())
+            yield session
+        if commit:
+            await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        _scoped_session.reset(token)
+        await session.close()
+
+
+def get_scoped_session() -> AsyncSession:
+    """The session of the current `session_scope`."""
+    session = _scoped_session.get()
+    if session is None:
+        raise ExecutionError("No session, use `async with session_scope():`")
+    return session
+
+
+class _PrimaryPin:
+    """Shared by the tasks of a request, so a write in any of them pins the others."""
+
+    def __init__(self) -> None:
+        self.pinned = False
+
+
+_primary_pin: ContextVar[_PrimaryPin | None] = ContextVar(
+    "entpy_primary_pin", default=None
+)
+
+
+@contextmanager
+def read_your_writes() -> Iterator[None]:
+    """
+    Scope the reads of a request: they go to the replica until something is
+    written, then to the primary until the end of the context, so that the
+    request sees its own writes.
+
+    ```python
+    with read_your_writes():
+        await handle_request(vc)
+    ```
+    """
+    token = _primary_pin.set(_PrimaryPin())
+    try:
+        yield
+    finally:
+        _primary_pin.reset(token)
+
+
+def pin_to_primary() -> None:
+    """
+    Send the following reads of the current `read_your_writes` context to the
+    primary. Outside of one, nothing is pinned: there is no end to the pin, it
+    would send all the following reads of the task to the primary.
+    """
+    pin = _primary_pin.get()
+    if pin is not None:
+        pin.pinned = True
+
+
+def is_pinned_to_primary() -> bool:
+    pin = _primary_pin.get()
+    return bool(pin and pin.pinned)
+
+
+def get_read_session(
+    read_session_getter: Callable[[], S], write_session_getter: Callable[[], S]
+) -> S:
+    """
+    The read session, unless the current context has written something. The rows
+    read from a replica are not cached, it may not have received the last writes.
+    """
+    if is_pinned_to_primary():
+        return write_session_getter()
+    session = read_session_getter()
+    if isinstance(session, AsyncSession) and session is not write_session_getter():
+        disable_ent_cache(session)
+    return session
+
+
+async def gen_attach(session: AsyncSession, model: M) -> M:
+    """
+    Return the model as an instance of the given session. A model loaded by
+    another session (e.g. from a lagging replica) may be stale, so the current
+    row is loaded from the given session instead: the changes are compared with
+    it, not with the stale values.
+    """
+    if object_session(model) is session.sync_session:
+        return model
+    attached = await session.get(type(model), instance_state(model).identity)
+    if attached is None:
+        raise EntNotFoundError(f"{type(model).__name__} not found in this session")
+    return attached
@@ -0,0 +1,127 @@
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TypeVar
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from entpy.framework.errors import ExecutionError
+
+S = TypeVar("S")
+
+# The shard ID is stored on 2 bytes of the UUIDs
+MAX_SHARD_ID = 0xFFFF
+
+_current_shard: ContextVar[int | None] = ContextVar("entpy_current_shard", default=None)
+
+
+class _Shards:
+    def __init__(
+        self,
+        session_getters: Mapping[int, Callable[[], AsyncSession]],
+        default_shard: int,
+    ) -> None:
+        self.session_getters = dict(session_getters)
+        self.default_shard = default_shard
+
+
+_shards: _Shards | None = None
+
+
+def configure_shards(
+    session_getters: Mapping[int, Callable[[], AsyncSession]],
+    default_shard: int | None = None,
+) -> None:
+    """
+    Declare the session getter of each shard. The session getter passed to the
+    gencode should then return `get_shard_session()`, which picks the session of
+    the shard the Ents being read or written live on.
+    """
+    global _shards
+    if not session_getters:
+        raise ValueError("At least one shard is needed")
+    for shard_id in session_getters:
+        _check_shard_id(shard_id)
+    default_shard = min(session_getters) if default_shard is None else default_shard
+    if default_shard not in session_getters:
+        raise ValueError(f"Unknown default shard {default_shard}")
+    _shards = _Shards(session_getters=session_getters, default_shard=default_shard)
+
+
+def reset_shards() -> None:
+    global _shards
+    _shards = None
+
+
+def get_shard_ids() -> list[int]:
+    """The configured shards, or an empty list if sharding is not configured."""
+    return sorted(_shards.session_getters) if _shards else []
+
+
+def get_current_shard() -> int | None:
+    return _current_shard.get()
+
+
+def get_default_shard() -> int:
+    """The shard used outside of `use_shard`, 0 if sharding is not configured."""
+    return _shards.default_shard if _shards else 0
+
+
+@contextmanager
+def use_shard(shard_id: int) -> Iterator[None]:
+    """
+    Within this context, the sessions are the ones of the given shard and the new
+    IDs are generated for that shard.
+
+    ```python
+    with use_shard(tenant.shard_id):
+        ent = await EntMyObjectMutator.create(vc, ...).gen_savex()
+    ```
+    """
+    _check_shard_id(shard_id)
+    token = _current_shard.set(shard_id)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def get_shard_session() -> AsyncSession:
+    """Return the session of the current shard, or of the default shard."""
+    if not _shards:
+        raise ExecutionError("Sharding is not configured, call configure_shards()")
+    shard_id = _current_shard.get()
+    if shard_id is None:
+        shard_id = get_default_shard()
+    session_getter = _shards.session_getters.get(shard_id)
+    if not session_getter:
+        raise ExecutionError(f"Unknown shard {shard_id}")
+    return session_getter()
+
+
+def get_shard_id(ent_id: UUID) -> int:
+    """
+    The shard an Ent lives on, read from bytes 8 to 10 of its ID. Without
+    `configure_shards`, everything lives on shard 0, whatever the ID.
+    """
+    return int.from_bytes(ent_id.bytes[8:10]) if _shards else 0
+
+
+def get_session_for_id(session_getter: Callable[[], S], ent_id: UUID) -> S:
+    """Call the session getter within the shard of the given ID."""
+    with use_shard(get_shard_id(ent_id)):
+        return session_getter()
+
+
+def group_by_shard(ent_ids: Iterable[UUID]) -> dict[int, list[UUID]]:
+    """Group IDs by shard, keeping their order within each shard."""
+    groups: dict[int, list[UUID]] = {}
+    for ent_id in ent_ids:
+        groups.setdefault(get_shard_id(ent_id), []).append(ent_id)
+    return groups
+
+
+def _check_shard_id(shard_id: int) -> None:
+    if not 0 <= shard_id <= MAX_SHARD_ID:
+        raise ValueError(f"Invalid shard ID {shard_id}")
@@ -1,10 +1,16 @@
 from entpy import EdgeField, Schema, TimeField
 from entpy.gencode.generated_content import GeneratedContent
+from entpy.gencode.reverse_edge_generator import ReverseEdge
+from entpy.gencode.reverse_edge_generator import generate as generate_reverse_edges
 from entpy.gencode.utils import get_description, to_snake_case
 
 
 def generate(
-    schema: Schema, base_name: str, session_getter_fn_name: str, vc_name: str
+    schema: Schema,
+    base_name: str,
+    session_getter_fn_name: str,
+    vc_name: str,
+    reverse_edges: list[ReverseEdge] | None = None,
 ) -> GeneratedContent:
     extends = ",".join(
         [
@@ -15,16 +21,34 @@ def generate(
     )
 
     accessors = _generate_accessors(schema)
+    prefetch = _generate_prefetch(schema=schema, base_name=base_name, vc_name=vc_name)
+    reverse_edges_content = generate_reverse_edges(
+        reverse_edges=reverse_edges or [], base_name=base_name, vc_name=vc_name
+    )
 
     unique_gens = _generate_unique_gens(
-        schema=schema, base_name=base_name, vc_name=vc_name
+        schema=schema,
+        base_name=base_name,
+        session_getter_fn_name=session_getter_fn_name,
+        vc_name=vc_name,
     )
 
-    imports = []
+    imports = [
+        "from collections.abc import Sequence",
+        "from entpy.framework.loader import gen_model_by_id, gen_models_by_ids",
+        "from entpy.framework.identity_map import gen_read_decisions",
+        "from entpy.framework.identity_map import remember_models",
+        "from entpy.framework.sharding import get_session_for_id, group_by_shard",
+    ]
 
     if unique_gens:
         # only add this import if we have unique gens :)
-        imports += ["from sqlalchemy import select"]
+        imports += [
+            "from sqlalchemy import select",
+            "from entpy.framework.loader import MAX_IDS_PER_QUERY",
+        ]
+    if any(index.unique for index in schema.get_composite_indexes()):
+        imports += ["from sqlalchemy import tuple_"]
 
     for pattern in schema.get_patterns():
         pattern_base_name = pattern.__class__.__name__.replace("Pattern", "")
@@ -33,8 +57,9 @@ def generate(
         imports.append(f"from {module_name} import {class_name}")
 
     return GeneratedContent(
-        imports=imports + accessors.imports,
-        type_checking_imports=accessors.type_checking_imports,
+        imports=imports + accessors.imports + reverse_edges_content.imports,
+        type_checking_imports=accessors.type_checking_imports
+        + reverse_edges_content.type_checking_imports,
         code=f"""
 class {base_name}({extends}):{get_description(schema)}
     vc: {vc_name}
@@ -43,6 +68,8 @@ class {base_name}({extends}):{get_description(schema)}
     def __init__(self, vc: {vc_name}, model: {base_name}Model) -> None:
         self.vc = vc
         self.model = model
+        # The edges loaded by gen_prefetch, by edge name
+        self._prefetched_edges: dict[str, Ent[Any]] = {{}}
 
     @property
     def id(self) -> UUID:
@@ -57,16 +84,7 @@ class {base_name}({extends}):{get_description(schema)}
         return self.model.updated_at
 
 {accessors.code}
-
-    async def _gen_evaluate_privacy(self, vc: {vc_name}, action: Action) -> Decision:
-        rules = {base_name}Schema().get_privacy_rules(action)
-        for rule in rules:
-            decision = await rule.gen_evaluate(vc, self)
-            # If we get an ALLOW or DENY, we return instantly. Else, we keep going.
-            if decision != Decision.PASS:
-                return decision
-        # We default to denying
-        return Decision.DENY
+{reverse_edges_content.code}
 
     @classmethod
     async def genx(
@@ -88,21 +106,71 @@ class {base_name}({extends}):{get_description(schema)}
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {{ent_id}}") from e
 
-        session = {session_getter_fn_name}()
-        model = await session.get({base_name}Model, ent_id)
+        session = get_session_for_id({session_getter_fn_name}, ent_id)
+        model = await gen_model_by_id(session, {base_name}Model, ent_id)
         return await cls._gen_from_model(vc, model)  # noqa: SLF001
 
+    @classmethod
+    async def genx_many(
+        cls, vc: {vc_name}, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, {base_name}]:
+        ents = await cls.gen_many(vc, ent_ids)
+        missing = [str(ent_id) for ent_id, ent in ents.items() if not ent]
+        if missing:
+            ids = ", ".join(missing)
+            raise EntNotFoundError(f"No {base_name} found for IDs {{ids}}")
+        return {{ent_id: ent for ent_id, ent in ents.items() if ent}}
+
+    @classmethod
+    async def gen_many(
+        cls, vc: {vc_name}, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, {base_name} | None]:
+        # Convert str to UUID if needed
+        uuids: list[UUID] = []
+        for ent_id in ent_ids:
+            try:
+                uuids.append(UUID(ent_id) if isinstance(ent_id, str) else ent_id)
+            except ValueError as e:
+                raise ValidationError(f"Invalid ID format for {{ent_id}}") from e
+        # Remove the duplicates but keep the order of the IDs
+        uuids = list(dict.fromkeys(uuids))
+
+        models: dict[UUID, {base_name}Model] = {{}}
+        for shard_ids in group_by_shard(uuids).values():
+            session = get_session_for_id({session_getter_fn_name}, shard_ids[0])
+            models |= await gen_models_by_ids(session, {base_name}Model, shard_ids)
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(ent_id) for ent_id in uuids]
+        )
+        return dict(zip(uuids, ents, strict=True))
+
     {unique_gens}
 
+{prefetch}
+
     @classmethod
     async def _gen_from_model(
         cls, vc: {vc_name}, model: {base_name}Model | None
     ) -> {base_name} | None:
         if not model:
             return None
-        ent = {base_name}(vc=vc, model=model)
-        decision = await ent._gen_evaluate_privacy(vc=vc, action=Action.READ)
-        return ent if decision == Decision.ALLOW else None
+        ents = await cls._gen_from_models(vc, [model])
+        return ents[0]
+
+    @classmethod
+    async def _gen_from_models(
+        cls, vc: {vc_name}, models: Sequence[{base_name}Model | None]
+    ) -> list[{base_name} | None]:
+        remember_models(models)
+        ents = [{base_name}(vc=vc, model=model) if model else None for model in models]
+        rules = _get_privacy_rules(Action.READ)
+        decisions = iter(
+            await gen_read_decisions(vc, rules, [ent for ent in ents if ent])
+        )
+        # There is one decision for each loaded ent, in the same order
+        return [
+            ent if ent and next(decisions) == Decision.ALLOW else None for ent in ents
+        ]
 
     @classmethod
     async def _genx_from_model(
@@ -145,6 +213,7 @@ def _generate_accessors(schema: Schema) -> GeneratedContent:
         # If the field is an edge, we want to generate a utility function to
         # load the edge directly
         if isinstance(field, EdgeField):
+            load = ""
             if field.edge_class != schema.__class__:
                 module = "." + to_snake_case(
                     field.edge_class.__name__.replace("Schema", "").replace(
@@ -163,7 +232,10 @@ def _generate_accessors(schema: Schema) -> GeneratedContent:
             if field.nullable:
                 accessors_code += f"""
     async def gen_{field.original_name}(self) -> "{field.get_edge_type()}" | None:
-        {load}if self.model.{field.name}:
+        {load}prefetched = self._prefetched_edges.get("{field.original_name}")
+        if isinstance(prefetched, {field.get_edge_type()}) and prefetched.id == self.model.{field.name}:
+            return prefetched
+        if self.model.{field.name}:
             return await {field.get_edge_type()}.gen(self.vc, self.model.{field.name})
         return None
 
@@ -171,7 +243,10 @@ def _generate_accessors(schema: Schema) -> GeneratedContent:
             else:
                 accessors_code += f"""
     async def gen_{field.original_name}(self) -> {field.get_edge_type()}:
-        {load}return await {field.get_edge_type()}.genx(self.vc, self.model.{field.name})
+        {load}prefetched = self._prefetched_edges.get("{field.original_name}")
+        if isinstance(prefetched, {field.get_edge_type()}) and prefetched.id == self.model.{field.name}:
+            return prefetched
+        return await {field.get_edge_type()}.genx(self.vc, self.model.{field.name})
 
 """  # noqa: E501
     return GeneratedContent(
@@ -179,14 +254,51 @@ def _generate_accessors(schema: Schema) -> GeneratedContent:
     )
 
 
-def _generate_unique_gens(schema: Schema, base_name: str, vc_name: str) -> str:
+def _generate_prefetch(schema: Schema, base_name: str, vc_name: str) -> str:
+    edges = ""
+    for field in schema.get_all_fields():
+        if not isinstance(field, EdgeField):
+            continue
+        load = ""
+        if field.edge_class != schema.__class__:
+            module = "." + to_snake_case(
+                field.edge_class.__name__.replace("Schema", "").replace("Pattern", "")
+            )
+            load = f"from {module} import {field.get_edge_type()}\n                "
+        edges += f"""            if edge_name == "{field.original_name}":
+                {load}{field.original_name}_targets = await {field.get_edge_type()}.gen_many(
+                    vc, [ent.model.{field.name} for ent in ents if ent.model.{field.name}]
+                )
+                for ent in ents:
+                    {field.original_name}_target = (
+                        {field.original_name}_targets.get(ent.model.{field.name})
+                        if ent.model.{field.name}
+                        else None
+                    )
+                    if {field.original_name}_target:
+                        ent._prefetched_edges[edge_name] = {field.original_name}_target  # noqa: SLF001
+                continue
+"""  # noqa: E501
+    return f"""
+    @classmethod
+    async def gen_prefetch(
+        cls, vc: {vc_name}, ents: Sequence[{base_name}], edge_names: Sequence[str]
+    ) -> None:
+        for edge_name in edge_names:
+{edges}            raise ValidationError(f"Unknown edge for {base_name}: {{edge_name}}")
+"""
+
+
+def _generate_unique_gens(
+    schema: Schema, base_name: str, session_getter_fn_name: str, vc_name: str
+) -> str:
     unique_gens = ""
     for field in schema.get_all_fields():
         if field.is_unique:
             unique_gens += f"""
     @classmethod
     async def gen_from_{field.name}(cls, vc: {vc_name}, {field.name}: {field.get_python_type()}) -> {base_name} | None:
-        session = get_session()
+        session = {session_getter_fn_name}()
         result = await session.execute(
             select({base_name}Model)
             .where({base_name}Model.{field.name} == {field.name})
@@ -198,7 +310,122 @@ def _generate_unique_gens(schema: Schema, base_name: str, vc_name: str) -> str:
     async def genx_from_{field.name}(cls, vc: {vc_name}, {field.name}: {field.get_python_type()}) -> {base_name}:
         result = await cls.gen_from_{field.name}(vc, {field.name})
         if not result:
-            raise EntNotFoundError(f"No EntTestObject found for {field.name} {{{field.name}}}")
+            raise EntNotFoundError(f"No {base_name} found for {field.name} {{{field.name}}}")
         return result
+
+    @classmethod
+    async def gen_many_from_{field.name}(
+        cls, vc: {vc_name}, values: Sequence[{field.get_python_type()}]
+    ) -> dict[{field.get_python_type()}, {base_name} | None]:
+        \"\"\"Load the {base_name} for each {field.name}, in chunks of `MAX_IDS_PER_QUERY`.\"\"\"
+        # Remove the duplicates but keep the order of the values
+        keys = list(dict.fromkeys(values))
+        session = {session_getter_fn_name}()
+        models: dict[{field.get_python_type()}, {base_name}Model] = {{}}
+        for i in range(0, len(keys), MAX_IDS_PER_QUERY):
+            chunk = keys[i : i + MAX_IDS_PER_QUERY]
+            result = await session.execute(
+                select({base_name}Model).where({base_name}Model.{field.name}.in_(chunk))
+            )
+            for model in result.scalars():
+                models[model.{field.name}] = model
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(key) for key in keys]
+        )
+        return dict(zip(keys, ents, strict=True))
+
+    @classmethod
+    async def genx_many_from_{field.name}(
+        cls, vc: {vc_name}, values: Sequence[{field.get_python_type()}]
+    ) -> dict[{field.get_python_type()}, {base_name}]:
+        ents = await cls.gen_many_from_{field.name}(vc, values)
+        missing = [str(key) for key, ent in ents.items() if not ent]
+        if missing:
+            keys = ", ".join(missing)
+            raise EntNotFoundError(f"No {base_name} found for {field.name} {{keys}}")
+        return {{key: ent for key, ent in ents.items() if ent}}
+"""  # noqa: E501
+
+    fields_by_name = {field.name: field for field in schema.get_all_fields()}
+    for index in schema.get_composite_indexes():
+        if not index.unique:
+            continue
+        for field_name in index.field_names:
+            if field_name not in fields_by_name:
+                raise ValueError(f"Unknown field {field_name} in index {index.name}")
+        fields = [fields_by_name[field_name] for field_name in index.field_names]
+        suffix = "_and_".join(index.field_names)
+        arguments = ", ".join(
+            [f"{field.name}: {field.get_python_type()}" for field in fields]
+        )
+        conditions = ",\n".join(
+            [
+                f"                {base_name}Model.{field.name} == {field.name}"
+                for field in fields
+            ]
+        )
+        key_type = (
+            f"tuple[{', '.join([field.get_python_type() for field in fields])}]"
+        )
+        argument_names = ", ".join([field.name for field in fields])
+        key_message = " ".join(
+            [f"{field.name} {{{field.name}}}" for field in fields]
+        )
+        columns = ", ".join([f"{base_name}Model.{field.name}" for field in fields])
+        model_key = ", ".join([f"model.{field.name}" for field in fields])
+        if len(fields) == 1:
+            model_key += ","
+        unique_gens += f"""
+    @classmethod
+    async def gen_from_{suffix}(cls, vc: {vc_name}, {arguments}) -> {base_name} | None:
+        session = {session_getter_fn_name}()
+        result = await session.execute(
+            select({base_name}Model).where(
+{conditions}
+            )
+        )
+        model = result.scalar_one_or_none()
+        return await cls._gen_from_model(vc, model)  # noqa: SLF001
+
+    @classmethod
+    async def gen_many_from_{suffix}(
+        cls, vc: {vc_name}, keys: Sequence[{key_type}]
+    ) -> dict[{key_type}, {base_name} | None]:
+        \"\"\"Load the {base_name} for each ({', '.join(index.field_names)}) with a tuple IN.\"\"\"
+        # Remove the duplicates but keep the order of the keys
+        unique_keys = list(dict.fromkeys(keys))
+        # Each key uses one bound parameter per column
+        chunk_size = MAX_IDS_PER_QUERY // {len(fields)}
+        session = {session_getter_fn_name}()
+        models: dict[{key_type}, {base_name}Model] = {{}}
+        for i in range(0, len(unique_keys), chunk_size):
+            chunk = unique_keys[i : i + chunk_size]
+            result = await session.execute(
+                select({base_name}Model).where(tuple_({columns}).in_(chunk))
+            )
+            for model in result.scalars():
+                models[({model_key})] = model
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(key) for key in unique_keys]
+        )
+        return dict(zip(unique_keys, ents, strict=True))
+
+    @classmethod
+    async def genx_from_{suffix}(cls, vc: {vc_name}, {arguments}) -> {base_name}:
+        result = await cls.gen_from_{suffix}(vc, {argument_names})
+        if not result:
+            raise EntNotFoundError(f"No {base_name} found for {key_message}")
+        return result
+
+    @classmethod
+    async def genx_many_from_{suffix}(
+        cls, vc: {vc_name}, keys: Sequence[{key_type}]
+    ) -> dict[{key_type}, {base_name}]:
+        ents = await cls.gen_many_from_{suffix}(vc, keys)
+        missing = [str(key) for key, ent in ents.items() if not ent]
+        if missing:
+            keys_message = ", ".join(missing)
+            raise EntNotFoundError(f"No {base_name} found for ({', '.join(index.field_names)}) {{keys_message}}")
+        return {{key: ent for key, ent in ents.items() if ent}}
 """  # noqa: E501
     return unique_gens
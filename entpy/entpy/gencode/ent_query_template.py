@@ -1,8 +1,27 @@
 def generate() -> str:
-    return """from abc import ABC, abstractmethod
+    return """import asyncio
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from itertools import islice
 from typing import Generic, Self, TypeVar, Any
-from sqlalchemy import Select, Table
+from sqlalchemy import Dialect, Select, Table, and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import QueryableAttribute
+from entpy import ExecutionError, ValidationError
 from entpy.framework.ent import Ent
+from entpy.framework.pagination import (
+    MAX_FILL_BATCH_SIZE,
+    FilledPage,
+    KeysetColumn,
+    Page,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    merge_keyset_rows,
+    nulls_sort_as_largest,
+    supports_window_functions,
+)
+from entpy.framework.sharding import get_shard_ids
 from sqlalchemy.sql.expression import ColumnElement
 
 from .ent_model import EntModel
@@ -13,6 +32,15 @@ ENTMODEL = TypeVar("ENTMODEL")
 
 class EntQuery[ENT, ENTMODEL](ABC):
     query: Select[tuple[ENTMODEL]]
+    privacy_concurrency: int = 1
+    # The columns used by gen_page, in the order of the ORDER BY
+    keyset: tuple[KeysetColumn, ...] = ()
+    has_custom_order: bool = False
+    limit_value: int | None = None
+    offset_value: int = 0
+    prefetched_edges: tuple[str, ...] = ()
+    # The shards to run the query on, the current shard if empty
+    shard_ids: tuple[int, ...] = ()
 
     def join(self, model_class: type[EntModel] | Table, predicate: ColumnElement[bool]) -> Self:
         self.query = self.query.join(model_class, predicate)
@@ -24,6 +52,20 @@ class EntQuery[ENT, ENTMODEL](ABC):
 
     def order_by(self, predicate: ColumnElement[Any]) -> Self:
         self.query = self.query.order_by(predicate)
+        self.has_custom_order = True
+        return self
+
+    def order_by_key(
+        self,
+        column: ColumnElement[Any] | QueryableAttribute[Any],
+        descending: bool = False,
+    ) -> Self:
+        \"\"\"
+        Order by a column that can be used by gen_page. The values of the column
+        should be unique or almost unique, the ID is added as a tiebreaker.
+        \"\"\"
+        self.query = self.query.order_by(column.desc() if descending else column.asc())
+        self.keyset = (*self.keyset, (column, descending))
         return self
 
     @abstractmethod
@@ -36,16 +78,279 @@ class EntQuery[ENT, ENTMODEL](ABC):
 
     def limit(self, limit: int) -> Self:
         self.query = self.query.limit(limit)
+        self.limit_value = limit
         return self
 
     def offset(self, offset: int) -> Self:
         self.query = self.query.offset(offset)
+        self.offset_value = offset
+        return self
+
+    def prefetch(self, *edge_names: str) -> Self:
+        \"\"\"
+        Load the given edges of all the results at once (one query per edge), so
+        that calling `gen_<edge>()` on the results does not query the database.
+        \"\"\"
+        self.prefetched_edges = (*self.prefetched_edges, *edge_names)
+        return self
+
+    def on_shard(self, shard_id: int) -> Self:
+        self.shard_ids = (shard_id,)
+        return self
+
+    def across_shards(self, *shard_ids: int) -> Self:
+        \"\"\"
+        Run the query on several shards (all of them by default) and merge the
+        results in the order of the order_by_* functions. Only gen(), gen_first(),
+        gen_with_total() and gen_count_NO_PRIVACY() support several shards.
+        The rows are merged in Python, so the strings are sorted by code point
+        rather than with the collation of the database.
+        \"\"\"
+        self.shard_ids = shard_ids or tuple(get_shard_ids())
+        return self
+
+    def with_privacy_concurrency(self, max_concurrency: int) -> Self:
+        \"\"\"
+        Evaluate the privacy rules of up to `max_concurrency` rows at the same time.
+        Only use it with rules that do not share the database session.
+        \"\"\"
+        self.privacy_concurrency = max_concurrency
         return self
 
     @abstractmethod
     async def gen(self) -> list[ENT]:
         pass
+
+    async def gen_page(
+        self,
+        first: int | None = None,
+        after: str | None = None,
+        last: int | None = None,
+        before: str | None = None,
+    ) -> Page[ENT]:
+        \"\"\"
+        Load a page of Ents with keyset pagination: the rows are selected with
+        a WHERE on the columns of the ORDER BY instead of an OFFSET, so every page
+        costs the same. Use `first`/`after` to move forward and `last`/`before` to
+        move backward, with the cursors of the previous page.
+        \"\"\"
+        if (first is None) == (last is None):
+            raise ValidationError("gen_page expects either first or last")
+        if (first is not None and before) or (last is not None and after):
+            raise ValidationError("Use after with first, and before with last")
+        size = first if first is not None else last
+        if size is None or size < 0:
+            raise ValidationError(f"Invalid page size: {size}")
+        if self.has_custom_order:
+            raise ExecutionError(
+                "gen_page only supports the order_by_* functions of the query"
+            )
+
+        forward = first is not None
+        keyset = self._get_keyset_with_id()
+
+        query: Select[Any] = self.query
+        cursor = after if forward else before
+        # The cursor row, or a row on its other side, belongs to another page
+        has_other_side = False
+        if cursor:
+            values = decode_cursor(cursor, keyset)
+            nulls_are_largest = nulls_sort_as_largest(self._get_dialect())
+            query = query.where(
+                keyset_condition(keyset, values, forward, nulls_are_largest)
+            )
+            has_other_side = await self._gen_exists(
+                or_(
+                    keyset_condition(keyset, values, not forward, nulls_are_largest),
+                    and_(
+                        *[
+                            column == value
+                            for (column, _), value in zip(keyset, values, strict=True)
+                        ]
+                    ),
+                )
+            )
+        # When going backward, we read the rows in reverse order
+        query = query.order_by(None).order_by(
+            *[
+                column.desc() if descending == forward else column.asc()
+                for column, descending in keyset
+            ]
+        )
+        query = query.limit(size + 1).add_columns(*[column for column, _ in keyset])
+
+        rows = await self._gen_rows(query)
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if not forward:
+            rows.reverse()
+        cursors = [encode_cursor(values) for _, values in rows]
+        return Page(
+            ents=[ent for ent, _ in rows if ent],
+            start_cursor=cursors[0] if cursors else None,
+            end_cursor=cursors[-1] if cursors else None,
+            has_next=has_more if forward else has_other_side,
+            has_previous=has_more if not forward else has_other_side,
+        )
+
+    async def gen_filled(self, limit: int | None = None) -> FilledPage[ENT]:
+        \"\"\"
+        Like gen(), but keeps reading rows until `limit` Ents are visible or there
+        are no more rows, so that privacy does not return short pages. The rows
+        are read in batches that double in size, starting at `limit`.
+        \"\"\"
+        limit = limit if limit is not None else self.limit_value
+        if limit is None or limit < 0:
+            raise ValidationError(f"gen_filled needs a valid limit, got {limit}")
+
+        ents: list[ENT] = []
+        scanned = 0
+        has_more = False
+        offset = self.offset_value
+        batch_size = max(limit, 1)
+        while len(ents) < limit:
+            # We read one more row to know if there is anything after the batch
+            query = self.query.offset(offset).limit(batch_size + 1)
+            rows = await self._gen_rows(query)
+            batch = rows[:batch_size]
+            for i, (ent, _) in enumerate(batch):
+                scanned += 1
+                if ent:
+                    ents.append(ent)
+                if len(ents) == limit:
+                    has_more = i < len(batch) - 1 or len(rows) > batch_size
+                    break
+            if len(rows) <= batch_size:
+                break
+            offset += batch_size
+            batch_size = min(batch_size * 2, max(MAX_FILL_BATCH_SIZE, limit))
+        return FilledPage(
+            ents=ents,
+            scanned=scanned,
+            has_more=has_more,
+            next_offset=self.offset_value + scanned,
+        )
+
+    async def gen_with_total(self) -> tuple[list[ENT], int]:
+        \"\"\"
+        Load the Ents and the total number of rows matching the query, ignoring
+        the limit and offset, in a single statement with `count(*) OVER ()`.
+        Like gen_count_NO_PRIVACY, the total does not take privacy into account.
+        \"\"\"
+        if len(self.shard_ids) > 1 or not supports_window_functions(
+            self._get_dialect()
+        ):
+            return await self.gen(), await self.gen_count_NO_PRIVACY()
+
+        rows = await self._gen_rows(self.query.add_columns(func.count().over()))
+        if rows:
+            total: int = rows[0][1][0]
+        elif self.offset_value:
+            # The page is past the last row, there is no row to read the total from
+            total = await self.gen_count_NO_PRIVACY()
+        else:
+            total = 0
+        return [ent for ent, _ in rows if ent], total
+
+    def _get_keyset_with_id(self) -> list[KeysetColumn]:
+        \"\"\"The keyset of the query, with the ID as a tiebreaker.\"\"\"
+        keyset = list(self.keyset)
+        id_column = self._get_id_column()
+        if not any(column is id_column for column, _ in keyset):
+            descending = keyset[-1][1] if keyset else False
+            keyset.append((id_column, descending))
+        return keyset
+
+    async def _gen_exists(self, predicate: ColumnElement[bool]) -> bool:
+        \"\"\"Whether a row matches the query and the predicate, ignoring privacy.\"\"\"
+        query = self.query.where(predicate).order_by(None).limit(None).offset(None)
+        result = await self._get_session().execute(select(query.exists()))
+        return bool(result.scalar())
+
+    def _get_sessions(self) -> list[AsyncSession]:
+        if not self.shard_ids:
+            return [self._get_shard_session(None)]
+        return [self._get_shard_session(shard_id) for shard_id in self.shard_ids]
+
+    def _get_session(self) -> AsyncSession:
+        \"\"\"The session of the query, for the functions that use a single shard.\"\"\"
+        sessions = self._get_sessions()
+        if len(sessions) > 1:
+            raise ExecutionError(
+                "Only gen(), gen_first(), gen_with_total() and gen_count_NO_PRIVACY() "
+                + "can run across shards"
+            )
+        return sessions[0]
+
+    async def _gen_scattered_rows(
+        self, query: Select[Any], limit: int | None
+    ) -> list[Any]:
+        \"\"\"
+        Run the query on each shard concurrently and merge the rows in the order of
+        the keyset. Each shard returns its first offset + limit rows, the offset
+        is applied once the rows are merged.
+        \"\"\"
+        if self.has_custom_order:
+            raise ExecutionError(
+                "Use the order_by_* functions to merge the results of several shards"
+            )
+        keyset = self._get_keyset_with_id()
+        end = None if limit is None else self.offset_value + limit
+        query = (
+            query.order_by(None)
+            .order_by(
+                *[
+                    column.desc() if descending else column.asc()
+                    for column, descending in keyset
+                ]
+            )
+            .add_columns(*[column for column, _ in keyset])
+            .offset(None)
+            .limit(end)
+        )
+        results = await asyncio.gather(
+            *[session.execute(query) for session in self._get_sessions()]
+        )
+        rows = merge_keyset_rows(
+            [result.all() for result in results],
+            keyset,
+            nulls_are_largest=nulls_sort_as_largest(self._get_dialect()),
+        )
+        return [row[0] for row in islice(rows, self.offset_value, end)]
+
+    @abstractmethod
+    def _get_shard_session(self, shard_id: int | None) -> AsyncSession:
+        \"\"\"The session of the given shard, or of the current one if None.\"\"\"
+        pass
+
+    @abstractmethod
+    def _get_dialect(self) -> Dialect:
+        pass
+
+    @abstractmethod
+    def _get_id_column(self) -> QueryableAttribute[Any]:
+        pass
+
+    @abstractmethod
+    async def _gen_rows(
+        self, query: Select[Any]
+    ) -> list[tuple[ENT | None, tuple[Any, ...]]]:
+        \"\"\"
+        Run a query that selects the Ent, possibly followed by other columns,
+        and return each Ent (or None if it cannot be seen) with the values of
+        those columns.
+        \"\"\"
+        pass
         
+    @abstractmethod
+    def gen_stream(self, chunk_size: int = 1000) -> AsyncIterator[ENT]:
+        \"\"\"
+        Iterate over the Ents without loading all the rows in memory. The rows
+        are fetched and checked for privacy `chunk_size` at a time, and removed
+        from the session once they have been processed.
+        \"\"\"
+        pass
+
     @abstractmethod
     async def gen_first(self) -> ENT | None:
         pass
@@ -1,15 +1,43 @@
+import os
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
 from hashlib import sha256
 from importlib import import_module
 from pathlib import Path
+from tempfile import TemporaryDirectory
 
 from entpy import Pattern, Schema
 from entpy.gencode.ent_query_template import generate as generate_ent_query
+from entpy.gencode.manifest import (
+    Manifest,
+    get_gencode_fingerprint,
+    get_source_files,
+    hash_inputs,
+    hash_source_files,
+)
 from entpy.gencode.model_base_template import generate as generate_base_model
 from entpy.gencode.pattern_generator import generate as generate_pattern
+from entpy.gencode.reverse_edge_generator import ReverseEdge, compute_reverse_edges
 from entpy.gencode.schema_generator import generate as generate_schema
 from entpy.gencode.view_generator import generate as generate_view
 
+# Below this, starting the pool of processes costs more than it saves
+_MIN_DESCRIPTORS_FOR_POOL = 50
+
+
+@dataclass(frozen=True)
+class _GencodeOptions:
+    """The arguments of `run` that the generated code depends on."""
+
+    base_import: str
+    session_getter_import: str
+    session_getter_fn_name: str
+    vc_import: str
+    vc_name: str
+    read_session_getter_import: str | None
+    read_session_getter_fn_name: str | None
+
 
 def run(
     schemas_directory: str,
@@ -19,7 +47,26 @@ def run(
     session_getter_fn_name: str,
     vc_import: str,
     vc_name: str,
+    read_session_getter_import: str | None = None,
+    read_session_getter_fn_name: str | None = None,
+    max_workers: int | None = None,
+    min_descriptors_for_pool: int = _MIN_DESCRIPTORS_FOR_POOL,
 ) -> None:
+    """
+    Generate the Ents of the schemas. If a read session getter is given, the
+    reads use it (e.g. to go to a replica) and the mutations use the session
+    getter, see `read_your_writes`.
+
+    Only the files whose inputs changed since the previous run are generated
+    again, see `.entpy_manifest.json` in the output directory. Delete it to
+    generate everything.
+
+    The schemas and patterns are generated by a pool of `max_workers` processes
+    (one per CPU by default, 1 to stay in this process) when at least
+    `min_descriptors_for_pool` of them need to be generated.
+    """
+    if max_workers is not None and max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}")
     print("EntGenerator is running...")
     schemas_path = Path(schemas_directory).resolve()
     output_path = Path(output_directory).resolve()
@@ -29,62 +76,65 @@ def run(
     # Create output directory if it doesn't exist
     output_path.mkdir(parents=True, exist_ok=True)
 
+    options = _GencodeOptions(
+        base_import=base_import,
+        session_getter_import=session_getter_import,
+        session_getter_fn_name=session_getter_fn_name,
+        vc_import=vc_import,
+        vc_name=vc_name,
+        read_session_getter_import=read_session_getter_import,
+        read_session_getter_fn_name=read_session_getter_fn_name,
+    )
+    # The files are only generated again if their inputs changed, see Manifest
+    manifest = Manifest.load(output_path)
+    fingerprint = get_gencode_fingerprint(asdict(options))
+    # The code to write, with the hash of the inputs it was generated from
+    files: dict[Path, tuple[str, str]] = {}
+
     # Generate base model that all models will inherit from, and the ent_query
     base_model = generate_base_model(base_import=base_import)
-    _write_file(output_path / "ent_model.py", base_model)
+    files[output_path / "ent_model.py"] = (hash_inputs(fingerprint), base_model)
     ent_query = generate_ent_query()
-    _write_file(output_path / "ent_query.py", ent_query)
+    files[output_path / "ent_query.py"] = (hash_inputs(fingerprint), ent_query)
 
     # Load all descriptors to process
     configs = _load_descriptors_configs(
         schemas_path=schemas_path, output_path=output_path
     )
     print(f"Found {len(configs)} schema(s) and pattern(s).")
+    reverse_edges = compute_reverse_edges(
+        [config[0] for config in configs if issubclass(config[0], Schema)]
+    )
 
-    # Gencode all the things!
     models_list = ""
     models_list_mapping = ""
+    # The Ent of each type stored in the IDs, see generate_uuid
+    uuid_types: dict[bytes, str] = {}
+    # The descriptors to generate, with the hash of their inputs
+    pending: list[tuple[type[Schema] | type[Pattern], Path, str]] = []
     for config in configs:
         descriptor_class = config[0]
         descriptor_output_path = config[1]
-        print(f"Processing: {descriptor_class.__name__}")
+        source_files = get_source_files(descriptor_class, schemas_path, output_path)
         if issubclass(descriptor_class, Schema):
             base_name = descriptor_class.__name__.replace("Schema", "")
             uuid_type = sha256(base_name.encode()).digest()[:2]
+            if uuid_type in uuid_types:
+                raise ValueError(
+                    f"{uuid_types[uuid_type]} and {base_name} have the same type in "
+                    + "their IDs, rename one of them"
+                )
+            uuid_types[uuid_type] = base_name
             uuid_hex = "".join(f"\\x{b:02x}" for b in uuid_type)
             models_list_mapping += f'\n    b"{uuid_hex}": {base_name},'
             models_list += f"\nfrom .{descriptor_output_path.stem} import {base_name}Model  # noqa: F401"  # noqa: E501
             models_list += f"\nfrom .{descriptor_output_path.stem} import {base_name}"
-            code = generate_schema(
-                schema_class=descriptor_class,
-                ent_model_import="from .ent_model import EntModel",
-                session_getter_import=session_getter_import,
-                session_getter_fn_name=session_getter_fn_name,
-                vc_import=vc_import,
-                vc_name=vc_name,
-            )
+            # The reverse edges come from the schemas pointing at this one
+            for reverse_edge in reverse_edges.get(descriptor_class, []):
+                source_files |= get_source_files(
+                    reverse_edge.source_class, schemas_path, output_path
+                )
         elif issubclass(descriptor_class, Pattern):
-            children = get_children_schema_classes(
-                pattern_class=descriptor_class,
-            )
-            code = generate_pattern(
-                pattern_class=descriptor_class,
-                children_schema_classes=children,
-                ent_model_import="from .ent_model import EntModel",
-                session_getter_import=session_getter_import,
-                session_getter_fn_name=session_getter_fn_name,
-                vc_import=vc_import,
-                vc_name=vc_name,
-            )
-            view_code = generate_view(
-                pattern_class=descriptor_class,
-                children_schema_classes=children,
-                base_import=base_import,
-            )
-            _write_file(
-                descriptor_output_path.with_stem(f"{descriptor_output_path.stem}_view"),
-                view_code,
-            )
             models_list += (
                 "\nfrom ."
                 + descriptor_output_path.stem
@@ -92,9 +142,55 @@ def run(
                 + descriptor_class.__name__.replace("Pattern", "View")
                 + "  # noqa: F401"
             )
+            for child in get_children_schema_classes(pattern_class=descriptor_class):
+                source_files |= get_source_files(child, schemas_path, output_path)
         else:
             raise TypeError(f"Unknown descriptor type: {descriptor_class}")
-        _write_file(descriptor_output_path, code)
+
+        inputs_hash = hash_inputs(
+            fingerprint, *hash_source_files(source_files, schemas_path)
+        )
+        output_paths = _get_output_paths(descriptor_class, descriptor_output_path)
+        if all(manifest.is_up_to_date(path, inputs_hash) for path in output_paths):
+            for path in output_paths:
+                files[path] = (inputs_hash, "")
+        else:
+            pending.append((descriptor_class, descriptor_output_path, inputs_hash))
+    if len(pending) < len(configs):
+        print(
+            f"Skipped {len(configs) - len(pending)} unchanged schema(s) and pattern(s)."
+        )
+
+    # Gencode all the things!
+    for descriptor_class, _, _ in pending:
+        print(f"Processing: {descriptor_class.__name__}")
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(pending) < min_descriptors_for_pool:
+        generated = [
+            _generate_descriptor(
+                descriptor_class, descriptor_output_path, reverse_edges, options
+            )
+            for descriptor_class, descriptor_output_path, _ in pending
+        ]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(schemas_path, output_path),
+        ) as executor:
+            # The results come back in the order of the descriptors, so the
+            # output does not depend on which worker generated what
+            generated = list(
+                executor.map(
+                    _generate_descriptor_in_worker,
+                    [descriptor_class.__name__ for descriptor_class, _, _ in pending],
+                    [options] * len(pending),
+                    chunksize=max(1, len(pending) // (workers * 4)),
+                )
+            )
+    for (_, _, inputs_hash), descriptor_files in zip(pending, generated, strict=True):
+        for path, code in descriptor_files:
+            files[path] = (inputs_hash, code)
 
     models_list_code = f"""
 from entpy import Ent
@@ -105,18 +201,143 @@ UUID_TO_ENT: dict[bytes, type[Ent[{vc_name}]]] = {{
 {models_list_mapping}
 }}
 """
-    _write_file(output_path / "all_models.py", models_list_code)
-
-    # Format the code before returning
-    # TODO make this a config, not everyone uses ruff
-    subprocess.run(["uv", "run", "ruff", "format", str(output_path)], check=True)
-    subprocess.run(
-        ["uv", "run", "ruff", "check", "--fix", str(output_path)], check=True
+    files[output_path / "all_models.py"] = (
+        hash_inputs(fingerprint, models_list_code),
+        models_list_code,
     )
 
+    _write_files(output_path=output_path, files=files, manifest=manifest)
+    manifest.save({path.name for path in files})
+
     print("EntGenerator has finished.")
 
 
+def _get_output_paths(
+    descriptor_class: type[Schema] | type[Pattern], descriptor_output_path: Path
+) -> list[Path]:
+    if issubclass(descriptor_class, Pattern):
+        return [
+            descriptor_output_path,
+            descriptor_output_path.with_stem(f"{descriptor_output_path.stem}_view"),
+        ]
+    return [descriptor_output_path]
+
+
+def _generate_descriptor(
+    descriptor_class: type[Schema] | type[Pattern],
+    descriptor_output_path: Path,
+    reverse_edges: dict[type[Schema], list[ReverseEdge]],
+    options: _GencodeOptions,
+) -> list[tuple[Path, str]]:
+    """Generate the code of the files of a schema or a pattern."""
+    if issubclass(descriptor_class, Schema):
+        code = generate_schema(
+            schema_class=descriptor_class,
+            ent_model_import="from .ent_model import EntModel",
+            session_getter_import=options.session_getter_import,
+            session_getter_fn_name=options.session_getter_fn_name,
+            vc_import=options.vc_import,
+            vc_name=options.vc_name,
+            reverse_edges=reverse_edges.get(descriptor_class, []),
+            read_session_getter_import=options.read_session_getter_import,
+            read_session_getter_fn_name=options.read_session_getter_fn_name,
+        )
+        return [(descriptor_output_path, code)]
+
+    children = get_children_schema_classes(
+        pattern_class=descriptor_class,
+    )
+    code = generate_pattern(
+        pattern_class=descriptor_class,
+        children_schema_classes=children,
+        ent_model_import="from .ent_model import EntModel",
+        session_getter_import=options.session_getter_import,
+        session_getter_fn_name=options.session_getter_fn_name,
+        vc_import=options.vc_import,
+        vc_name=options.vc_name,
+        read_session_getter_import=options.read_session_getter_import,
+        read_session_getter_fn_name=options.read_session_getter_fn_name,
+    )
+    view_code = generate_view(
+        pattern_class=descriptor_class,
+        children_schema_classes=children,
+        base_import=options.base_import,
+    )
+    view_output_path = _get_output_paths(descriptor_class, descriptor_output_path)[1]
+    return [(descriptor_output_path, code), (view_output_path, view_code)]
+
+
+# The descriptors loaded by a worker of the pool, see _init_worker
+_worker_configs: dict[str, tuple[type[Schema] | type[Pattern], Path]] = {}
+_worker_reverse_edges: dict[type[Schema], list[ReverseEdge]] = {}
+
+
+def _init_worker(schemas_path: Path, output_path: Path) -> None:
+    """
+    Load the descriptors in a worker of the pool. The workers receive the names
+    of the descriptors to generate, the fields (validators, examples...) are not
+    always picklable.
+    """
+    configs = _load_descriptors_configs(
+        schemas_path=schemas_path, output_path=output_path
+    )
+    _worker_configs.update(
+        {
+            descriptor_class.__name__: (descriptor_class, path)
+            for descriptor_class, path in configs
+        }
+    )
+    _worker_reverse_edges.update(
+        compute_reverse_edges(
+            [config[0] for config in configs if issubclass(config[0], Schema)]
+        )
+    )
+
+
+def _generate_descriptor_in_worker(
+    descriptor_name: str, options: _GencodeOptions
+) -> list[tuple[Path, str]]:
+    descriptor_class, descriptor_output_path = _worker_configs[descriptor_name]
+    return _generate_descriptor(
+        descriptor_class, descriptor_output_path, _worker_reverse_edges, options
+    )
+
+
+def _write_files(
+    output_path: Path, files: dict[Path, tuple[str, str]], manifest: Manifest
+) -> None:
+    """
+    Format the code of the files that are not up to date, and only write the
+    ones whose content changed, so that their readers (file watchers, import
+    caches...) do not see the others as modified.
+    """
+    pending = {
+        path: (inputs_hash, code)
+        for path, (inputs_hash, code) in files.items()
+        if not manifest.is_up_to_date(path, inputs_hash)
+    }
+    if not pending:
+        return
+    # Format the code in a staging directory next to the output, so that the
+    # configuration of the formatter is the same
+    with TemporaryDirectory(dir=output_path) as staging_directory:
+        staging_path = Path(staging_directory)
+        for path, (_, code) in pending.items():
+            _write_file(staging_path / path.name, code)
+
+        # TODO make this a config, not everyone uses ruff
+        subprocess.run(["uv", "run", "ruff", "format", str(staging_path)], check=True)
+        subprocess.run(
+            ["uv", "run", "ruff", "check", "--fix", str(staging_path)], check=True
+        )
+
+        for path, (inputs_hash, _) in pending.items():
+            content = (staging_path / path.name).read_bytes()
+            if not path.exists() or path.read_bytes() != content:
+                path.write_bytes(content)
+            manifest.record(path, inputs_hash, content)
+
+
 def _load_descriptors_configs(
     schemas_path: Path, output_path: Path
 ) -> list[tuple[type[Schema] | type[Pattern], Path]]:
@@ -1,14 +1,75 @@
-def generate(base_name: str) -> str:
-    return f"""def _get_field(field_name: str) -> Field:
-        schema = {base_name}Schema()
-        fields = schema.get_all_fields()
-        field = next(
-            filter(
-                lambda field: field.name == field_name,
-                fields,
-            )
+from entpy import Schema
+from entpy.gencode.generated_content import GeneratedContent
+
+
+def generate(schema: Schema, base_name: str) -> GeneratedContent:
+    privacy_rules = _generate_privacy_rules(schema=schema, base_name=base_name)
+    cache = _generate_cache(schema=schema, base_name=base_name)
+    return GeneratedContent(
+        imports=[
+            "from entpy import FieldValidator",
+            "from entpy.framework.registry import get_descriptor_metadata",
+            "from entpy.framework.registry import register_ent",
+            "from typing import Any",
+        ]
+        + privacy_rules.imports
+        + cache.imports,
+        code=f"""def _get_field(field_name: str) -> Field:
+    return get_descriptor_metadata({base_name}Schema).get_field(field_name)
+
+
+def _get_validators(field_name: str) -> tuple[FieldValidator[Any], ...]:
+    return get_descriptor_metadata({base_name}Schema).validators[field_name]
+
+
+register_ent({base_name}, {base_name}Schema)
+{cache.code}
+{privacy_rules.code}
+""",
+    )
+
+
+def _generate_cache(schema: Schema, base_name: str) -> GeneratedContent:
+    if not schema.get_cache_policy():
+        return GeneratedContent(code="")
+    return GeneratedContent(
+        imports=["from entpy.framework.ent_cache import configure_ent_cache"],
+        code=f"""_cache_policy = {base_name}Schema().get_cache_policy()
+configure_ent_cache({base_name}Model, _cache_policy)
+""",
+    )
+
+
+def _generate_privacy_rules(schema: Schema, base_name: str) -> GeneratedContent:
+    if schema.has_dynamic_privacy_rules():
+        return GeneratedContent(
+            imports=[
+                "from collections.abc import Sequence",
+                "from entpy import PrivacyRule",
+            ],
+            code=f"""
+def _get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+    return {base_name}Schema().get_privacy_rules(action)
+""",
         )
-        if not field:
-            raise ValueError(f"Unknown field: {{field_name}}")
-        return field
-"""
+    return GeneratedContent(
+        imports=[
+            "from collections.abc import Mapping, Sequence",
+            "from entpy import PrivacyRule",
+            "from functools import cache",
+            "from types import MappingProxyType",
+        ],
+        code=f"""
+@cache
+def _get_privacy_rules_table() -> Mapping[Action, tuple[PrivacyRule, ...]]:
+    # The rules never change at runtime, we only build them once
+    schema = {base_name}Schema()
+    return MappingProxyType(
+        {{action: tuple(schema.get_privacy_rules(action)) for action in Action}}
+    )
+
+
+def _get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+    return _get_privacy_rules_table()[action]
+""",
+    )
@@ -0,0 +1,140 @@
+import json
+import sys
+from functools import cache
+from hashlib import sha256
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+import entpy
+
+MANIFEST_FILE_NAME = ".entpy_manifest.json"
+# Bump this when the format of the manifest changes
+_MANIFEST_VERSION = 1
+
+
+class Manifest:
+    """
+    Remembers, for each generated file, a hash of the inputs it was generated
+    from and a hash of its content. A file whose inputs did not change (and that
+    was not edited since) does not need to be generated again.
+    """
+
+    def __init__(self, path: Path, entries: dict[str, dict[str, str]]) -> None:
+        self.path = path
+        self._entries = entries
+
+    @classmethod
+    def load(cls, output_path: Path) -> "Manifest":
+        path = output_path / MANIFEST_FILE_NAME
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(path=path, entries={})
+        if not isinstance(data, dict) or data.get("version") != _MANIFEST_VERSION:
+            return cls(path=path, entries={})
+        return cls(path=path, entries=data.get("files", {}))
+
+    def is_up_to_date(self, file_path: Path, inputs_hash: str) -> bool:
+        entry = self._entries.get(file_path.name)
+        if not entry or entry.get("inputs") != inputs_hash:
+            return False
+        try:
+            content = file_path.read_bytes()
+        except OSError:
+            return False
+        return entry.get("content") == hash_bytes(content)
+
+    def record(self, file_path: Path, inputs_hash: str, content: bytes) -> None:
+        self._entries[file_path.name] = {
+            "inputs": inputs_hash,
+            "content": hash_bytes(content),
+        }
+
+    def save(self, file_names: set[str]) -> None:
+        """Write the manifest, forgetting the files that are not generated anymore."""
+        entries = {
+            name: entry
+            for name, entry in sorted(self._entries.items())
+            if name in file_names
+        }
+        data = {"version": _MANIFEST_VERSION, "files": entries}
+        self.path.write_text(json.dumps(data, indent=2) + "\n")
+
+
+def hash_bytes(content: bytes) -> str:
+    return sha256(content).hexdigest()
+
+
+def hash_inputs(*parts: str) -> str:
+    digest = sha256()
+    for part in parts:
+        digest.update(part.encode())
+        # Separate the parts so that ("ab", "c") and ("a", "bc") differ
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get_gencode_fingerprint(options: dict[str, Any]) -> str:
+    """
+    A hash of everything every generated file depends on: the source of EntPy
+    itself (the templates, the fields...) and the options given to the gencode.
+    """
+    entpy_path = Path(entpy.__file__).parent
+    parts = [json.dumps(options, sort_keys=True)]
+    for source_path in sorted(entpy_path.rglob("*.py")):
+        parts.append(str(source_path.relative_to(entpy_path)))
+        parts.append(hash_bytes(source_path.read_bytes()))
+    return hash_inputs(*parts)
+
+
+def get_source_files(
+    descriptor_class: type[Any], schemas_path: Path, output_path: Path
+) -> set[Path]:
+    """
+    The file defining the descriptor, and the files of the schemas directory it
+    imports (directly or not), e.g. the schemas its edges point at.
+    """
+    files: set[Path] = set()
+    visited: set[str] = set()
+    pending = [descriptor_class.__module__]
+    while pending:
+        module_name = pending.pop()
+        module = sys.modules.get(module_name)
+        if module_name in visited or module is None:
+            continue
+        visited.add(module_name)
+        module_file = getattr(module, "__file__", None)
+        if not module_file:
+            continue
+        path = _get_schema_file(module_file, schemas_path, output_path)
+        if path is None:
+            continue
+        files.add(path)
+        for value in vars(module).values():
+            pending.append(
+                value.__name__
+                if isinstance(value, ModuleType)
+                else getattr(value, "__module__", None) or ""
+            )
+    return files
+
+
+@cache
+def _get_schema_file(
+    module_file: str, schemas_path: Path, output_path: Path
+) -> Path | None:
+    """The path of a module of the schemas directory, None for the other modules."""
+    path = Path(module_file).resolve()
+    # The generated code does not affect how it is generated
+    if not path.is_relative_to(schemas_path) or path.is_relative_to(output_path):
+        return None
+    return path
+
+
+def hash_source_files(files: set[Path], schemas_path: Path) -> list[str]:
+    parts = []
+    for path in sorted(files):
+        parts.append(str(path.relative_to(schemas_path)))
+        parts.append(hash_bytes(path.read_bytes()))
+    return parts
@@ -17,6 +17,9 @@ from sqlalchemy.sql import func
 
 class EntModel(Base):
     __abstract__ = True
+    # Fetch the server-generated values with RETURNING when the dialect supports
+    # it, instead of expiring them and loading them again on the next access.
+    __mapper_args__ = {{"eager_defaults": True}}
 
     @declared_attr
     def id(self) -> Mapped[PYUUID]:
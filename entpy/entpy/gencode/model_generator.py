@@ -33,7 +33,13 @@ def generate(descriptor: Descriptor, base_name: str) -> GeneratedContent:
             "True" if field.nullable else "False"
         )
         common_column_attributes += ", unique=True" if field.is_unique else ""
-        common_column_attributes += ", index=True" if field.is_indexed else ""
+        # The edges to schemas are indexed for the reverse edges
+        is_indexed = field.is_indexed or (
+            isinstance(field, EdgeField)
+            and not field.is_unique
+            and issubclass(field.edge_class, Schema)
+        )
+        common_column_attributes += ", index=True" if is_indexed else ""
         if isinstance(field, FieldWithDefault):
             default = field.generate_sql_default()
             if default:
@@ -27,7 +27,15 @@ def generate(
         vc_name=vc_name,
     )
     return GeneratedContent(
-        imports=base.imports + creation.imports + update.imports + deletion.imports,
+        imports=[
+            "from entpy.framework.loader import invalidate_ent",
+            "from entpy.framework.sharding import get_session_for_id, get_shard_id",
+            "from entpy.framework.session import gen_attach, pin_to_primary",
+        ]
+        + base.imports
+        + creation.imports
+        + update.imports
+        + deletion.imports,
         code=base.code
         + "\n\n"
         + creation.code
@@ -77,6 +85,12 @@ class {base_name}Mutator:
         cls, vc: {vc_name}{arguments_definition}, id: UUID | None = None, created_at: datetime | None = None, updated_at: datetime | None = None
     ) -> {base_name}MutatorCreationAction:
         return {base_name}MutatorCreationAction(vc=vc, id=id, created_at=created_at, updated_at=updated_at{arguments_usage})
+
+    @classmethod
+    def create_many(
+        cls, vc: {vc_name}, actions: Sequence[{base_name}MutatorCreationAction]
+    ) -> {base_name}MutatorBulkCreationAction:
+        return {base_name}MutatorBulkCreationAction(vc=vc, actions=actions)
 {update_function}
     @classmethod
     def delete(
@@ -110,10 +124,11 @@ def _generate_creation(
     )
 
     validations = _generate_validations(base_name=base_name, fields=fields)
+    validate_body = validations.code or "\n        pass"
 
     # Build up the list of variables to assign to the model
     model_assignments = "\n".join(
-        [f"                {field.name}=self.{field.name}," for field in fields]
+        [f"            {field.name}=self.{field.name}," for field in fields]
     )
 
     # TODO support UUID factory
@@ -134,18 +149,65 @@ class {base_name}MutatorCreationAction:
 {constructor_assignments}
 
     async def gen_savex(self) -> {base_name}:
-        session = {session_getter_fn_name}()
-{validations.code}
-        model = {base_name}Model(
+        session = get_session_for_id({session_getter_fn_name}, self.id)
+        self._validate()
+        model = self._build_model()
+        session.add(model)
+        await session.flush()
+        pin_to_primary()
+        invalidate_ent({base_name}Model, self.id)
+        # TODO privacy checks
+        return await {base_name}._genx_from_model(self.vc, model)  # noqa: SLF001
+
+    def _validate(self) -> None:{validate_body}
+
+    def _build_model(self) -> {base_name}Model:
+        return {base_name}Model(
             id=self.id,
             updated_at=self.updated_at,
             created_at=self.created_at,
 {model_assignments}
         )
-        session.add(model)
-        await session.flush()
-        # TODO privacy checks
-        return await {base_name}._genx_from_model(self.vc, model)  # noqa: SLF001
+
+
+class {base_name}MutatorBulkCreationAction:
+    vc: {vc_name}
+    actions: list[{base_name}MutatorCreationAction]
+
+    def __init__(self, vc: {vc_name}, actions: Sequence[{base_name}MutatorCreationAction]) -> None:
+        self.vc = vc
+        self.actions = list(actions)
+
+    async def gen_save(self) -> None:
+        \"\"\"Insert all the Ents with a single flush, without loading them back.\"\"\"
+        await self._gen_insert()
+
+    async def gen_savex(self) -> list[{base_name}]:
+        \"\"\"Insert all the Ents with a single flush and return them, in order.\"\"\"
+        models = await self._gen_insert()
+        ents = await {base_name}._gen_from_models(self.vc, models)  # noqa: SLF001
+        for model, ent in zip(models, ents, strict=True):
+            if not ent:
+                raise EntNotFoundError(f"No {base_name} found for ID {{model.id}}")
+        return [ent for ent in ents if ent]
+
+    async def _gen_insert(self) -> list[{base_name}Model]:
+        # Validate everything before writing anything
+        for action in self.actions:
+            action._validate()  # noqa: SLF001
+        models = [action._build_model() for action in self.actions]  # noqa: SLF001
+        models_by_shard: dict[int, list[{base_name}Model]] = {{}}
+        for model in models:
+            models_by_shard.setdefault(get_shard_id(model.id), []).append(model)
+        for shard_models in models_by_shard.values():
+            session = get_session_for_id({session_getter_fn_name}, shard_models[0].id)
+            # The unit of work batches the rows into multi-row INSERT statements
+            session.add_all(shard_models)
+            await session.flush()
+        pin_to_primary()
+        for model in models:
+            invalidate_ent({base_name}Model, model.id)
+        return models
 """,  # noqa: E501
     )
 
@@ -175,9 +237,15 @@ def _generate_update(
 
     validations = _generate_validations(base_name=base_name, fields=mutable_fields)
 
-    # Build up the list of variables to assign to the model
-    model_assignments = "\n".join(
-        [f"        model.{field.name}=self.{field.name}" for field in mutable_fields]
+    # Only write the fields that changed
+    model_assignments = "".join(
+        [
+            f"""
+        if self.{field.name} != model.{field.name}:
+            model.{field.name} = self.{field.name}
+            changed = True"""
+            for field in mutable_fields
+        ]
     )
 
     # Check if the schema has patterns to determine inheritance
@@ -213,14 +281,19 @@ class {base_name}MutatorUpdateAction{inheritance}:
 {local_variables_assignments}
 
     async def gen_savex(self) -> {base_name}:
-        session = {session_getter_fn_name}()
+        session = get_session_for_id({session_getter_fn_name}, self.ent.id)
 {validations.code}
-        model = self.ent.model
-{model_assignments}
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
+        changed = False{model_assignments}
+        if not changed:
+            # Nothing to write
+            return self.ent
         model.updated_at = datetime.now(tz=UTC)
         session.add(model)
         await session.flush()
-        await session.refresh(model)
+        pin_to_primary()
+        invalidate_ent({base_name}Model, model.id)
         # TODO privacy checks
         return await {base_name}._genx_from_model(self.vc, model)  # noqa: SLF001
 """,
@@ -260,11 +333,14 @@ class {base_name}MutatorDeletionAction{inheritance}:
         self.ent = ent
 
     async def gen_save(self) -> None:
-        session = {session_getter_fn_name}()
-        model = self.ent.model
+        session = get_session_for_id({session_getter_fn_name}, self.ent.id)
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
         # TODO privacy checks
         await session.delete(model)
         await session.flush()
+        pin_to_primary()
+        invalidate_ent({base_name}Model, model.id)
 """,
     )
 
@@ -274,8 +350,7 @@ def _generate_validations(base_name: str, fields: list[Field]) -> GeneratedConte
     for field in fields:
         if field._validators:
             validations += f"""
-        {field.name}_validators = _get_field("{field.name}")._validators  # noqa: SLF001
-        for validator in {field.name}_validators:
+        for validator in _get_validators("{field.name}"):
             if not validator.validate(self.{field.name}):
                 raise ValidationError("Invalid value for {base_name}.{field.name}")
 """
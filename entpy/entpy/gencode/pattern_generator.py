@@ -3,6 +3,8 @@ from entpy.framework.fields.edge_field import EdgeField
 from entpy.gencode.generated_content import GeneratedContent
 from entpy.gencode.model_generator import generate as generate_model
 from entpy.gencode.query_generator import generate as generate_query
+from entpy.gencode.session_generator import generate as generate_session
+from entpy.gencode.session_generator import get_read_session_getter_fn_name
 from entpy.gencode.utils import get_description, to_snake_case
 
 
@@ -14,6 +16,8 @@ def generate(
     session_getter_fn_name: str,
     vc_import: str,
     vc_name: str,
+    read_session_getter_import: str | None = None,
+    read_session_getter_fn_name: str | None = None,
 ) -> str:
     pattern = pattern_class()
     base_name = pattern_class.__name__.replace("Pattern", "")
@@ -33,15 +37,21 @@ def generate(
         pass
 """  # noqa: E501
 
-    # We are trying to load the various subclasses of ents
-    loaders_gen = _get_loaders(children_schema_classes=children_schema_classes)
-
     gen_edges = _generate_edges(pattern=pattern, base_name=base_name, vc_name=vc_name)
 
+    # The queries only read
+    session_content = generate_session(
+        session_getter_fn_name=session_getter_fn_name,
+        read_session_getter_import=read_session_getter_import,
+        read_session_getter_fn_name=read_session_getter_fn_name,
+    )
     query_content = generate_query(
         descriptor=pattern,
         base_name=base_name,
-        session_getter_fn_name=session_getter_fn_name,
+        session_getter_fn_name=get_read_session_getter_fn_name(
+            session_getter_fn_name=session_getter_fn_name,
+            read_session_getter_fn_name=read_session_getter_fn_name,
+        ),
         vc_name=vc_name,
     )
 
@@ -79,6 +89,7 @@ def generate(
         + query_content.imports
         + gen_edges.imports
         + mutator_content.imports
+        + session_content.imports
     )
 
     # Add time import if needed (detected during properties generation)
@@ -102,12 +113,13 @@ def generate(
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from uuid import UUID
-from entpy import Ent, ValidationError
+from collections.abc import Mapping, Sequence
+from entpy import Ent, EntNotFoundError, ValidationError
 from datetime import datetime
 from sentinels import Sentinel, NOTHING  # type: ignore[import-untyped]
 from typing import Self
 {imports_code}
-
+{session_content.code}
 {model.code}
 
 class I{base_name}(Ent):{get_description(pattern)}
@@ -124,22 +136,59 @@ class I{base_name}(Ent):{get_description(pattern)}
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {{ent_id}}") from e
 
-        # TODO refactor this to read the bytes from the UUID
-        {loaders_gen}
-        return None
+        # The type of the ent is encoded in the UUID, no need to try every
+        # implementation
+        from .all_models import UUID_TO_ENT
+
+        ent_class = UUID_TO_ENT.get(ent_id.bytes[6:8])
+        if ent_class is None or not issubclass(ent_class, I{base_name}):
+            return None
+        return await ent_class.gen(vc, ent_id)
 
     @classmethod
     async def genx(cls, vc: {vc_name}, ent_id: UUID | str) -> I{base_name}:
+        ent = await cls.gen(vc, ent_id)
+        if not ent:
+            raise ValueError(f"No {base_name} found for ID {{ent_id}}")
+        return ent
+
+    @classmethod
+    async def genx_many(
+        cls, vc: {vc_name}, ent_ids: Sequence[UUID | str]
+    ) -> Mapping[UUID, I{base_name}]:
+        ents = await cls.gen_many(vc, ent_ids)
+        missing = [str(ent_id) for ent_id, ent in ents.items() if not ent]
+        if missing:
+            ids = ", ".join(missing)
+            raise EntNotFoundError(f"No {base_name} found for IDs {{ids}}")
+        return {{ent_id: ent for ent_id, ent in ents.items() if ent}}
+
+    @classmethod
+    async def gen_many(
+        cls, vc: {vc_name}, ent_ids: Sequence[UUID | str]
+    ) -> Mapping[UUID, I{base_name} | None]:
         # Convert str to UUID if needed
-        if isinstance(ent_id, str):
+        uuids: list[UUID] = []
+        for ent_id in ent_ids:
             try:
-                ent_id = UUID(ent_id)
+                uuids.append(UUID(ent_id) if isinstance(ent_id, str) else ent_id)
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {{ent_id}}") from e
-
-        # TODO refactor this to read the bytes from the UUID
-        {loaders_gen}
-        raise ValueError(f"No {base_name} found for ID {{ent_id}}")
+        # Remove the duplicates but keep the order of the IDs
+        uuids = list(dict.fromkeys(uuids))
+
+        # Group the IDs by implementation to load each type with one query
+        from .all_models import UUID_TO_ENT
+
+        ids_by_class: dict[type[I{base_name}], list[UUID]] = {{}}
+        for ent_id in uuids:
+            ent_class = UUID_TO_ENT.get(ent_id.bytes[6:8])
+            if ent_class is not None and issubclass(ent_class, I{base_name}):
+                ids_by_class.setdefault(ent_class, []).append(ent_id)
+        ents: dict[UUID, I{base_name} | None] = {{}}
+        for ent_class, ids in ids_by_class.items():
+            ents.update(await ent_class.gen_many(vc, ids))
+        return {{ent_id: ents.get(ent_id) for ent_id in uuids}}
 
     @classmethod
     def query_{to_snake_case(base_name)}(cls, vc: {vc_name}) -> I{base_name}Query:
@@ -162,20 +211,6 @@ class I{base_name}Example:
 """  # noqa: E501
 
 
-def _get_loaders(children_schema_classes: list[type[Schema]]) -> str:
-    loaders = ""
-    for schema_class in children_schema_classes:
-        schema_base_name = schema_class.__name__.replace("Schema", "")
-        lower_schema = to_snake_case(schema_base_name)
-        loaders += f"""
-        from .{lower_schema} import {schema_base_name}
-        {lower_schema} = await {schema_base_name}.gen(vc, ent_id)
-        if {lower_schema}:
-            return {lower_schema}
-"""
-    return loaders
-
-
 def _generate_edges(pattern: Pattern, base_name: str, vc_name: str) -> GeneratedContent:
     code = ""
     type_checking_imports = []
@@ -12,14 +12,21 @@ def generate(
 
     imports = [
         "from sqlalchemy.sql.expression import ColumnElement",
+        "from collections.abc import AsyncIterator",
         "from typing import Any, TypeVar",
-        "from sqlalchemy import select, Select, func, Result",
+        "from sqlalchemy import select, Select, func, Result, Dialect",
+        "from sqlalchemy.orm import QueryableAttribute",
         "from entpy import EntNotFoundError, ExecutionError",
+        "from entpy import concurrent_privacy_evaluation",
+        "from entpy.framework.prefetch import gen_prefetch",
+        "from entpy.framework.sharding import use_shard",
+        "from sqlalchemy.ext.asyncio import AsyncSession",
+        "import asyncio",
+        "from collections.abc import Sequence",
         "from .ent_query import EntQuery",
     ]
 
-    if is_pattern:
-        imports.append("from typing import cast")
+    imports.append("from entpy.framework.loader import LoadedModels")
 
     # For patterns, we need to import and use the view
     query_target = f"{base_name}View.id" if is_pattern else f"{base_name}Model"
@@ -31,12 +38,11 @@ def generate(
 
     gen_ents = _generate_gen_ents(is_pattern=is_pattern, base_name=base_name)
     gen_ent = _generate_gen_ent(is_pattern=is_pattern, base_name=base_name)
-    gen_single_ent = _generate_gen_single_ent(
-        is_pattern=is_pattern, base_name=base_name
-    )
     order_by_methods = _generate_order_by_methods(
-        is_pattern=is_pattern, base_name=base_name
+        descriptor=descriptor, is_pattern=is_pattern, base_name=base_name
     )
+    gen_stream = _generate_gen_stream(is_pattern=is_pattern, base_name=base_name)
+    gen_rows = _generate_gen_rows(is_pattern=is_pattern, base_name=base_name)
     generic = "UUID" if is_pattern else f"{base_name}Model"
 
     return GeneratedContent(
@@ -53,21 +59,37 @@ class {i}{base_name}Query(EntQuery[{i}{base_name}, {generic}]):
         self.query = select({query_target})
 
     async def gen(self) -> list[{i}{base_name}]:
-        session = {session_getter_fn_name}()
-        result = await session.execute(self.query)
-        ents = await self._gen_ents(result)
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, self.limit_value)
+        else:
+            result = await self._get_session().execute(self.query)
+            rows = list(result.scalars().all())
+        ents = await self._gen_ents(rows)
         return list(filter(None, ents))
 
+{gen_stream}
+
 {gen_ents}
 
     async def gen_first(self) -> {i}{base_name} | None:
-        session = {session_getter_fn_name}()
-        result = await session.execute(self.query.limit(1))
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, 1)
+            return (await self._gen_ents(rows))[0] if rows else None
+        result = await self._get_session().execute(self.query.limit(1))
         return await self._gen_ent(result)
 
 {gen_ent}
 
-{gen_single_ent}
+{gen_rows}
+
+    def _get_shard_session(self, shard_id: int | None) -> AsyncSession:
+        if shard_id is None:
+            return {session_getter_fn_name}()
+        with use_shard(shard_id):
+            return {session_getter_fn_name}()
+
+    def _get_dialect(self) -> Dialect:
+        return self._get_sessions()[0].get_bind().dialect
 
     async def genx_first(self) -> {i}{base_name}:
         ent = await self.gen_first()
@@ -76,13 +98,19 @@ class {i}{base_name}Query(EntQuery[{i}{base_name}, {generic}]):
         return ent
 
     async def gen_count_NO_PRIVACY(self) -> int:
-        session = {session_getter_fn_name}()
-        count_query = self.query.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
-        result = await session.execute(count_query)
-        count = result.scalar()
-        if count is None:
+        count_query = (
+            self.query.with_only_columns(func.count(), maintain_column_froms=True)
+            .order_by(None)
+            .limit(None)
+            .offset(None)
+        )
+        results = await asyncio.gather(
+            *[session.execute(count_query) for session in self._get_sessions()]
+        )
+        counts = [result.scalar() for result in results]
+        if None in counts:
             raise ExecutionError("Unable to get the count")
-        return count
+        return sum(count or 0 for count in counts)
 
 {order_by_methods}
 """,
@@ -93,74 +121,105 @@ def _generate_gen_ents(is_pattern: bool, base_name: str) -> str:
     i = "I" if is_pattern else ""
     if is_pattern:
         return f"""
-    async def _gen_ents(self, result: Result[tuple[UUID]]) -> list[{i}{base_name} | None]:
-        ent_ids = result.scalars().all()
-        return [await self._gen_single_ent(ent_id) for ent_id in ent_ids]
+    async def _gen_ents(self, ent_ids: Sequence[UUID]) -> list[{i}{base_name} | None]:
+        with concurrent_privacy_evaluation(self.privacy_concurrency):
+            # One query per implementation, whatever the number of rows
+            ents_by_id = await {i}{base_name}.gen_many(self.vc, ent_ids)
+        ents = [ents_by_id[ent_id] for ent_id in ent_ids]
+        await gen_prefetch(self.vc, ents, self.prefetched_edges)
+        return ents
 """  # noqa: E501
     return f"""
-    async def _gen_ents(self, result: Result[tuple[{base_name}Model]]) -> list[{i}{base_name} | None]:
-        models = result.scalars().all()
-        return [
-            await {base_name}._gen_from_model(self.vc, model)  # noqa: SLF001
-            for model in models
-        ]
+    async def _gen_ents(self, models: Sequence[{base_name}Model]) -> list[{i}{base_name} | None]:
+        with concurrent_privacy_evaluation(self.privacy_concurrency):
+            ents = await {base_name}._gen_from_models(self.vc, models)  # noqa: SLF001
+        await gen_prefetch(self.vc, ents, self.prefetched_edges)
+        return ents
+"""  # noqa: E501
+
+
+def _generate_gen_stream(is_pattern: bool, base_name: str) -> str:
+    i = "I" if is_pattern else ""
+    return f"""
+    async def gen_stream(self, chunk_size: int = 1000) -> AsyncIterator[{i}{base_name}]:
+        session = self._get_session()
+        # Once a chunk is processed, the session can let go of the models it
+        # loaded (the rows, their implementations, the prefetched edges...)
+        loaded = LoadedModels(session)
+        try:
+            result = await session.stream_scalars(
+                self.query.execution_options(yield_per=chunk_size)
+            )
+        except BaseException:
+            loaded.close()
+            raise
+        try:
+            async for chunk in result.partitions():
+                ents = await self._gen_ents(chunk)
+                with loaded.paused():
+                    for ent in ents:
+                        if ent:
+                            yield ent
+                loaded.expunge()
+        finally:
+            loaded.close()
+            await result.close()
 """  # noqa: E501
 
 
 def _generate_gen_ent(is_pattern: bool, base_name: str) -> str:
     i = "I" if is_pattern else ""
-    if is_pattern:
-        return f"""
-    async def _gen_ent(self, result: Result[tuple[UUID]]) -> {i}{base_name} | None:
-        ent_id = result.scalar_one_or_none()
-        if not ent_id:
-            return None
-        return await self._gen_single_ent(ent_id)
-"""
+    row_type = "UUID" if is_pattern else f"{base_name}Model"
     return f"""
-    async def _gen_ent(self, result: Result[tuple[{base_name}Model]]) -> {i}{base_name} | None:
-        model = result.scalar_one_or_none()
-        return await {i}{base_name}._gen_from_model(self.vc, model)  # noqa: SLF001
+    async def _gen_ent(self, result: Result[tuple[{row_type}]]) -> {i}{base_name} | None:
+        row = result.scalar_one_or_none()
+        if not row:
+            return None
+        return (await self._gen_ents([row]))[0]
 """  # noqa: E501
 
 
-def _generate_gen_single_ent(is_pattern: bool, base_name: str) -> str:
+def _generate_gen_rows(is_pattern: bool, base_name: str) -> str:
     i = "I" if is_pattern else ""
-    if is_pattern:
-        return f"""
-    async def _gen_single_ent(self, ent_id: UUID) -> {i}{base_name} | None:
-        from .all_models import UUID_TO_ENT
-        uuid_type = ent_id.bytes[6:8]
-        ent_type = UUID_TO_ENT[uuid_type]
-        # Casting is ok here, the id always inherits {i}{base_name}
-        return await cast(type[{i}{base_name}], ent_type).gen(self.vc, ent_id)
-"""
-    return ""
+    return f"""
+    async def _gen_rows(self, query: Select[Any]) -> list[tuple[{i}{base_name} | None, tuple[Any, ...]]]:
+        session = self._get_session()
+        rows = (await session.execute(query)).all()
+        ents = await self._gen_ents([row[0] for row in rows])
+        return [(ent, tuple(row[1:])) for ent, row in zip(ents, rows, strict=True)]
+"""  # noqa: E501
 
 
-def _generate_order_by_methods(is_pattern: bool, base_name: str) -> str:
+def _generate_order_by_methods(
+    descriptor: Descriptor, is_pattern: bool, base_name: str
+) -> str:
     i = "I" if is_pattern else ""
-    if is_pattern:
-        # For patterns, we order by the id column in the view's table
-        return f"""
-    def order_by_id_asc(self) -> "{i}{base_name}Query":
-        from .{to_snake_case(base_name)}_view import {base_name}View
-        self.query = self.query.order_by({base_name}View.id.asc())
-        return self
+    # For patterns, we order by the columns of the view
+    load = (
+        f"from .{to_snake_case(base_name)}_view import {base_name}View\n        "
+        if is_pattern
+        else ""
+    )
+    target = f"{base_name}View" if is_pattern else f"{base_name}Model"
+    code = f"""
+    def _get_id_column(self) -> QueryableAttribute[Any]:
+        {load}return {target}.id
 
-    def order_by_id_desc(self) -> "{i}{base_name}Query":
-        from .{to_snake_case(base_name)}_view import {base_name}View
-        self.query = self.query.order_by({base_name}View.id.desc())
-        return self
-"""
-    else:
-        # For regular models, we order by the model's id column
-        return f"""
     def order_by_id_asc(self) -> "{i}{base_name}Query":
-        self.query = self.query.order_by({base_name}Model.id.asc())
-        return self
+        {load}return self.order_by_key({target}.id)
 
     def order_by_id_desc(self) -> "{i}{base_name}Query":
-        self.query = self.query.order_by({base_name}Model.id.desc())
-        return self
+        {load}return self.order_by_key({target}.id, descending=True)
+"""
+    # The indexed columns can be used to paginate efficiently
+    for field in descriptor.get_all_fields():
+        if field.nullable or not (field.is_indexed or field.is_unique):
+            continue
+        code += f"""
+    def order_by_{field.name}_asc(self) -> "{i}{base_name}Query":
+        {load}return self.order_by_key({target}.{field.name})
+
+    def order_by_{field.name}_desc(self) -> "{i}{base_name}Query":
+        {load}return self.order_by_key({target}.{field.name}, descending=True)
 """
+    return code
@@ -0,0 +1,197 @@
+from dataclasses import dataclass
+
+from entpy import EdgeField, Schema
+from entpy.gencode.generated_content import GeneratedContent
+from entpy.gencode.utils import pluralize, to_snake_case
+
+# The members that every generated Ent has, whatever its fields
+_ENT_MEMBER_NAMES = {
+    "id",
+    "created_at",
+    "updated_at",
+    "vc",
+    "model",
+    "query",
+    "gen",
+    "genx",
+    "gen_many",
+    "genx_many",
+    "gen_prefetch",
+}
+
+
+@dataclass
+class ReverseEdge:
+    """An EdgeField of `source_class`, seen from the Ent it points at."""
+
+    source_class: type[Schema]
+    field: EdgeField
+    name: str
+
+
+def compute_reverse_edges(
+    schema_classes: list[type[Schema]],
+) -> dict[type[Schema], list[ReverseEdge]]:
+    """
+    Find the edges pointing at each schema. By default, the reverse edge of
+    `EntParent.grand_parent` is called `parents` (with basic English plurals,
+    irregular ones need `EdgeField.reverse_edge()`). If a schema has several edges
+    to the same target, they are called `<source>s_by_<edge>` instead.
+    """
+    edges: list[tuple[type[Schema], EdgeField, type[Schema]]] = []
+    for schema_class in schema_classes:
+        schema = schema_class()
+        for field in schema.get_all_fields():
+            # The edges to patterns do not have a single target table
+            if isinstance(field, EdgeField) and issubclass(field.edge_class, Schema):
+                edges.append((schema_class, field, field.edge_class))
+
+    reverse_edges: dict[type[Schema], list[ReverseEdge]] = {}
+    for source_class, field, target_class in edges:
+        source_name = pluralize(
+            to_snake_case(
+                source_class.__name__.removeprefix("Ent").removesuffix("Schema")
+            )
+        )
+        is_ambiguous = (
+            sum(
+                1
+                for other_source, _, other_target in edges
+                if other_source is source_class and other_target is target_class
+            )
+            > 1
+        )
+        name = field.reverse_name or (
+            f"{source_name}_by_{field.original_name}" if is_ambiguous else source_name
+        )
+        reverse_edges.setdefault(target_class, []).append(
+            ReverseEdge(source_class=source_class, field=field, name=name)
+        )
+
+    for target_class, target_edges in reverse_edges.items():
+        names = [edge.name for edge in target_edges]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(
+                f"Duplicate reverse edges for {target_class.__name__}: "
+                + f"{', '.join(duplicates)}. "
+                + "Use EdgeField.reverse_edge() to name them."
+            )
+        _check_name_collisions(target_class, target_edges)
+    return reverse_edges
+
+
+def _check_name_collisions(
+    target_class: type[Schema], target_edges: list[ReverseEdge]
+) -> None:
+    """Make sure the reverse edges do not shadow a field or a function of the Ent."""
+    target = target_class()
+    taken = set(_ENT_MEMBER_NAMES)
+    for field in target.get_all_fields():
+        taken |= {field.name, field.original_name}
+        if isinstance(field, EdgeField):
+            taken.add(f"gen_{field.original_name}")
+        if field.is_unique:
+            taken |= _get_unique_member_names(field.name)
+    for index in target.get_composite_indexes():
+        if index.unique:
+            taken |= _get_unique_member_names("_and_".join(index.field_names))
+
+    for edge in target_edges:
+        names = _get_member_names(edge.name)
+        collisions = sorted(taken & names)
+        if collisions:
+            raise ValueError(
+                f"The reverse edge {edge.name} of "
+                + f"{edge.source_class.__name__}.{edge.field.original_name} "
+                + f"collides with {target_class.__name__}: "
+                + f"{', '.join(collisions)}. "
+                + "Use EdgeField.reverse_edge() to rename it."
+            )
+        # The other reverse edges must not collide with this one either
+        taken |= names
+
+
+def _get_member_names(reverse_name: str) -> set[str]:
+    """The name of the reverse edge and the functions `generate` adds for it."""
+    return {
+        reverse_name,
+        f"query_{reverse_name}",
+        f"gen_{reverse_name}",
+        f"gen_{reverse_name}_count_NO_PRIVACY",
+        f"gen_{reverse_name}_many",
+    }
+
+
+def _get_unique_member_names(suffix: str) -> set[str]:
+    return {
+        f"gen_from_{suffix}",
+        f"genx_from_{suffix}",
+        f"gen_many_from_{suffix}",
+        f"genx_many_from_{suffix}",
+    }
+
+
+def generate(
+    reverse_edges: list[ReverseEdge], base_name: str, vc_name: str
+) -> GeneratedContent:
+    code = ""
+    type_checking_imports = []
+    for edge in reverse_edges:
+        source_name = edge.source_class.__name__.removesuffix("Schema")
+        column = f"{source_name}Model.{edge.field.name}"
+        variable = to_snake_case(base_name.removeprefix("Ent"))
+        load = ""
+        if source_name != base_name:
+            module = "." + to_snake_case(source_name)
+            type_checking_imports.append(
+                f"from {module} import {source_name}, {source_name}Query"
+            )
+            load = f"from {module} import {source_name}, {source_name}Model\n        "
+        code += f"""
+    def query_{edge.name}(self) -> {source_name}Query:
+        \"\"\"
+        The {source_name} whose {edge.field.original_name} is this {base_name}.
+        Only the shard of this {base_name} is queried, so when sharding,
+        create them within `use_shard(get_shard_id({variable}.id))`.
+        \"\"\"
+        {load}query = {source_name}.query(self.vc).where({column} == self.id)
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_{edge.name}(self) -> list[{source_name}]:
+        return await self.query_{edge.name}().gen()
+
+    async def gen_{edge.name}_count_NO_PRIVACY(self) -> int:
+        return await self.query_{edge.name}().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_{edge.name}_many(
+        cls, vc: {vc_name}, ents: Sequence[{base_name}]
+    ) -> dict[UUID, list[{source_name}]]:
+        \"\"\"Load the {edge.name} of several {base_name} in batch.\"\"\"
+        {load}ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[{source_name}]] = {{ent_id: [] for ent_id in ent_ids}}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = {source_name}.query(vc).where({column}.in_(chunk))
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.{edge.field.name}
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
+"""  # noqa: E501
+    imports = (
+        [
+            "from entpy.framework.loader import MAX_IDS_PER_QUERY",
+            "from entpy.framework.sharding import get_shard_id, group_by_shard",
+        ]
+        if code
+        else []
+    )
+    return GeneratedContent(
+        imports=imports,
+        type_checking_imports=type_checking_imports,
+        code=code,
+    )
@@ -8,6 +8,9 @@ from entpy.gencode.introspection_generator import generate as generate_introspec
 from entpy.gencode.model_generator import generate as generate_model
 from entpy.gencode.mutator_generator import generate as generate_mutator
 from entpy.gencode.query_generator import generate as generate_query
+from entpy.gencode.reverse_edge_generator import ReverseEdge
+from entpy.gencode.session_generator import generate as generate_session
+from entpy.gencode.session_generator import get_read_session_getter_fn_name
 
 
 def generate(
@@ -17,6 +20,9 @@ def generate(
     session_getter_fn_name: str,
     vc_import: str,
     vc_name: str,
+    reverse_edges: list[ReverseEdge] | None = None,
+    read_session_getter_import: str | None = None,
+    read_session_getter_fn_name: str | None = None,
 ) -> str:
     schema = schema_class()
     base_name = schema_class.__name__.replace("Schema", "")
@@ -30,17 +36,29 @@ def generate(
     # Validate that field names only contain lowercase letters, numbers, and underscores
     _validate_field_name_format(schema)
 
+    # The Ent and its queries only read, the mutators use the primary session
+    session_content = generate_session(
+        session_getter_fn_name=session_getter_fn_name,
+        read_session_getter_import=read_session_getter_import,
+        read_session_getter_fn_name=read_session_getter_fn_name,
+    )
+    read_getter_fn_name = get_read_session_getter_fn_name(
+        session_getter_fn_name=session_getter_fn_name,
+        read_session_getter_fn_name=read_session_getter_fn_name,
+    )
+
     model_content = generate_model(descriptor=schema, base_name=base_name)
     base_content = generate_base(
         schema=schema,
         base_name=base_name,
-        session_getter_fn_name=session_getter_fn_name,
+        session_getter_fn_name=read_getter_fn_name,
         vc_name=vc_name,
+        reverse_edges=reverse_edges,
     )
     query_content = generate_query(
         descriptor=schema,
         base_name=base_name,
-        session_getter_fn_name=session_getter_fn_name,
+        session_getter_fn_name=read_getter_fn_name,
         vc_name=vc_name,
     )
     mutator_content = generate_mutator(
@@ -52,7 +70,7 @@ def generate(
     example_content = generate_example(
         schema=schema, base_name=base_name, vc_name=vc_name
     )
-    introspection_code = generate_introspection(base_name=base_name)
+    introspection_content = generate_introspection(schema=schema, base_name=base_name)
 
     type_checking_imports = (
         model_content.type_checking_imports
@@ -69,6 +87,8 @@ def generate(
         + query_content.imports
         + mutator_content.imports
         + example_content.imports
+        + introspection_content.imports
+        + session_content.imports
         + _get_patterns_imports(schema)
     )
     if type_checking_imports:
@@ -95,7 +115,7 @@ from abc import ABC
 {session_getter_import}
 {imports_code}
 {type_checking_imports_code}
-
+{session_content.code}
 {model_content.code}
 
 {base_content.code}
@@ -106,7 +126,7 @@ from abc import ABC
 
 {example_content.code}
 
-{introspection_code}
+{introspection_content.code}
 """
 
 
@@ -0,0 +1,36 @@
+from entpy.gencode.generated_content import GeneratedContent
+
+# The function generated in each file when the reads go to a separate session
+_READ_SESSION_GETTER_FN_NAME = "_get_read_session"
+
+
+def get_read_session_getter_fn_name(
+    session_getter_fn_name: str, read_session_getter_fn_name: str | None
+) -> str:
+    """The function the read paths should call to get their session."""
+    if not read_session_getter_fn_name:
+        return session_getter_fn_name
+    return _READ_SESSION_GETTER_FN_NAME
+
+
+def generate(
+    session_getter_fn_name: str,
+    read_session_getter_import: str | None,
+    read_session_getter_fn_name: str | None,
+) -> GeneratedContent:
+    if not read_session_getter_fn_name:
+        return GeneratedContent(code="")
+    imports = [
+        "from entpy.framework.session import get_read_session",
+        "from sqlalchemy.ext.asyncio import AsyncSession",
+    ]
+    if read_session_getter_import:
+        imports.append(read_session_getter_import)
+    return GeneratedContent(
+        imports=imports,
+        code=f"""
+def {_READ_SESSION_GETTER_FN_NAME}() -> AsyncSession:
+    \"\"\"The read session, or the primary one once this context wrote something.\"\"\"
+    return get_read_session({read_session_getter_fn_name}, {session_getter_fn_name})
+""",
+    )
@@ -7,6 +7,15 @@ def to_snake_case(name: str) -> str:
     return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
 
 
+def pluralize(name: str) -> str:
+    """Basic English plural of a snake case name, e.g. `box` -> `boxes`."""
+    if name.endswith(("s", "x", "z", "ch", "sh")):
+        return name + "es"
+    if re.search(r"[^aeiou]y$", name):
+        return name[:-1] + "ies"
+    return name + "s"
+
+
 def get_description(descriptor: Descriptor) -> str:
     content = descriptor.get_description()
     if content:
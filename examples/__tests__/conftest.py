@@ -1,6 +1,12 @@
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
 import pytest
 from database import Base, engine
+from entpy import session_scope
+from entpy.framework.ent_cache import clear_ent_caches
 from evc import ExampleViewerContext
+from sqlalchemy import event
 
 
 @pytest.fixture
@@ -13,3 +19,26 @@ async def setup_database():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+    clear_ent_caches()
+
+
+@pytest.fixture(autouse=True)
+async def session(setup_database: None) -> AsyncIterator[None]:
+    """Each test runs in its own session, the tests opt into the identity map."""
+    async with session_scope(commit=False, identity_map=False):
+        yield
+
+
+@pytest.fixture
+def sql_statements() -> Iterator[list[str]]:
+    """Records the SQL statements sent to the database during the test."""
+    statements: list[str] = []
+
+    def before_cursor_execute(
+        conn: Any, cursor: Any, statement: str, *args: Any
+    ) -> None:
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,44 @@
+import asyncio
+from uuid import uuid4
+
+from entpy import batched_loads
+
+from database import get_session
+from evc import ExampleViewerContext
+from generated.ent_grand_parent import EntGrandParentExample
+from generated.ent_parent import EntParent, EntParentExample
+
+
+async def test_batched_loads_coalesce_gens(
+    vc: ExampleViewerContext, sql_statements: list[str]
+) -> None:
+    grand_parent = await EntGrandParentExample.gen_create(vc)
+    parents = [
+        await EntParentExample.gen_create(vc, grand_parent_id=grand_parent.id)
+        for _ in range(3)
+    ]
+    get_session().expunge_all()
+    sql_statements.clear()
+
+    with batched_loads():
+        results = await asyncio.gather(
+            *[EntParent.gen(vc, parent.id) for parent in parents],
+            EntParent.gen(vc, uuid4()),
+        )
+
+    assert [r.id if r else None for r in results] == [p.id for p in parents] + [None]
+    assert len(sql_statements) == 1, "All the lookups should share one query"
+
+
+async def test_gens_are_not_batched_by_default(
+    vc: ExampleViewerContext, sql_statements: list[str]
+) -> None:
+    parent1 = await EntParentExample.gen_create(vc)
+    parent2 = await EntParentExample.gen_create(vc)
+    get_session().expunge_all()
+    sql_statements.clear()
+
+    await EntParent.gen(vc, parent1.id)
+    await EntParent.gen(vc, parent2.id)
+
+    assert len(sql_statements) == 2
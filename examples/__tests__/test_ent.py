@@ -1,10 +1,14 @@
 import uuid
+from datetime import datetime
+from typing import Self
 
 import pytest
-from entpy import EntNotFoundError, ValidationError
+from entpy import Ent, EntNotFoundError, ValidationError
 
 from ent_test_object_schema import Status
 from evc import ExampleViewerContext
+from generated.ent_child import EntChild, EntChildExample
+from generated.ent_parent import EntParentExample
 from generated.ent_test_object import (
     EntTestObject,
     EntTestObjectExample,
@@ -108,6 +112,54 @@ async def test_gen_and_genx_from_unique_field(vc: ExampleViewerContext) -> None:
         await EntTestObject.genx_from_username(vc, other_username)
 
 
+async def test_gen_many_from_unique_field(
+    vc: ExampleViewerContext, sql_statements: list[str]
+) -> None:
+    usernames = ["vdurmont_" + str(uuid.uuid4()) for _ in range(3)]
+    for username in usernames:
+        await EntTestObjectExample.gen_create(vc, username=username)
+    unknown = "vdurmont_" + str(uuid.uuid4())
+
+    sql_statements.clear()
+    results = await EntTestObject.gen_many_from_username(
+        vc, [usernames[2], unknown, usernames[0], usernames[1]]
+    )
+
+    assert len(sql_statements) == 1, "All the usernames should share one query"
+    assert list(results.keys()) == [usernames[2], unknown, usernames[0], usernames[1]]
+    assert results[unknown] is None
+    for username in usernames:
+        result = results[username]
+        assert result is not None
+        assert result.username == username
+
+    with pytest.raises(EntNotFoundError):
+        await EntTestObject.genx_many_from_username(vc, [usernames[0], unknown])
+
+
+async def test_gen_from_composite_unique_index(vc: ExampleViewerContext) -> None:
+    parent = await EntParentExample.gen_create(vc)
+    benjamin = await EntChildExample.gen_create(vc, parent_id=parent.id, name="Ben")
+    laura = await EntChildExample.gen_create(vc, parent_id=parent.id, name="Laura")
+
+    result = await EntChild.gen_from_parent_id_and_name(vc, parent.id, "Laura")
+    assert result is not None
+    assert result.id == laura.id
+    assert await EntChild.gen_from_parent_id_and_name(vc, parent.id, "Quinn") is None
+
+    results = await EntChild.gen_many_from_parent_id_and_name(
+        vc, [(parent.id, "Ben"), (parent.id, "Quinn"), (parent.id, "Laura")]
+    )
+    assert {key: ent.id if ent else None for key, ent in results.items()} == {
+        (parent.id, "Ben"): benjamin.id,
+        (parent.id, "Quinn"): None,
+        (parent.id, "Laura"): laura.id,
+    }
+
+    with pytest.raises(EntNotFoundError):
+        await EntChild.genx_from_parent_id_and_name(vc, parent.id, "Quinn")
+
+
 async def test_enum_field(vc: ExampleViewerContext) -> None:
     status = Status.SAD
     ent = await EntTestObjectExample.gen_create(vc, status=status)
@@ -158,3 +210,80 @@ async def test_genx_with_invalid_string_id(vc: ExampleViewerContext) -> None:
     """Test that genx raises ValidationError for invalid UUID strings."""
     with pytest.raises(ValidationError, match="Invalid ID format"):
         await EntTestObject.genx(vc, "not-a-valid-uuid")
+
+
+async def test_gen_many(vc: ExampleViewerContext, sql_statements: list[str]) -> None:
+    ent1 = await EntTestObjectExample.gen_create(vc)
+    ent2 = await EntTestObjectExample.gen_create(vc)
+    unknown_id = uuid.uuid4()
+    sql_statements.clear()
+
+    result = await EntTestObject.gen_many(vc, [ent2.id, unknown_id, str(ent1.id)])
+
+    assert list(result.keys()) == [ent2.id, unknown_id, ent1.id], "keep the order"
+    result1 = result[ent1.id]
+    assert result1 is not None and result1.id == ent1.id
+    result2 = result[ent2.id]
+    assert result2 is not None and result2.id == ent2.id
+    assert result[unknown_id] is None
+    assert len(sql_statements) == 1, "gen_many should load all the IDs at once"
+
+
+async def test_genx_many(vc: ExampleViewerContext) -> None:
+    ent1 = await EntTestObjectExample.gen_create(vc)
+    ent2 = await EntTestObjectExample.gen_create(vc)
+
+    result = await EntTestObject.genx_many(vc, [ent1.id, ent2.id])
+    assert [ent.id for ent in result.values()] == [ent1.id, ent2.id]
+
+    with pytest.raises(EntNotFoundError):
+        await EntTestObject.genx_many(vc, [ent1.id, uuid.uuid4()])
+
+
+class HandWrittenEnt(Ent[ExampleViewerContext]):
+    """An Ent which only implements the abstract members of `Ent`."""
+
+    def __init__(self, ent: EntTestObject) -> None:
+        self.ent = ent
+
+    @property
+    def id(self) -> uuid.UUID:
+        return self.ent.id
+
+    @property
+    def created_at(self) -> datetime:
+        return self.ent.created_at
+
+    @property
+    def updated_at(self) -> datetime:
+        return self.ent.updated_at
+
+    @classmethod
+    async def gen(
+        cls, vc: ExampleViewerContext, ent_id: uuid.UUID | str
+    ) -> Self | None:
+        ent = await EntTestObject.gen(vc, ent_id)
+        return cls(ent) if ent else None
+
+    @classmethod
+    async def genx(cls, vc: ExampleViewerContext, ent_id: uuid.UUID | str) -> Self:
+        return cls(await EntTestObject.genx(vc, ent_id))
+
+
+async def test_hand_written_ent_gets_the_default_gen_many(
+    vc: ExampleViewerContext,
+) -> None:
+    ent1 = await EntTestObjectExample.gen_create(vc)
+    unknown_id = uuid.uuid4()
+
+    result = await HandWrittenEnt.gen_many(vc, [str(ent1.id), unknown_id])
+
+    assert list(result.keys()) == [ent1.id, unknown_id]
+    result1 = result[ent1.id]
+    assert result1 is not None and result1.ent.id == ent1.id
+    assert result[unknown_id] is None
+    await HandWrittenEnt.gen_prefetch(vc, [result1], [])
+    with pytest.raises(ValidationError, match="Unknown edge"):
+        await HandWrittenEnt.gen_prefetch(vc, [result1], ["parent"])
+    with pytest.raises(ValidationError):
+        await HandWrittenEnt.gen_many(vc, ["not-a-valid-uuid"])
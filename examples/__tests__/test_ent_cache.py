@@ -0,0 +1,150 @@
+from collections.abc import AsyncIterator
+from typing import Any
+from uuid import uuid4
+
+import pytest
+from database import Base, get_session
+from entpy import CachePolicy
+from entpy.framework.ent_cache import EntCache, get_ent_cache
+from entpy.framework.loader import gen_model_by_id
+from evc import ExampleViewerContext
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from generated.ent_test_object5 import (
+    EntTestObject5,
+    EntTestObject5Example,
+    EntTestObject5Model,
+    EntTestObject5Mutator,
+)
+
+
+async def test_cached_ents_skip_the_database(
+    vc: ExampleViewerContext, sql_statements: list[str]
+) -> None:
+    ent = await EntTestObject5Example.gen_create(vc, obj5_field="cached")
+    await get_session().commit()
+    get_session().expunge_all()
+    await EntTestObject5.genx(vc, ent.id)
+
+    get_session().expunge_all()
+    sql_statements.clear()
+    loaded = await EntTestObject5.genx(vc, ent.id)
+    many = await EntTestObject5.gen_many(vc, [ent.id])
+
+    assert sql_statements == []
+    assert loaded.obj5_field == "cached"
+    assert many[ent.id] is not None
+
+
+async def test_uncommitted_ents_are_not_cached(vc: ExampleViewerContext) -> None:
+    ent = await EntTestObject5Example.gen_create(vc, obj5_field="rolled back")
+    ent_id = ent.id
+    get_session().expunge_all()
+    # Loaded before the commit, the row is only cached once it is committed
+    await EntTestObject5.genx(vc, ent_id)
+    await get_session().rollback()
+
+    cache = get_ent_cache(EntTestObject5Model)
+    assert cache is not None and cache.get(ent_id) is None
+    assert await EntTestObject5.gen(vc, ent_id) is None
+
+
+async def test_ents_are_cached_on_commit(vc: ExampleViewerContext) -> None:
+    ent = await EntTestObject5Example.gen_create(vc, obj5_field="committed")
+    get_session().expunge_all()
+    await EntTestObject5.genx(vc, ent.id)
+    cache = get_ent_cache(EntTestObject5Model)
+    assert cache is not None and cache.get(ent.id) is None
+
+    await get_session().commit()
+    values = cache.get(ent.id)
+    assert values is not None and values["obj5_field"] == "committed"
+
+
+async def test_mutations_invalidate_the_cache(vc: ExampleViewerContext) -> None:
+    ent = await EntTestObject5Example.gen_create(vc, obj5_field="before")
+    get_session().expunge_all()
+    await EntTestObject5.genx(vc, ent.id)
+
+    mut = EntTestObject5Mutator.update(vc, await EntTestObject5.genx(vc, ent.id))
+    mut.obj5_field = "after"
+    await mut.gen_savex()
+    get_session().expunge_all()
+
+    loaded = await EntTestObject5.genx(vc, ent.id)
+    assert loaded.obj5_field == "after"
+
+    await EntTestObject5Mutator.delete(vc, loaded).gen_save()
+    get_session().expunge_all()
+    assert await EntTestObject5.gen(vc, ent.id) is None
+
+
+@pytest.fixture
+async def other_session() -> AsyncIterator[AsyncSession]:
+    """The session of another request, on a database of its own."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = AsyncSession(engine)
+    yield session
+    await session.close()
+    await engine.dispose()
+
+
+async def test_reads_before_the_commit_are_not_cached(
+    vc: ExampleViewerContext, other_session: AsyncSession
+) -> None:
+    ent = await EntTestObject5Example.gen_create(vc, obj5_field="before")
+    await get_session().commit()
+    # The other request only sees the committed row until the commit
+    other_session.add(
+        EntTestObject5Model(
+            id=ent.id,
+            obj5_field="before",
+            is_it_true=ent.is_it_true,
+            created_at=ent.created_at,
+            updated_at=ent.updated_at,
+        )
+    )
+    await other_session.commit()
+
+    mut = EntTestObject5Mutator.update(vc, ent)
+    mut.obj5_field = "after"
+    await mut.gen_savex()
+    await gen_model_by_id(other_session, EntTestObject5Model, ent.id)
+    cache = get_ent_cache(EntTestObject5Model)
+    assert cache is not None and cache.get(ent.id) is not None
+    await get_session().commit()
+
+    assert cache.get(ent.id) is None
+    get_session().expunge_all()
+    loaded = await EntTestObject5.genx(vc, ent.id)
+    assert loaded.obj5_field == "after"
+
+
+def test_cache_policy_is_enforced(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 0.0
+    monkeypatch.setattr("entpy.framework.ent_cache.monotonic", lambda: now)
+    cache = EntCache(CachePolicy(ttl_seconds=10, max_size=2))
+    first, second, third = (uuid4() for _ in range(3))
+
+    cache.set(first, {"value": 1})
+    cache.set(second, {"value": 2})
+    cache.get(first)
+    cache.set(third, {"value": 3})
+    # The least recently used entry is evicted
+    assert cache.get(second) is None
+    assert cache.get(first) == {"value": 1}
+
+    now = 11.0
+    assert cache.get(first) is None
+
+
+def test_cache_keeps_its_own_copy() -> None:
+    cache = EntCache(CachePolicy(ttl_seconds=10))
+    ent_id = uuid4()
+    values: dict[str, Any] = {"tags": ["a"]}
+
+    cache.set(ent_id, values)
+    values["tags"].append("b")
+
+    assert cache.get(ent_id) == {"tags": ["a"]}
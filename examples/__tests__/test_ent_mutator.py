@@ -9,7 +9,11 @@ from generated.ent_test_object import (
     EntTestObjectExample,
     EntTestObjectMutator,
 )
-from generated.ent_test_object5 import EntTestObject5Example, EntTestObject5Mutator
+from generated.ent_test_object5 import (
+    EntTestObject5,
+    EntTestObject5Example,
+    EntTestObject5Mutator,
+)
 from generated.ent_test_sub_object import EntTestSubObject  # noqa: F401
 
 
@@ -108,3 +112,72 @@ async def test_create_with_boolfield_with_default(vc: ExampleViewerContext) -> N
     ent = await EntTestObject5Mutator.create(vc=vc, obj5_field="Yo!").gen_savex()
     assert ent is not None
     assert ent.is_it_true
+
+
+async def test_create_many(vc: ExampleViewerContext, sql_statements: list[str]) -> None:
+    actions = [
+        EntTestObject5Mutator.create(vc=vc, obj5_field=f"Bulk {i}") for i in range(10)
+    ]
+    sql_statements.clear()
+    ents = await EntTestObject5Mutator.create_many(vc, actions).gen_savex()
+
+    inserts = [s for s in sql_statements if s.startswith("INSERT")]
+    assert len(inserts) == 1, "All the rows should be inserted in one statement"
+    assert [ent.obj5_field for ent in ents] == [f"Bulk {i}" for i in range(10)]
+    assert [ent.id for ent in ents] == [action.id for action in actions]
+
+    ents_by_id = await EntTestObject5.gen_many(vc, [ent.id for ent in ents])
+    assert len(ents_by_id) == 10, "Created ents should be loadable"
+
+
+async def test_create_many_validates_before_writing(
+    vc: ExampleViewerContext,
+) -> None:
+    obj5 = await EntTestObject5Example.gen_create(vc)
+    actions = [
+        EntTestObjectMutator.create(
+            vc=vc,
+            a_good_thing="Eating cheese",
+            username=f"bulk{i}",
+            firstname="Vincent",
+            required_sub_object_id=uuid.uuid4(),
+            obj5_id=obj5.id,
+            validated_field="Yolo" if i == 2 else None,
+        )
+        for i in range(3)
+    ]
+    with pytest.raises(ValidationError):
+        await EntTestObjectMutator.create_many(vc, actions).gen_save()
+
+    count = await EntTestObject.query(vc).gen_count_NO_PRIVACY()
+    assert count == 0, "No row should be written if one of them is invalid"
+
+
+async def test_update_writes_changed_fields_only(
+    vc: ExampleViewerContext, sql_statements: list[str]
+) -> None:
+    ent = await EntTestObjectExample.gen_create(vc=vc)
+
+    mut = EntTestObjectMutator.update(vc, ent)
+    mut.firstname = "Chris"
+    sql_statements.clear()
+    ent = await mut.gen_savex()
+
+    assert len(sql_statements) == 1, "The update should not reload the row"
+    update = sql_statements[0]
+    assert update.startswith("UPDATE")
+    assert "firstname" in update
+    assert "lastname" not in update, "Unchanged fields should not be written"
+
+
+async def test_update_noop(vc: ExampleViewerContext, sql_statements: list[str]) -> None:
+    ent = await EntTestObjectExample.gen_create(vc=vc)
+    updated_at = ent.updated_at
+
+    mut = EntTestObjectMutator.update(vc, ent)
+    mut.firstname = ent.firstname
+    sql_statements.clear()
+    ent = await mut.gen_savex()
+
+    assert sql_statements == [], "A no-op update should not touch the database"
+    assert ent.updated_at == updated_at
@@ -8,6 +8,8 @@ from generated.ent_test_object2 import (
 from generated.ent_test_thing import IEntTestThing, IEntTestThingMutator
 from generated.ent_test_thing_view import EntTestThingView
 from generated.ent_test_object5 import EntTestObject5Example
+from generated.ent_parent import EntParentExample
+from database import get_session
 from evc import ExampleViewerContext
 from ent_test_thing_pattern import ThingStatus
 
@@ -29,6 +31,57 @@ async def test_genx_from_pattern(vc: ExampleViewerContext) -> None:
     assert isinstance(result, EntTestObject), "we should get the right type"
 
 
+async def test_gen_from_pattern_dispatches_on_the_id(
+    vc: ExampleViewerContext, sql_statements: list[str]
+) -> None:
+    ent = await EntTestObject2Example.gen_create(vc)
+    parent = await EntParentExample.gen_create(vc)
+    get_session().expunge_all()
+    sql_statements.clear()
+
+    result = await IEntTestThing.genx(vc, ent.id)
+
+    assert result.id == ent.id
+    assert len(sql_statements) == 1, "only the right implementation is queried"
+    assert await IEntTestThing.gen(vc, parent.id) is None, "not an IEntTestThing"
+
+
+async def test_query_loads_each_implementation_once(
+    vc: ExampleViewerContext, sql_statements: list[str]
+) -> None:
+    things = [
+        await EntTestObjectExample.gen_create(vc=vc),
+        await EntTestObject2Example.gen_create(vc=vc),
+        await EntTestObject2Example.gen_create(vc=vc),
+        await EntTestObjectExample.gen_create(vc=vc),
+    ]
+    get_session().expunge_all()
+    sql_statements.clear()
+
+    ents = (
+        await IEntTestThing.query_ent_test_thing(vc)
+        .order_by(EntTestThingView.id.desc())
+        .gen()
+    )
+
+    assert [ent.id for ent in ents] == sorted(
+        [thing.id for thing in things], reverse=True
+    ), "the order of the view is preserved"
+    assert len(sql_statements) == 3, "1 query for the view + 1 per implementation"
+
+
+async def test_gen_many_from_pattern(vc: ExampleViewerContext) -> None:
+    obj = await EntTestObjectExample.gen_create(vc=vc)
+    obj2 = await EntTestObject2Example.gen_create(vc=vc)
+    parent = await EntParentExample.gen_create(vc)
+
+    ents = await IEntTestThing.gen_many(vc, [obj2.id, str(obj.id), parent.id])
+
+    assert list(ents.keys()) == [obj2.id, obj.id, parent.id]
+    assert isinstance(ents[obj.id], EntTestObject)
+    assert ents[parent.id] is None
+
+
 async def test_query_across_schemas(vc: ExampleViewerContext) -> None:
     red = await EntTestObjectExample.gen_create(vc=vc, a_good_thing="red")
     blue = await EntTestObjectExample.gen_create(vc=vc, a_good_thing="blue")
@@ -1,6 +1,8 @@
+import pytest
+from entpy import ValidationError
 from uuid import uuid4
 from datetime import datetime, UTC, timedelta
-from generated.ent_grand_parent import EntGrandParentExample
+from generated.ent_grand_parent import EntGrandParent, EntGrandParentExample
 from generated.ent_parent import EntParentExample, EntParentModel
 from generated.ent_child import EntChildExample, EntChild, EntChildModel
 from generated.ent_test_object import (
@@ -9,6 +11,9 @@ from generated.ent_test_object import (
     EntTestObjectModel,
 )
 from generated.ent_test_sub_object import EntTestSubObject  # noqa: F401
+from generated.ent_test_object2 import EntTestObject2Example
+from generated.ent_test_thing import IEntTestThing
+from database import get_session
 from evc import ExampleViewerContext
 
 
@@ -103,3 +108,133 @@ async def test_ent_query_count(vc: ExampleViewerContext) -> None:
     )
 
     assert results == 3
+
+
+async def test_gen_stream(vc: ExampleViewerContext) -> None:
+    ents = [await EntTestObjectExample.gen_create(vc) for _ in range(5)]
+    get_session().expunge_all()
+
+    ids = []
+    async for ent in EntTestObject.query(vc).order_by_id_asc().gen_stream(chunk_size=2):
+        ids.append(ent.id)
+
+    assert ids == sorted(ent.id for ent in ents)
+    assert not any(
+        isinstance(model, EntTestObjectModel)
+        for model in get_session().identity_map.values()
+    ), "the streamed models are released"
+
+
+async def test_gen_stream_keeps_the_models_of_the_caller(
+    vc: ExampleViewerContext,
+) -> None:
+    ents = [await EntTestObjectExample.gen_create(vc) for _ in range(4)]
+    get_session().expunge_all()
+    before = await EntTestObject.genx(vc, ents[0].id)
+
+    sub_objects = []
+    async for ent in EntTestObject.query(vc).order_by_id_asc().gen_stream(chunk_size=2):
+        sub_objects.append(await ent.gen_required_sub_object())
+
+    session = get_session()
+    assert before.model in session, "loaded before the stream"
+    assert all(
+        sub_object.model in session for sub_object in sub_objects
+    ), "loaded by the caller"
+
+
+async def test_gen_stream_on_a_pattern(vc: ExampleViewerContext) -> None:
+    ents = [
+        await EntTestObjectExample.gen_create(vc),
+        await EntTestObject2Example.gen_create(vc),
+        await EntTestObjectExample.gen_create(vc),
+    ]
+    get_session().expunge_all()
+
+    ids = [
+        ent.id
+        async for ent in IEntTestThing.query_ent_test_thing(vc)
+        .order_by_id_desc()
+        .gen_stream(chunk_size=2)
+    ]
+
+    assert ids == sorted((ent.id for ent in ents), reverse=True)
+    assert len(get_session().identity_map) == 0
+
+
+async def test_prefetch(vc: ExampleViewerContext, sql_statements: list[str]) -> None:
+    thing = await EntTestObject2Example.gen_create(vc)
+    for _ in range(3):
+        await EntTestObjectExample.gen_create(vc, some_pattern_id=thing.id)
+    get_session().expunge_all()
+    sql_statements.clear()
+
+    ents = (
+        await EntTestObject.query(vc)
+        .prefetch("obj5", "required_sub_object", "some_pattern")
+        .gen()
+    )
+    # 1 for the query + 1 per edge
+    assert len(sql_statements) == 4
+
+    sql_statements.clear()
+    for ent in ents:
+        await ent.gen_obj5()
+        await ent.gen_required_sub_object()
+        some_pattern = await ent.gen_some_pattern()
+        assert some_pattern is not None
+        assert some_pattern.id == thing.id
+    assert sql_statements == [], "the edges were prefetched"
+
+
+async def test_prefetch_on_a_pattern(
+    vc: ExampleViewerContext, sql_statements: list[str]
+) -> None:
+    await EntTestObjectExample.gen_create(vc)
+    await EntTestObject2Example.gen_create(vc)
+    get_session().expunge_all()
+    sql_statements.clear()
+
+    ents = await IEntTestThing.query_ent_test_thing(vc).prefetch("obj5").gen()
+    sql_statements.clear()
+    for ent in ents:
+        await ent.gen_obj5()
+
+    assert sql_statements == []
+
+
+async def test_prefetch_unknown_edge(vc: ExampleViewerContext) -> None:
+    await EntTestObjectExample.gen_create(vc)
+
+    with pytest.raises(ValidationError):
+        await EntTestObject.query(vc).prefetch("nope").gen()
+
+
+async def test_reverse_edges(
+    vc: ExampleViewerContext, sql_statements: list[str]
+) -> None:
+    grand_parent1 = await EntGrandParentExample.gen_create(vc, name="Anne")
+    grand_parent2 = await EntGrandParentExample.gen_create(vc, name="Michael")
+    grand_parent3 = await EntGrandParentExample.gen_create(vc, name="Nobody")
+    parent1 = await EntParentExample.gen_create(vc, grand_parent_id=grand_parent1.id)
+    parent2 = await EntParentExample.gen_create(vc, grand_parent_id=grand_parent1.id)
+    parent3 = await EntParentExample.gen_create(vc, grand_parent_id=grand_parent2.id)
+
+    parents = await grand_parent1.query_parents().order_by_id_asc().gen()
+    assert [parent.id for parent in parents] == sorted([parent1.id, parent2.id])
+    assert await grand_parent1.gen_parents_count_NO_PRIVACY() == 2
+    assert [parent.id for parent in await grand_parent2.gen_parents()] == [parent3.id]
+
+    sql_statements.clear()
+    parents_by_grand_parent = await EntGrandParent.gen_parents_many(
+        vc, [grand_parent1, grand_parent2, grand_parent3]
+    )
+    assert len(sql_statements) == 1
+    assert {
+        grand_parent_id: sorted(parent.id for parent in parents)
+        for grand_parent_id, parents in parents_by_grand_parent.items()
+    } == {
+        grand_parent1.id: sorted([parent1.id, parent2.id]),
+        grand_parent2.id: [parent3.id],
+        grand_parent3.id: [],
+    }
@@ -0,0 +1,50 @@
+import shutil
+from pathlib import Path
+from typing import Any
+
+import pytest
+from entpy.gencode.generator import run
+
+from benchmark_gencode import write_schemas
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("uv") is None, reason="The gencode formats the code with uv"
+)
+
+
+def _run(output_directory: str, **kwargs: Any) -> None:
+    run(
+        schemas_directory=".",
+        output_directory=output_directory,
+        base_import="from database import Base",
+        session_getter_import="from database import get_session",
+        session_getter_fn_name="get_session",
+        vc_import="from evc import ExampleViewerContext",
+        vc_name="ExampleViewerContext",
+        **kwargs,
+    )
+
+
+def _read_files(path: Path) -> dict[str, bytes]:
+    return {file.name: file.read_bytes() for file in sorted(path.glob("*.py"))}
+
+
+def test_pool_output_is_identical(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # The schemas are imported relatively to the working directory
+    write_schemas(tmp_path, 8)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    _run("./single", max_workers=1)
+    _run("./pool", max_workers=2, min_descriptors_for_pool=0)
+
+    single = _read_files(tmp_path / "single")
+    assert len(single) == 11
+    assert _read_files(tmp_path / "pool") == single
+
+
+def test_max_workers_is_validated() -> None:
+    with pytest.raises(ValueError):
+        _run("./generated", max_workers=0)
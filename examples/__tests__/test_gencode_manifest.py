@@ -0,0 +1,158 @@
+import os
+import re
+from pathlib import Path
+
+import pytest
+from entpy.gencode.generator import run
+from entpy.gencode.manifest import Manifest, get_source_files
+
+from ent_grand_parent_schema import EntGrandParentSchema
+from ent_parent_schema import EntParentSchema
+
+EXAMPLES_PATH = Path(__file__).parent.parent.resolve()
+
+# The schemas are imported once per process, so the incremental test uses its own
+GRAND_PARENT_SCHEMA = """
+from entpy import Action, AllowAll, Field, PrivacyRule, Schema, StringField
+
+
+class EntIncrementalGrandParentSchema(Schema):
+    def get_fields(self) -> list[Field]:
+        return [StringField("name", 100).not_null().example("Anne")]
+
+    def get_privacy_rules(self, action: Action) -> list[PrivacyRule]:
+        return [AllowAll()]
+"""
+PARENT_SCHEMA = """
+from entpy import Action, AllowAll, EdgeField, Field, PrivacyRule, Schema
+from ent_incremental_grand_parent_schema import EntIncrementalGrandParentSchema
+
+
+class EntIncrementalParentSchema(Schema):
+    def get_fields(self) -> list[Field]:
+        return [EdgeField("grand_parent", EntIncrementalGrandParentSchema).not_null()]
+
+    def get_privacy_rules(self, action: Action) -> list[PrivacyRule]:
+        return [AllowAll()]
+"""
+OTHER_SCHEMA = """
+from entpy import Action, AllowAll, Field, PrivacyRule, Schema, StringField
+
+
+class EntIncrementalOtherSchema(Schema):
+    def get_fields(self) -> list[Field]:
+        return [StringField("name", 100)]
+
+    def get_privacy_rules(self, action: Action) -> list[PrivacyRule]:
+        return [AllowAll()]
+"""
+
+
+def test_source_files_include_the_imported_schemas() -> None:
+    files = get_source_files(
+        EntParentSchema, EXAMPLES_PATH, EXAMPLES_PATH / "generated"
+    )
+    assert EXAMPLES_PATH / "ent_parent_schema.py" in files
+    assert EXAMPLES_PATH / "ent_grand_parent_schema.py" in files
+
+    files = get_source_files(
+        EntGrandParentSchema, EXAMPLES_PATH, EXAMPLES_PATH / "generated"
+    )
+    assert files == {EXAMPLES_PATH / "ent_grand_parent_schema.py"}
+
+
+def test_manifest_detects_changes(tmp_path: Path) -> None:
+    file_path = tmp_path / "ent_test_object.py"
+    file_path.write_text("generated")
+    manifest = Manifest.load(tmp_path)
+    assert not manifest.is_up_to_date(file_path, "inputs")
+
+    manifest.record(file_path, "inputs", b"generated")
+    manifest.save({file_path.name})
+    manifest = Manifest.load(tmp_path)
+    assert manifest.is_up_to_date(file_path, "inputs")
+    assert not manifest.is_up_to_date(file_path, "other inputs")
+
+    # The file was edited since it was generated
+    file_path.write_text("edited")
+    assert not manifest.is_up_to_date(file_path, "inputs")
+
+
+def test_manifest_forgets_the_files_not_generated_anymore(tmp_path: Path) -> None:
+    file_path = tmp_path / "ent_test_object.py"
+    file_path.write_text("generated")
+    manifest = Manifest.load(tmp_path)
+    manifest.record(file_path, "inputs", b"generated")
+    manifest.save(set())
+
+    assert not Manifest.load(tmp_path).is_up_to_date(file_path, "inputs")
+
+
+def _run_gencode(capsys: pytest.CaptureFixture[str]) -> set[str]:
+    """Run the gencode and return the names of the descriptors it generated."""
+    capsys.readouterr()
+    run(
+        schemas_directory=".",
+        output_directory="./generated",
+        base_import="from database import Base",
+        session_getter_import="from database import get_session",
+        session_getter_fn_name="get_session",
+        vc_import="from evc import ExampleViewerContext",
+        vc_name="ExampleViewerContext",
+        max_workers=1,
+    )
+    return set(re.findall(r"^Processing: (\w+)$", capsys.readouterr().out, re.M))
+
+
+def test_gencode_only_generates_the_changed_schemas(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    # The schemas are imported relatively to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    # The formatting does not decide which files are generated, and needs uv
+    monkeypatch.setattr(
+        "entpy.gencode.generator.subprocess.run", lambda *args, **kwargs: None
+    )
+    grand_parent_path = tmp_path / "ent_incremental_grand_parent_schema.py"
+    grand_parent_path.write_text(GRAND_PARENT_SCHEMA)
+    parent_path = tmp_path / "ent_incremental_parent_schema.py"
+    parent_path.write_text(PARENT_SCHEMA)
+    (tmp_path / "ent_incremental_other_schema.py").write_text(OTHER_SCHEMA)
+    all_schemas = {
+        "EntIncrementalGrandParentSchema",
+        "EntIncrementalOtherSchema",
+        "EntIncrementalParentSchema",
+    }
+
+    assert _run_gencode(capsys) == all_schemas
+    generated_paths = list((tmp_path / "generated").glob("*.py"))
+    assert len(generated_paths) == 6
+    # Go back in time, so that any write shows up in the mtimes
+    for path in generated_paths:
+        os.utime(path, ns=(0, 0))
+
+    assert _run_gencode(capsys) == set()
+    assert [path.stat().st_mtime_ns for path in generated_paths] == [0] * 6
+
+    # The parent imports the grand parent schema
+    grand_parent_path.write_text(GRAND_PARENT_SCHEMA + "\n# Edited\n")
+    assert _run_gencode(capsys) == {
+        "EntIncrementalGrandParentSchema",
+        "EntIncrementalParentSchema",
+    }
+
+    # The grand parent has the reverse edges of the parent
+    parent_path.write_text(PARENT_SCHEMA + "\n# Edited\n")
+    assert _run_gencode(capsys) == {
+        "EntIncrementalGrandParentSchema",
+        "EntIncrementalParentSchema",
+    }
+
+    # A generated file that was edited by hand is generated again
+    other_path = tmp_path / "generated" / "ent_incremental_other.py"
+    other_path.write_text("edited")
+    assert _run_gencode(capsys) == {"EntIncrementalOtherSchema"}
+    assert other_path.read_text() != "edited"
@@ -0,0 +1,50 @@
+from collections.abc import Iterator
+from datetime import UTC, datetime
+
+import pytest
+from entpy import configure_uuids, generate_uuid, generate_uuids
+
+from generated.all_models import UUID_TO_ENT
+from generated.ent_test_object import EntTestObject
+
+
+@pytest.fixture
+def monotonic_uuids() -> Iterator[None]:
+    configure_uuids(monotonic=True)
+    yield
+    configure_uuids(monotonic=False)
+
+
+def test_generate_uuid_layout() -> None:
+    created_at = datetime(2024, 5, 17, 12, 30, tzinfo=UTC)
+    ent_id = generate_uuid(EntTestObject, created_at)
+
+    timestamp_ms = int.from_bytes(ent_id.bytes[:6])
+    assert timestamp_ms == int(created_at.timestamp() * 1000)
+    assert UUID_TO_ENT[ent_id.bytes[6:8]] is EntTestObject
+    assert ent_id.bytes[8:10] == b"\x00\x00"
+
+
+def test_generate_uuids() -> None:
+    created_at = datetime(2024, 5, 17, 12, 30, tzinfo=UTC)
+    ent_ids = generate_uuids(EntTestObject, 1000, created_at)
+
+    assert len(set(ent_ids)) == 1000, "The IDs should be unique"
+    assert {ent_id.bytes[:10] for ent_id in ent_ids} == {
+        generate_uuid(EntTestObject, created_at).bytes[:10]
+    }, "Only the random bytes should differ"
+
+
+@pytest.mark.usefixtures("monotonic_uuids")
+def test_monotonic_uuids() -> None:
+    created_at = datetime(2024, 5, 17, 12, 30, tzinfo=UTC)
+    ent_ids = generate_uuids(EntTestObject, 100, created_at)
+    ent_ids += [generate_uuid(EntTestObject, created_at) for _ in range(100)]
+
+    assert ent_ids == sorted(ent_ids), "The IDs should be strictly increasing"
+    assert len(set(ent_ids)) == 200
+    assert UUID_TO_ENT[ent_ids[-1].bytes[6:8]] is EntTestObject
+
+    # Older dates are still supported, they are just not ordered
+    older = generate_uuid(EntTestObject, datetime(2020, 1, 1, tzinfo=UTC))
+    assert older < ent_ids[0]
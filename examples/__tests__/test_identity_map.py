@@ -0,0 +1,71 @@
+from collections.abc import Sequence
+
+import pytest
+from entpy import Action, Decision, PrivacyRule, use_identity_map
+
+import generated.ent_parent
+from database import get_session
+from evc import ExampleViewerContext
+from generated.ent_parent import EntParent, EntParentExample, EntParentMutator
+
+
+class CountingRule(PrivacyRule[ExampleViewerContext, EntParent]):
+    def __init__(self) -> None:
+        self.evaluations = 0
+
+    async def gen_evaluate(self, vc: ExampleViewerContext, ent: EntParent) -> Decision:
+        self.evaluations += 1
+        return Decision.ALLOW
+
+
+@pytest.fixture
+def rule(monkeypatch: pytest.MonkeyPatch) -> CountingRule:
+    rule = CountingRule()
+
+    def get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+        return [rule]
+
+    monkeypatch.setattr(generated.ent_parent, "_get_privacy_rules", get_privacy_rules)
+    return rule
+
+
+async def test_ents_are_loaded_once(
+    vc: ExampleViewerContext, rule: CountingRule, sql_statements: list[str]
+) -> None:
+    parent = await EntParentExample.gen_create(vc)
+    get_session().expunge_all()
+    sql_statements.clear()
+    rule.evaluations = 0
+
+    with use_identity_map():
+        await EntParent.genx(vc, parent.id)
+        get_session().expunge_all()
+        await EntParent.genx(vc, parent.id)
+        await EntParent.gen_many(vc, [parent.id])
+        await EntParent.query(vc).gen()
+
+    assert rule.evaluations == 1
+    # The query still runs, but gen and gen_many are served from the map
+    assert len(sql_statements) == 2
+
+
+async def test_mutations_invalidate_the_identity_map(
+    vc: ExampleViewerContext, rule: CountingRule
+) -> None:
+    parent = await EntParentExample.gen_create(vc, name="Vincent")
+
+    with use_identity_map():
+        await EntParent.genx(vc, parent.id)
+        rule.evaluations = 0
+
+        mut = EntParentMutator.update(vc, parent)
+        mut.name = "Rachel"
+        await mut.gen_savex()
+        assert rule.evaluations == 1, "The updated ent should be checked again"
+
+        reloaded = await EntParent.genx(vc, parent.id)
+        assert reloaded.name == "Rachel"
+        assert rule.evaluations == 1
+
+        await EntParentMutator.delete(vc, reloaded).gen_save()
+        assert await EntParent.gen(vc, parent.id) is None
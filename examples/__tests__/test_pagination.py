@@ -8,9 +8,30 @@ from generated.ent_test_object import (
     EntTestObject,
     EntTestObjectExample,
     EntTestObjectModel,
+    EntTestObjectQuery,
 )
-from entpy import Ent
+import pytest
+from collections.abc import Sequence
+from entpy import (
+    Action,
+    Decision,
+    Ent,
+    ExecutionError,
+    PrivacyRule,
+    ValidationError,
+)
+import generated.ent_query
+import generated.ent_test_object
+from generated.ent_test_object2 import EntTestObject2Example
+from generated.ent_test_thing import IEntTestThing
 from generated.ent_query import EntQuery
+from entpy.framework.pagination import (
+    KeysetColumn,
+    keyset_condition,
+    merge_keyset_rows,
+)
+from database import get_session
+from sqlalchemy import select
 
 
 ENTTYPE = TypeVar("ENTTYPE", bound=Ent)
@@ -87,3 +108,286 @@ async def test_connection(vc: ExampleViewerContext) -> None:
     assert conn["items"][0]["id"] == third.id
     assert conn["items"][1]["id"] == second.id
     assert conn["items"][2]["id"] == first.id
+
+
+async def test_gen_page(vc: ExampleViewerContext) -> None:
+    ents = [await EntTestObjectExample.gen_create(vc) for _ in range(5)]
+    expected = sorted([ent.id for ent in ents], reverse=True)
+
+    page = await EntTestObject.query(vc).order_by_id_desc().gen_page(first=2)
+    assert [ent.id for ent in page.ents] == expected[:2]
+    assert page.has_next is True
+    assert page.has_previous is False
+
+    page = (
+        await EntTestObject.query(vc)
+        .order_by_id_desc()
+        .gen_page(first=2, after=page.end_cursor)
+    )
+    assert [ent.id for ent in page.ents] == expected[2:4]
+    assert page.has_next is True
+    assert page.has_previous is True
+
+    last_page = (
+        await EntTestObject.query(vc)
+        .order_by_id_desc()
+        .gen_page(first=2, after=page.end_cursor)
+    )
+    assert [ent.id for ent in last_page.ents] == expected[4:]
+    assert last_page.has_next is False
+
+    # And back again
+    page = (
+        await EntTestObject.query(vc)
+        .order_by_id_desc()
+        .gen_page(last=3, before=last_page.start_cursor)
+    )
+    assert [ent.id for ent in page.ents] == expected[1:4]
+    assert page.has_previous is True
+    assert page.has_next is True
+
+
+async def test_gen_page_checks_the_other_side_of_the_cursor(
+    vc: ExampleViewerContext,
+) -> None:
+    ents = [await EntTestObjectExample.gen_create(vc) for _ in range(4)]
+    expected = sorted([ent.id for ent in ents], reverse=True)
+    page = await EntTestObject.query(vc).order_by_id_desc().gen_page(first=2)
+    assert page.end_cursor is not None and page.start_cursor is not None
+
+    # Nothing matches before the cursor anymore
+    page = (
+        await EntTestObject.query(vc)
+        .where(EntTestObjectModel.id < expected[1])
+        .order_by_id_desc()
+        .gen_page(first=2, after=page.end_cursor)
+    )
+    assert [ent.id for ent in page.ents] == expected[2:]
+    assert page.has_previous is False
+    assert page.has_next is False
+    assert page.start_cursor is not None
+
+    # Nothing matches after the cursor anymore
+    page = (
+        await EntTestObject.query(vc)
+        .where(EntTestObjectModel.id > expected[2])
+        .order_by_id_desc()
+        .gen_page(last=2, before=page.start_cursor)
+    )
+    assert [ent.id for ent in page.ents] == expected[:2]
+    assert page.has_next is False
+    assert page.has_previous is False
+
+
+async def test_gen_page_on_an_indexed_field(vc: ExampleViewerContext) -> None:
+    ents = [
+        await EntTestObjectExample.gen_create(vc, firstname=firstname)
+        for firstname in ["Bob", "Anne", "Bob", "Chris", "Bob"]
+    ]
+    # The ID breaks the ties between the Bobs
+    expected = [ent.id for ent in sorted(ents, key=lambda e: (e.firstname, e.id))]
+
+    ids: list[UUID] = []
+    cursor = None
+    has_next = True
+    while has_next:
+        page = (
+            await EntTestObject.query(vc)
+            .order_by_firstname_asc()
+            .gen_page(first=2, after=cursor)
+        )
+        ids += [ent.id for ent in page.ents]
+        cursor = page.end_cursor
+        has_next = page.has_next
+
+    assert ids == expected
+
+
+@pytest.mark.parametrize("descending", [False, True])
+async def test_gen_page_on_a_nullable_column(
+    vc: ExampleViewerContext, descending: bool
+) -> None:
+    ents = [
+        await EntTestObjectExample.gen_create(vc, validated_field=value)
+        for value in [None, "b", None, "a", None]
+    ]
+    # Like SQLite, the NULLs come first
+    expected = [
+        ent.id
+        for ent in sorted(
+            ents,
+            key=lambda e: (
+                e.validated_field is not None,
+                e.validated_field or "",
+                e.id,
+            ),
+            reverse=descending,
+        )
+    ]
+
+    def query() -> EntTestObjectQuery:
+        return EntTestObject.query(vc).order_by_key(
+            EntTestObjectModel.validated_field, descending=descending
+        )
+
+    ids: list[UUID] = []
+    page = await query().gen_page(first=2)
+    ids += [ent.id for ent in page.ents]
+    while page.has_next:
+        page = await query().gen_page(first=2, after=page.end_cursor)
+        ids += [ent.id for ent in page.ents]
+    assert ids == expected
+
+    ids = []
+    while page.has_previous:
+        page = await query().gen_page(last=2, before=page.start_cursor)
+        ids = [ent.id for ent in page.ents] + ids
+    assert ids == expected[:-1]
+
+
+async def test_gen_page_on_a_pattern(vc: ExampleViewerContext) -> None:
+    first = await EntTestObjectExample.gen_create(vc)
+    second = await EntTestObject2Example.gen_create(vc)
+
+    page = await IEntTestThing.query_ent_test_thing(vc).gen_page(first=1)
+    assert [ent.id for ent in page.ents] == [min(first.id, second.id)]
+    assert page.has_next is True
+
+    page = await IEntTestThing.query_ent_test_thing(vc).gen_page(
+        first=1, after=page.end_cursor
+    )
+    assert [ent.id for ent in page.ents] == [max(first.id, second.id)]
+    assert page.has_next is False
+
+
+async def test_gen_page_errors(vc: ExampleViewerContext) -> None:
+    with pytest.raises(ExecutionError):
+        await (
+            EntTestObject.query(vc)
+            .order_by(EntTestObjectModel.lastname.asc())
+            .gen_page(first=2)
+        )
+    with pytest.raises(ValidationError):
+        await EntTestObject.query(vc).gen_page(first=2, last=2)
+    with pytest.raises(ValidationError):
+        await EntTestObject.query(vc).gen_page(first=2, after="not a cursor")
+
+
+class HideFirstname(PrivacyRule[ExampleViewerContext, EntTestObject]):
+    async def gen_evaluate(
+        self, vc: ExampleViewerContext, ent: EntTestObject
+    ) -> Decision:
+        return Decision.DENY if ent.firstname == "hidden" else Decision.ALLOW
+
+
+async def test_gen_filled(
+    vc: ExampleViewerContext, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    firstnames = ["hidden", "a", "hidden", "hidden", "b", "hidden", "c", "d"]
+    ents = [
+        await EntTestObjectExample.gen_create(vc, firstname=firstname)
+        for firstname in firstnames
+    ]
+    firstname_by_id = {ent.id: ent.firstname for ent in ents}
+    ids = sorted(firstname_by_id)
+    visible = [ent_id for ent_id in ids if firstname_by_id[ent_id] != "hidden"]
+
+    def get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+        return [HideFirstname()]
+
+    monkeypatch.setattr(
+        generated.ent_test_object, "_get_privacy_rules", get_privacy_rules
+    )
+    query = EntTestObject.query(vc).order_by_id_asc().limit(2)
+    assert len(await query.gen()) < 2, "privacy returns a short page"
+
+    page = await EntTestObject.query(vc).order_by_id_asc().limit(2).gen_filled()
+    assert [ent.id for ent in page.ents] == visible[:2]
+    assert page.visible == 2
+    assert page.scanned == ids.index(visible[1]) + 1
+    assert page.has_more is True
+
+    page = (
+        await EntTestObject.query(vc)
+        .order_by_id_asc()
+        .offset(page.next_offset)
+        .gen_filled(limit=3)
+    )
+    assert [ent.id for ent in page.ents] == visible[2:]
+    assert page.has_more is False
+
+
+@pytest.mark.parametrize("window_functions", [True, False])
+async def test_gen_with_total(
+    vc: ExampleViewerContext,
+    monkeypatch: pytest.MonkeyPatch,
+    sql_statements: list[str],
+    window_functions: bool,
+) -> None:
+    ents = [await EntTestObjectExample.gen_create(vc) for _ in range(5)]
+    ids = sorted(ent.id for ent in ents)
+    monkeypatch.setattr(
+        generated.ent_query,
+        "supports_window_functions",
+        lambda dialect: window_functions,
+    )
+    sql_statements.clear()
+
+    page, total = (
+        await EntTestObject.query(vc)
+        .order_by_id_asc()
+        .limit(2)
+        .offset(1)
+        .gen_with_total()
+    )
+
+    assert [ent.id for ent in page] == ids[1:3]
+    assert total == 5
+    assert len(sql_statements) == (1 if window_functions else 2)
+
+    page, total = (
+        await EntTestObject.query(vc)
+        .order_by_id_asc()
+        .limit(2)
+        .offset(10)
+        .gen_with_total()
+    )
+    assert page == []
+    assert total == 5
+
+
+def test_merge_keyset_rows_sorts_nulls_like_the_database() -> None:
+    keyset: list[KeysetColumn] = [(EntTestObjectModel.username, False)]
+    # SQLite sorts the NULLs first, PostgreSQL last
+    rows = merge_keyset_rows(
+        [[("a", None), ("b", "x")], [("c", None), ("d", "y")]],
+        keyset,
+        nulls_are_largest=False,
+    )
+    assert [row[0] for row in rows] == ["a", "c", "b", "d"]
+    rows = merge_keyset_rows(
+        [[("b", "x"), ("a", None)], [("d", "y"), ("c", None)]],
+        keyset,
+        nulls_are_largest=True,
+    )
+    assert [row[0] for row in rows] == ["b", "d", "a", "c"]
+
+
+@pytest.mark.parametrize("nulls_are_largest", [False, True])
+@pytest.mark.parametrize("forward", [False, True])
+async def test_keyset_condition_places_the_nulls(
+    vc: ExampleViewerContext, nulls_are_largest: bool, forward: bool
+) -> None:
+    for value in [None, "b", None, "a"]:
+        await EntTestObjectExample.gen_create(vc, validated_field=value)
+    column = EntTestObjectModel.validated_field
+    keyset: list[KeysetColumn] = [(column, False), (EntTestObjectModel.id, False)]
+    # Sort the NULLs like PostgreSQL does when they are the largest values
+    order = column.asc().nulls_last() if nulls_are_largest else column.asc()
+    query = select(column, EntTestObjectModel.id).order_by(order, EntTestObjectModel.id)
+    rows = list((await get_session().execute(query)).all())
+
+    for i, row in enumerate(rows):
+        condition = keyset_condition(keyset, row, forward, nulls_are_largest)
+        result = await get_session().execute(query.where(condition))
+        assert list(result.all()) == (rows[i + 1 :] if forward else rows[:i])
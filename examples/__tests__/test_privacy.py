@@ -0,0 +1,147 @@
+import asyncio
+from collections.abc import Sequence
+
+import pytest
+from entpy import Action, Decision, PrivacyRule, concurrent_privacy_evaluation
+from entpy.framework.privacy_rule import gen_evaluate_rules
+
+from evc import ExampleViewerContext
+import generated.ent_test_object
+from generated.ent_test_object import (
+    EntTestObject,
+    EntTestObjectExample,
+    EntTestObjectModel,
+    _get_privacy_rules,
+)
+from generated.ent_test_sub_object import EntTestSubObject  # noqa: F401
+
+
+class AllowFirstnames(PrivacyRule[ExampleViewerContext, EntTestObject]):
+    """Allows the ents with a given firstname and evaluates them in batches."""
+
+    def __init__(self, firstnames: set[str]) -> None:
+        self.firstnames = firstnames
+        self.batches: list[int] = []
+
+    async def gen_evaluate(
+        self, vc: ExampleViewerContext, ent: EntTestObject
+    ) -> Decision:
+        return Decision.ALLOW if ent.firstname in self.firstnames else Decision.PASS
+
+    async def gen_evaluate_many(
+        self, vc: ExampleViewerContext, ents: Sequence[EntTestObject]
+    ) -> list[Decision]:
+        self.batches.append(len(ents))
+        return [await self.gen_evaluate(vc, ent) for ent in ents]
+
+
+class DenyFirstnames(PrivacyRule[ExampleViewerContext, EntTestObject]):
+    def __init__(self, firstnames: set[str]) -> None:
+        self.firstnames = firstnames
+
+    async def gen_evaluate(
+        self, vc: ExampleViewerContext, ent: EntTestObject
+    ) -> Decision:
+        return Decision.DENY if ent.firstname in self.firstnames else Decision.PASS
+
+
+class SlowAcl(PrivacyRule[ExampleViewerContext, EntTestObject]):
+    """Simulates a rule that calls a remote service."""
+
+    def __init__(self) -> None:
+        self.running = 0
+        self.max_running = 0
+
+    async def gen_evaluate(
+        self, vc: ExampleViewerContext, ent: EntTestObject
+    ) -> Decision:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        # The first ents take the longest, so they finish last
+        await asyncio.sleep(0.01 if ent.firstname == "Anne" else 0)
+        self.running -= 1
+        return Decision.DENY if ent.firstname == "Bob" else Decision.ALLOW
+
+
+async def test_gen_evaluate_rules(vc: ExampleViewerContext) -> None:
+    ents = [
+        await EntTestObjectExample.gen_create(vc, firstname=firstname)
+        for firstname in ["Anne", "Bob", "Chris", "Dana"]
+    ]
+    deny = DenyFirstnames({"Bob"})
+    allow = AllowFirstnames({"Anne", "Bob", "Dana"})
+
+    decisions = await gen_evaluate_rules(vc, [deny, allow], ents)
+
+    assert decisions == [
+        Decision.ALLOW,
+        Decision.DENY,  # The first rule wins
+        Decision.DENY,  # Nobody allowed it
+        Decision.ALLOW,
+    ]
+    assert allow.batches == [3], "Only the undecided ents reach the next rule"
+
+
+def test_privacy_rules_are_built_once() -> None:
+    rules = _get_privacy_rules(Action.READ)
+
+    assert isinstance(rules, tuple), "The rules should be immutable"
+    assert _get_privacy_rules(Action.READ) is rules
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 3])
+async def test_queries_evaluate_privacy_concurrently(
+    vc: ExampleViewerContext, monkeypatch: pytest.MonkeyPatch, max_concurrency: int
+) -> None:
+    for firstname in ["Anne", "Bob", "Chris", "Dana", "Eve", "Fred"]:
+        await EntTestObjectExample.gen_create(vc, firstname=firstname)
+    acl = SlowAcl()
+
+    def get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+        return [acl]
+
+    monkeypatch.setattr(
+        generated.ent_test_object, "_get_privacy_rules", get_privacy_rules
+    )
+
+    ents = (
+        await EntTestObject.query(vc)
+        .order_by(EntTestObjectModel.firstname.asc())
+        .with_privacy_concurrency(max_concurrency)
+        .gen()
+    )
+
+    assert acl.max_running == max_concurrency
+    # The SQL order is preserved
+    assert [ent.firstname for ent in ents] == ["Anne", "Chris", "Dana", "Eve", "Fred"]
+
+
+class NestedAcl(PrivacyRule[ExampleViewerContext, EntTestObject]):
+    """Evaluates the rules of other Ents, like a rule loading an edge would."""
+
+    def __init__(self, ents: Sequence[EntTestObject]) -> None:
+        self.ents = ents
+        self.nested_max_running: list[int] = []
+
+    async def gen_evaluate(
+        self, vc: ExampleViewerContext, ent: EntTestObject
+    ) -> Decision:
+        nested = SlowAcl()
+        await gen_evaluate_rules(vc, [nested], self.ents)
+        self.nested_max_running.append(nested.max_running)
+        return Decision.ALLOW
+
+
+async def test_nested_rules_do_not_inherit_the_concurrency(
+    vc: ExampleViewerContext,
+) -> None:
+    ents = [
+        await EntTestObjectExample.gen_create(vc, firstname=firstname)
+        for firstname in ["Anne", "Bob", "Chris"]
+    ]
+    acl = NestedAcl(ents)
+
+    with concurrent_privacy_evaluation(3):
+        await gen_evaluate_rules(vc, [acl], ents)
+
+    assert acl.nested_max_running == [1, 1, 1]
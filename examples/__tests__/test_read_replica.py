@@ -0,0 +1,159 @@
+from collections.abc import AsyncIterator
+from contextvars import Context
+
+import database
+import pytest
+from database import Base, get_session
+from entpy import read_your_writes
+from entpy.framework.ent_cache import get_ent_cache
+from entpy.framework.session import is_pinned_to_primary, pin_to_primary
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from evc import ExampleViewerContext
+from generated.ent_test_object5 import (
+    EntTestObject5,
+    EntTestObject5Example,
+    EntTestObject5Model,
+    EntTestObject5Mutator,
+)
+from generated.ent_test_sub_object import (
+    EntTestSubObject,
+    EntTestSubObjectModel,
+    EntTestSubObjectMutator,
+)
+
+
+@pytest.fixture
+async def replica() -> AsyncIterator[AsyncSession]:
+    """A replica that does not receive the writes of the primary."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = AsyncSession(engine, autoflush=False)
+    database.replica_session = session
+    yield session
+    database.replica_session = None
+    await session.close()
+    await engine.dispose()
+
+
+async def test_reads_use_the_replica_until_a_write(
+    vc: ExampleViewerContext, replica: AsyncSession
+) -> None:
+    with read_your_writes():
+        ent = await EntTestSubObjectMutator.create(vc, email="a@b.c").gen_savex()
+        assert await replica.get(EntTestSubObjectModel, ent.id) is None
+        # The request sees its own writes
+        assert await EntTestSubObject.gen(vc, ent.id) is not None
+
+    with read_your_writes():
+        assert await EntTestSubObject.gen(vc, ent.id) is None
+        assert await EntTestSubObject.query(vc).gen_count_NO_PRIVACY() == 0
+
+
+async def test_update_an_ent_read_from_the_replica(
+    vc: ExampleViewerContext, replica: AsyncSession
+) -> None:
+    ent = await EntTestSubObjectMutator.create(vc, email="a@b.c").gen_savex()
+    # Replicate the row
+    replica.add(
+        EntTestSubObjectModel(
+            id=ent.id,
+            email=ent.email,
+            created_at=ent.created_at,
+            updated_at=ent.updated_at,
+        )
+    )
+    await replica.flush()
+
+    with read_your_writes():
+        replica_ent = await EntTestSubObject.genx(vc, ent.id)
+        assert replica_ent.model is not ent.model
+
+        mut = EntTestSubObjectMutator.update(vc, replica_ent)
+        mut.email = "d@e.f"
+        await mut.gen_savex()
+
+        reloaded = await EntTestSubObject.genx(vc, ent.id)
+        assert reloaded.model is ent.model, "The read should go to the primary"
+        assert reloaded.email == "d@e.f"
+
+
+async def test_update_a_stale_ent_read_from_the_replica(
+    vc: ExampleViewerContext, replica: AsyncSession
+) -> None:
+    ent = await EntTestSubObjectMutator.create(vc, email="old@b.c").gen_savex()
+    replica.add(
+        EntTestSubObjectModel(
+            id=ent.id,
+            email=ent.email,
+            created_at=ent.created_at,
+            updated_at=ent.updated_at,
+        )
+    )
+    await replica.flush()
+    # The replica does not receive this update
+    mut = EntTestSubObjectMutator.update(vc, ent)
+    mut.email = "new@b.c"
+    await mut.gen_savex()
+
+    with read_your_writes():
+        replica_ent = await EntTestSubObject.genx(vc, ent.id)
+        assert replica_ent.email == "old@b.c"
+
+        mut = EntTestSubObjectMutator.update(vc, replica_ent)
+        mut.email = "old@b.c"
+        updated = await mut.gen_savex()
+        assert updated.email == "old@b.c"
+
+    ent_id = ent.id
+    session = get_session()
+    session.expire_all()
+    model = await session.get(EntTestSubObjectModel, ent_id)
+    assert model is not None
+    assert model.email == "old@b.c"
+
+
+async def test_replica_reads_are_not_cached(
+    vc: ExampleViewerContext, replica: AsyncSession
+) -> None:
+    ent = await EntTestObject5Example.gen_create(vc, obj5_field="old")
+    replica.add(
+        EntTestObject5Model(
+            id=ent.id,
+            obj5_field="old",
+            is_it_true=ent.is_it_true,
+            created_at=ent.created_at,
+            updated_at=ent.updated_at,
+        )
+    )
+    await replica.commit()
+    # The replica does not receive this update
+    mut = EntTestObject5Mutator.update(vc, ent)
+    mut.obj5_field = "new"
+    await mut.gen_savex()
+    await get_session().commit()
+
+    with read_your_writes():
+        replica_ent = await EntTestObject5.genx(vc, ent.id)
+        assert replica_ent.obj5_field == "old"
+
+    cache = get_ent_cache(EntTestObject5Model)
+    assert cache is not None and cache.get(ent.id) is None
+
+
+def test_writes_outside_of_read_your_writes_do_not_pin() -> None:
+    def pin() -> bool:
+        pin_to_primary()
+        return is_pinned_to_primary()
+
+    # A fresh context, outside of the session_scope of the test
+    assert not Context().run(pin)
+
+    def pin_in_scope() -> bool:
+        with read_your_writes():
+            pin_to_primary()
+            assert is_pinned_to_primary()
+        return is_pinned_to_primary()
+
+    assert not Context().run(pin_in_scope), "The pin should end with its scope"
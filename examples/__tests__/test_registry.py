@@ -0,0 +1,23 @@
+import pytest
+from entpy.framework.registry import get_descriptor_class, get_descriptor_metadata
+
+from ent_test_object_schema import EntTestObjectSchema
+from generated.ent_test_object import EntTestObject
+from generated.ent_test_sub_object import EntTestSubObject  # noqa: F401
+
+
+def test_descriptor_metadata_is_built_once() -> None:
+    metadata = get_descriptor_metadata(EntTestObjectSchema)
+
+    assert get_descriptor_metadata(EntTestObjectSchema) is metadata
+    assert metadata.get_field("username").name == "username"
+    # Fields coming from the patterns are included too
+    assert metadata.get_field("a_good_thing").name == "a_good_thing"
+    assert len(metadata.validators["validated_field"]) == 1
+    assert metadata.validators["username"] == ()
+    with pytest.raises(ValueError, match="Unknown field"):
+        metadata.get_field("nope")
+
+
+def test_get_descriptor_class() -> None:
+    assert get_descriptor_class(EntTestObject) is EntTestObjectSchema
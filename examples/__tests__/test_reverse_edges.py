@@ -0,0 +1,64 @@
+import pytest
+from entpy import Action, AllowAll, EdgeField, Field, PrivacyRule, Schema, StringField
+from entpy.gencode.reverse_edge_generator import compute_reverse_edges
+from entpy.gencode.utils import pluralize
+
+
+class TargetSchema(Schema):
+    def get_fields(self) -> list[Field]:
+        return [StringField("name", 100).unique()]
+
+    def get_privacy_rules(self, action: Action) -> list[PrivacyRule]:
+        return [AllowAll()]
+
+
+def _get_source_schema(*fields: Field) -> type[Schema]:
+    class SourceSchema(Schema):
+        def get_fields(self) -> list[Field]:
+            return list(fields)
+
+        def get_privacy_rules(self, action: Action) -> list[PrivacyRule]:
+            return [AllowAll()]
+
+    return SourceSchema
+
+
+def test_reverse_edges_are_named_after_the_source() -> None:
+    source_class = _get_source_schema(EdgeField("target", TargetSchema))
+
+    reverse_edges = compute_reverse_edges([TargetSchema, source_class])
+
+    assert [edge.name for edge in reverse_edges[TargetSchema]] == ["sources"]
+
+
+@pytest.mark.parametrize(
+    ("name", "plural"),
+    [
+        ("parent", "parents"),
+        ("box", "boxes"),
+        ("category", "categories"),
+        ("day", "days"),
+    ],
+)
+def test_reverse_edges_are_pluralized(name: str, plural: str) -> None:
+    assert pluralize(name) == plural
+
+
+@pytest.mark.parametrize("reverse_name", ["name", "many", "from_name"])
+def test_reverse_edge_cannot_collide_with_the_target(reverse_name: str) -> None:
+    source_class = _get_source_schema(
+        EdgeField("target", TargetSchema).reverse_edge(reverse_name)
+    )
+
+    with pytest.raises(ValueError, match="collides with TargetSchema"):
+        compute_reverse_edges([TargetSchema, source_class])
+
+
+def test_reverse_edges_cannot_collide_with_each_other() -> None:
+    source_class = _get_source_schema(
+        EdgeField("target", TargetSchema).reverse_edge("children"),
+        EdgeField("other_target", TargetSchema).reverse_edge("children_many"),
+    )
+
+    with pytest.raises(ValueError, match="gen_children_many"):
+        compute_reverse_edges([TargetSchema, source_class])
@@ -0,0 +1,83 @@
+import asyncio
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import database
+import pytest
+from database import Base
+from entpy import (
+    ExecutionError,
+    configure_sessions,
+    get_scoped_session,
+    session_scope,
+)
+from entpy.framework.identity_map import get_identity_map
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from evc import ExampleViewerContext
+from generated.ent_test_sub_object import EntTestSubObject, EntTestSubObjectMutator
+
+
+@pytest.fixture
+async def sessions(tmp_path: Path) -> AsyncIterator[None]:
+    """Sessions on a file database, so that committed data outlives each scope."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/db.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    configure_sessions(
+        async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    )
+    yield
+    configure_sessions(database.SessionLocal)
+    await engine.dispose()
+
+
+async def test_scope_commits_at_the_end(
+    vc: ExampleViewerContext, sessions: None
+) -> None:
+    async with session_scope():
+        ent = await EntTestSubObjectMutator.create(vc, email="a@b.c").gen_savex()
+
+    async with session_scope():
+        assert await EntTestSubObject.gen(vc, ent.id) is not None
+
+
+async def test_scope_rolls_back_on_error(
+    vc: ExampleViewerContext, sessions: None
+) -> None:
+    with pytest.raises(RuntimeError):
+        async with session_scope():
+            ent = await EntTestSubObjectMutator.create(vc, email="a@b.c").gen_savex()
+            raise RuntimeError()
+
+    async with session_scope():
+        assert await EntTestSubObject.gen(vc, ent.id) is None
+
+
+async def test_each_scope_has_its_own_session_and_identity_map(
+    sessions: None,
+) -> None:
+    outer_identity_map = get_identity_map()
+
+    async def gen_scope() -> tuple[AsyncSession, object]:
+        async with session_scope() as session:
+            await asyncio.sleep(0)
+            assert get_scoped_session() is session
+            return session, get_identity_map()
+
+    (session1, map1), (session2, map2) = await asyncio.gather(gen_scope(), gen_scope())
+    assert session1 is not session2
+    assert map1 is not None and map2 is not None and map1 is not map2
+    assert get_identity_map() is outer_identity_map
+
+
+async def test_tasks_share_the_session_of_their_scope() -> None:
+    session = get_scoped_session()
+
+    async def gen_session() -> AsyncSession:
+        return get_scoped_session()
+
+    # Threads do not inherit the context of the scope
+    assert await asyncio.create_task(gen_session()) is session
+    with pytest.raises(ExecutionError):
+        await asyncio.get_running_loop().run_in_executor(None, get_scoped_session)
@@ -0,0 +1,131 @@
+from collections.abc import AsyncIterator, Callable
+from pathlib import Path
+
+import pytest
+from database import Base
+from entpy import ExecutionError, configure_shards, use_shard
+from entpy.framework.sharding import get_shard_id, reset_shards
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from evc import ExampleViewerContext
+from generated.ent_test_sub_object import (
+    EntTestSubObject,
+    EntTestSubObjectModel,
+    EntTestSubObjectMutator,
+)
+
+
+@pytest.fixture
+async def shards(tmp_path: Path) -> AsyncIterator[dict[int, AsyncSession]]:
+    """Two shards, each in its own SQLite file."""
+    engines = {
+        shard_id: create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/{shard_id}.db")
+        for shard_id in (1, 2)
+    }
+    sessions: dict[int, AsyncSession] = {}
+    for shard_id, engine in engines.items():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions[shard_id] = AsyncSession(engine, autoflush=False)
+    configure_shards(
+        {shard_id: _session_getter(session) for shard_id, session in sessions.items()}
+    )
+    yield sessions
+    reset_shards()
+    for session in sessions.values():
+        await session.close()
+    for engine in engines.values():
+        await engine.dispose()
+
+
+def _session_getter(session: AsyncSession) -> Callable[[], AsyncSession]:
+    return lambda: session
+
+
+async def _gen_create(
+    vc: ExampleViewerContext, shard_id: int, email: str
+) -> EntTestSubObject:
+    with use_shard(shard_id):
+        return await EntTestSubObjectMutator.create(vc, email=email).gen_savex()
+
+
+async def test_point_lookups_use_the_shard_of_the_id(
+    vc: ExampleViewerContext, shards: dict[int, AsyncSession]
+) -> None:
+    ent1 = await _gen_create(vc, 1, "one@example.com")
+    ent2 = await _gen_create(vc, 2, "two@example.com")
+
+    assert get_shard_id(ent1.id) == 1
+    assert get_shard_id(ent2.id) == 2
+    assert await shards[2].get(EntTestSubObjectModel, ent1.id) is None
+    assert await shards[1].get(EntTestSubObjectModel, ent2.id) is None
+
+    # No need to be in the right shard to load an Ent
+    ent = await EntTestSubObject.genx(vc, ent2.id)
+    assert ent.email == "two@example.com"
+    ents = await EntTestSubObject.genx_many(vc, [ent1.id, ent2.id])
+    assert [ent.email for ent in ents.values()] == [
+        "one@example.com",
+        "two@example.com",
+    ]
+
+
+async def test_creates_outside_of_use_shard_go_to_the_default_shard(
+    vc: ExampleViewerContext, shards: dict[int, AsyncSession]
+) -> None:
+    ent = await EntTestSubObjectMutator.create(vc, email="a@b.c").gen_savex()
+
+    assert get_shard_id(ent.id) == 1
+    assert await shards[1].get(EntTestSubObjectModel, ent.id) is not None
+    assert (await EntTestSubObject.genx(vc, ent.id)).email == "a@b.c"
+
+
+async def test_queries_across_shards(
+    vc: ExampleViewerContext, shards: dict[int, AsyncSession]
+) -> None:
+    ents = [await _gen_create(vc, 1 + i % 2, f"{i}@example.com") for i in range(6)]
+
+    results = await EntTestSubObject.query(vc).across_shards().order_by_id_desc().gen()
+    assert [ent.id for ent in results] == sorted(
+        [ent.id for ent in ents], reverse=True
+    ), "The rows of the shards should be merged in order"
+
+    query = EntTestSubObject.query(vc).across_shards().order_by_id_asc()
+    results = await query.offset(1).limit(3).gen()
+    assert [ent.id for ent in results] == sorted(ent.id for ent in ents)[1:4]
+
+    first = (
+        await EntTestSubObject.query(vc).across_shards().order_by_id_asc().gen_first()
+    )
+    assert first is not None and first.id == min(ent.id for ent in ents)
+
+    count = await EntTestSubObject.query(vc).across_shards().gen_count_NO_PRIVACY()
+    assert count == 6
+    count = await EntTestSubObject.query(vc).on_shard(2).gen_count_NO_PRIVACY()
+    assert count == 3
+
+    with pytest.raises(ExecutionError):
+        await EntTestSubObject.query(vc).across_shards().gen_page(first=2)
+
+
+async def test_queries_across_shards_sort_nulls_like_the_database(
+    vc: ExampleViewerContext, shards: dict[int, AsyncSession]
+) -> None:
+    for i, email in enumerate(["b", "", "a", ""]):
+        await _gen_create(vc, 1 + i % 2, email)
+    # The empty emails are NULL in the keyset
+    nullable_email = func.nullif(EntTestSubObjectModel.email, "")
+
+    results = (
+        await EntTestSubObject.query(vc)
+        .across_shards()
+        .order_by_key(nullable_email)
+        .gen()
+    )
+    # Like SQLite, the NULLs come first
+    assert [ent.email for ent in results] == ["", "", "a", "b"]
+
+    query = EntTestSubObject.query(vc).across_shards()
+    results = await query.order_by_key(nullable_email, descending=True).gen()
+    assert [ent.email for ent in results] == ["b", "a", "", ""]
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Time the gencode on a synthetic set of schemas:
+
+    uv run python benchmark_gencode.py --schemas 500
+"""
+
+import argparse
+import os
+import sys
+from contextlib import redirect_stdout
+from hashlib import sha256
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from entpy.gencode.generator import run
+from entpy.gencode.manifest import MANIFEST_FILE_NAME
+from entpy.gencode.utils import to_snake_case
+
+SCHEMA_TEMPLATE = """
+from entpy import (
+    Action,
+    AllowAll,
+    BoolField,
+    Field,
+    IntField,
+    PrivacyRule,
+    Schema,
+    StringField,
+)
+{edge_import}
+
+
+class {class_name}(Schema):
+    def get_fields(self) -> list[Field]:
+        return [
+            StringField("name", 100).not_null().example("Vincent"),
+            StringField("description", 500),
+            IntField("rank").not_null().example(3),
+            BoolField("is_active").not_null().example(True),{edge_field}
+        ]
+
+    def get_privacy_rules(self, action: Action) -> list[PrivacyRule]:
+        return [AllowAll()]
+"""
+
+
+def get_schema_names(count: int) -> list[str]:
+    """
+    The IDs store the type of the Ents on 2 bytes, so a few out of 500 random
+    names would have the same one. Skip them.
+    """
+    names: list[str] = []
+    uuid_types: set[bytes] = set()
+    i = 0
+    while len(names) < count:
+        name = f"EntBench{i:04}"
+        uuid_type = sha256(name.encode()).digest()[:2]
+        if uuid_type not in uuid_types:
+            uuid_types.add(uuid_type)
+            names.append(name)
+        i += 1
+    return names
+
+
+def write_schemas(schemas_path: Path, count: int) -> list[Path]:
+    """The schemas form a tree: each one has an edge to its parent (i // 10)."""
+    names = get_schema_names(count)
+    paths = []
+    for i, name in enumerate(names):
+        edge_import = ""
+        edge_field = ""
+        if i > 0:
+            parent = names[i // 10]
+            edge_import = (
+                "from entpy import EdgeField\n"
+                + f"from {to_snake_case(parent)}_schema import {parent}Schema"
+            )
+            edge_field = f'\n            EdgeField("parent", {parent}Schema),'
+        path = schemas_path / f"{to_snake_case(name)}_schema.py"
+        path.write_text(
+            SCHEMA_TEMPLATE.format(
+                class_name=f"{name}Schema",
+                edge_import=edge_import,
+                edge_field=edge_field,
+            )
+        )
+        paths.append(path)
+    return paths
+
+
+def time_run(max_workers: int | None) -> float:
+    start = perf_counter()
+    # The gencode prints one line per schema
+    with redirect_stdout(StringIO()):
+        run(
+            schemas_directory=".",
+            output_directory="./generated",
+            base_import="from database import Base",
+            session_getter_import="from database import get_session",
+            session_getter_fn_name="get_session",
+            vc_import="from evc import ExampleViewerContext",
+            vc_name="ExampleViewerContext",
+            max_workers=max_workers,
+        )
+    return perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--schemas", type=int, default=500)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Defaults to one per CPU"
+    )
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        schemas_path = Path(directory)
+        schema_paths = write_schemas(schemas_path, args.schemas)
+        # The gencode imports the schemas relatively to the working directory
+        os.chdir(schemas_path)
+        sys.path.insert(0, str(schemas_path))
+        manifest_path = schemas_path / "generated" / MANIFEST_FILE_NAME
+
+        print(f"{args.schemas} schemas, {args.workers or os.cpu_count()} workers")
+        print(f"Full run, 1 worker: {time_run(max_workers=1):.2f}s")
+        manifest_path.unlink()
+        print(f"Full run: {time_run(max_workers=args.workers):.2f}s")
+        print(f"Nothing changed: {time_run(max_workers=args.workers):.2f}s")
+        schema_paths[-1].write_text(schema_paths[-1].read_text() + "\n# Edited\n")
+        print(f"One schema changed: {time_run(max_workers=args.workers):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
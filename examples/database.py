@@ -1,3 +1,5 @@
+from entpy.framework.session import configure_sessions, get_scoped_session
+from entpy.framework.sharding import get_shard_ids, get_shard_session
 from sqlalchemy import MetaData
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
@@ -5,18 +7,34 @@ from sqlalchemy.orm import declarative_base
 DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
 engine = create_async_engine(DATABASE_URL, echo=False)
+# The Ents stay readable once their session_scope has committed
 SessionLocal = async_sessionmaker(
-    autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=engine,
+    class_=AsyncSession,
 )
 metadata = MetaData()
 Base = declarative_base(metadata=metadata)
 
 
-session = SessionLocal()
+configure_sessions(SessionLocal)
+
+# The session of a read replica, the reads use the primary session if not set
+replica_session: AsyncSession | None = None
 
 
 def get_session() -> AsyncSession:
-    return session
+    if get_shard_ids():
+        return get_shard_session()
+    return get_scoped_session()
+
+
+def get_replica_session() -> AsyncSession:
+    if replica_session is not None:
+        return replica_session
+    return get_session()
 
 
 async def init_db() -> None:
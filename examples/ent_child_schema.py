@@ -1,13 +1,25 @@
-from entpy import Field, Schema, StringField, EdgeField, Action, AllowAll, PrivacyRule
+from entpy import (
+    Action,
+    AllowAll,
+    CompositeIndex,
+    EdgeField,
+    Field,
+    PrivacyRule,
+    Schema,
+    StringField,
+)
 from ent_parent_schema import EntParentSchema
 
 
 class EntChildSchema(Schema):
     def get_fields(self) -> list[Field]:
         return [
-            EdgeField("parent", EntParentSchema).not_null(),
+            EdgeField("parent", EntParentSchema).not_null().reverse_edge("children"),
             StringField("name", 100).not_null().example("Benjamin"),
         ]
 
+    def get_composite_indexes(self) -> list[CompositeIndex]:
+        return [CompositeIndex("child_parent_name", ["parent_id", "name"], unique=True)]
+
     def get_privacy_rules(self, action: Action) -> list[PrivacyRule]:
         return [AllowAll()]
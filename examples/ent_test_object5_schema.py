@@ -1,4 +1,13 @@
-from entpy import Action, AllowAll, BoolField, Field, PrivacyRule, Schema, StringField
+from entpy import (
+    Action,
+    AllowAll,
+    BoolField,
+    CachePolicy,
+    Field,
+    PrivacyRule,
+    Schema,
+    StringField,
+)
 
 
 class EntTestObject5Schema(Schema):
@@ -10,3 +19,6 @@ class EntTestObject5Schema(Schema):
 
     def get_privacy_rules(self, action: Action) -> list[PrivacyRule]:
         return [AllowAll()]
+
+    def get_cache_policy(self) -> CachePolicy | None:
+        return CachePolicy(ttl_seconds=60)
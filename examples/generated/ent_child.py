@@ -18,21 +18,55 @@ from evc import ExampleViewerContext
 from database import get_session
 from .ent_model import EntModel
 from .ent_query import EntQuery
+from collections.abc import AsyncIterator
+from collections.abc import Mapping, Sequence
+from database import get_replica_session
 from ent_child_schema import EntChildSchema
 from entpy import Field
+from entpy import FieldValidator
+from entpy import PrivacyRule
+from entpy import concurrent_privacy_evaluation
+from entpy.framework.identity_map import gen_read_decisions
+from entpy.framework.identity_map import remember_models
+from entpy.framework.loader import LoadedModels
+from entpy.framework.loader import MAX_IDS_PER_QUERY
+from entpy.framework.loader import gen_model_by_id, gen_models_by_ids
+from entpy.framework.loader import invalidate_ent
+from entpy.framework.prefetch import gen_prefetch
+from entpy.framework.registry import get_descriptor_metadata
+from entpy.framework.registry import register_ent
+from entpy.framework.session import gen_attach, pin_to_primary
+from entpy.framework.session import get_read_session
+from entpy.framework.sharding import get_session_for_id, get_shard_id
+from entpy.framework.sharding import group_by_shard
+from entpy.framework.sharding import use_shard
+from functools import cache
 from sentinels import NOTHING, Sentinel  # type: ignore[import-untyped]
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
 from sqlalchemy import String
 from sqlalchemy import UUID as DBUUID
-from sqlalchemy import select, func, Result
+from sqlalchemy import select
+from sqlalchemy import Select, func, Result, Dialect
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import QueryableAttribute
+from types import MappingProxyType
+from typing import Any
 from typing import TypeVar
 from typing import TYPE_CHECKING
+import asyncio
 
 if TYPE_CHECKING:
     from .ent_parent import EntParent
 
 
+def _get_read_session() -> AsyncSession:
+    """The read session, or the primary one once this context wrote something."""
+    return get_read_session(get_replica_session, get_session)
+
+
 class EntChildModel(EntModel):
     __tablename__ = "child"
 
@@ -41,9 +75,13 @@ class EntChildModel(EntModel):
         DBUUID(),
         ForeignKey("parent.id", deferrable=True, initially="DEFERRED"),
         nullable=False,
+        index=True,
     )
 
 
+Index("child_parent_name", EntChildModel.parent_id, EntChildModel.name, unique=True)
+
+
 class EntChild(Ent[ExampleViewerContext]):
     vc: ExampleViewerContext
     model: EntChildModel
@@ -51,6 +89,8 @@ class EntChild(Ent[ExampleViewerContext]):
     def __init__(self, vc: ExampleViewerContext, model: EntChildModel) -> None:
         self.vc = vc
         self.model = model
+        # The edges loaded by gen_prefetch, by edge name
+        self._prefetched_edges: dict[str, Ent[Any]] = {}
 
     @property
     def id(self) -> UUID:
@@ -75,20 +115,11 @@ class EntChild(Ent[ExampleViewerContext]):
     async def gen_parent(self) -> EntParent:
         from .ent_parent import EntParent
 
+        prefetched = self._prefetched_edges.get("parent")
+        if isinstance(prefetched, EntParent) and prefetched.id == self.model.parent_id:
+            return prefetched
         return await EntParent.genx(self.vc, self.model.parent_id)
 
-    async def _gen_evaluate_privacy(
-        self, vc: ExampleViewerContext, action: Action
-    ) -> Decision:
-        rules = EntChildSchema().get_privacy_rules(action)
-        for rule in rules:
-            decision = await rule.gen_evaluate(vc, self)
-            # If we get an ALLOW or DENY, we return instantly. Else, we keep going.
-            if decision != Decision.PASS:
-                return decision
-        # We default to denying
-        return Decision.DENY
-
     @classmethod
     async def genx(cls, vc: ExampleViewerContext, ent_id: UUID | str) -> EntChild:
         ent = await cls.gen(vc, ent_id)
@@ -105,19 +136,154 @@ class EntChild(Ent[ExampleViewerContext]):
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {ent_id}") from e
 
-        session = get_session()
-        model = await session.get(EntChildModel, ent_id)
+        session = get_session_for_id(_get_read_session, ent_id)
+        model = await gen_model_by_id(session, EntChildModel, ent_id)
+        return await cls._gen_from_model(vc, model)  # noqa: SLF001
+
+    @classmethod
+    async def genx_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntChild]:
+        ents = await cls.gen_many(vc, ent_ids)
+        missing = [str(ent_id) for ent_id, ent in ents.items() if not ent]
+        if missing:
+            ids = ", ".join(missing)
+            raise EntNotFoundError(f"No EntChild found for IDs {ids}")
+        return {ent_id: ent for ent_id, ent in ents.items() if ent}
+
+    @classmethod
+    async def gen_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntChild | None]:
+        # Convert str to UUID if needed
+        uuids: list[UUID] = []
+        for ent_id in ent_ids:
+            try:
+                uuids.append(UUID(ent_id) if isinstance(ent_id, str) else ent_id)
+            except ValueError as e:
+                raise ValidationError(f"Invalid ID format for {ent_id}") from e
+        # Remove the duplicates but keep the order of the IDs
+        uuids = list(dict.fromkeys(uuids))
+
+        models: dict[UUID, EntChildModel] = {}
+        for shard_ids in group_by_shard(uuids).values():
+            session = get_session_for_id(_get_read_session, shard_ids[0])
+            models |= await gen_models_by_ids(session, EntChildModel, shard_ids)
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(ent_id) for ent_id in uuids]
+        )
+        return dict(zip(uuids, ents, strict=True))
+
+    @classmethod
+    async def gen_from_parent_id_and_name(
+        cls, vc: ExampleViewerContext, parent_id: UUID, name: str
+    ) -> EntChild | None:
+        session = _get_read_session()
+        result = await session.execute(
+            select(EntChildModel).where(
+                EntChildModel.parent_id == parent_id, EntChildModel.name == name
+            )
+        )
+        model = result.scalar_one_or_none()
         return await cls._gen_from_model(vc, model)  # noqa: SLF001
 
+    @classmethod
+    async def gen_many_from_parent_id_and_name(
+        cls, vc: ExampleViewerContext, keys: Sequence[tuple[UUID, str]]
+    ) -> dict[tuple[UUID, str], EntChild | None]:
+        """Load the EntChild for each (parent_id, name) with a tuple IN."""
+        # Remove the duplicates but keep the order of the keys
+        unique_keys = list(dict.fromkeys(keys))
+        # Each key uses one bound parameter per column
+        chunk_size = MAX_IDS_PER_QUERY // 2
+        session = _get_read_session()
+        models: dict[tuple[UUID, str], EntChildModel] = {}
+        for i in range(0, len(unique_keys), chunk_size):
+            chunk = unique_keys[i : i + chunk_size]
+            result = await session.execute(
+                select(EntChildModel).where(
+                    tuple_(EntChildModel.parent_id, EntChildModel.name).in_(chunk)
+                )
+            )
+            for model in result.scalars():
+                models[(model.parent_id, model.name)] = model
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(key) for key in unique_keys]
+        )
+        return dict(zip(unique_keys, ents, strict=True))
+
+    @classmethod
+    async def genx_from_parent_id_and_name(
+        cls, vc: ExampleViewerContext, parent_id: UUID, name: str
+    ) -> EntChild:
+        result = await cls.gen_from_parent_id_and_name(vc, parent_id, name)
+        if not result:
+            raise EntNotFoundError(
+                f"No EntChild found for parent_id {parent_id} name {name}"
+            )
+        return result
+
+    @classmethod
+    async def genx_many_from_parent_id_and_name(
+        cls, vc: ExampleViewerContext, keys: Sequence[tuple[UUID, str]]
+    ) -> dict[tuple[UUID, str], EntChild]:
+        ents = await cls.gen_many_from_parent_id_and_name(vc, keys)
+        missing = [str(key) for key, ent in ents.items() if not ent]
+        if missing:
+            keys_message = ", ".join(missing)
+            raise EntNotFoundError(
+                f"No EntChild found for (parent_id, name) {keys_message}"
+            )
+        return {key: ent for key, ent in ents.items() if ent}
+
+    @classmethod
+    async def gen_prefetch(
+        cls,
+        vc: ExampleViewerContext,
+        ents: Sequence[EntChild],
+        edge_names: Sequence[str],
+    ) -> None:
+        for edge_name in edge_names:
+            if edge_name == "parent":
+                from .ent_parent import EntParent
+
+                parent_targets = await EntParent.gen_many(
+                    vc, [ent.model.parent_id for ent in ents if ent.model.parent_id]
+                )
+                for ent in ents:
+                    parent_target = (
+                        parent_targets.get(ent.model.parent_id)
+                        if ent.model.parent_id
+                        else None
+                    )
+                    if parent_target:
+                        ent._prefetched_edges[edge_name] = parent_target  # noqa: SLF001
+                continue
+            raise ValidationError(f"Unknown edge for EntChild: {edge_name}")
+
     @classmethod
     async def _gen_from_model(
         cls, vc: ExampleViewerContext, model: EntChildModel | None
     ) -> EntChild | None:
         if not model:
             return None
-        ent = EntChild(vc=vc, model=model)
-        decision = await ent._gen_evaluate_privacy(vc=vc, action=Action.READ)
-        return ent if decision == Decision.ALLOW else None
+        ents = await cls._gen_from_models(vc, [model])
+        return ents[0]
+
+    @classmethod
+    async def _gen_from_models(
+        cls, vc: ExampleViewerContext, models: Sequence[EntChildModel | None]
+    ) -> list[EntChild | None]:
+        remember_models(models)
+        ents = [EntChild(vc=vc, model=model) if model else None for model in models]
+        rules = _get_privacy_rules(Action.READ)
+        decisions = iter(
+            await gen_read_decisions(vc, rules, [ent for ent in ents if ent])
+        )
+        # There is one decision for each loaded ent, in the same order
+        return [
+            ent if ent and next(decisions) == Decision.ALLOW else None for ent in ents
+        ]
 
     @classmethod
     async def _genx_from_model(
@@ -145,28 +311,73 @@ class EntChildQuery(EntQuery[EntChild, EntChildModel]):
         self.query = select(EntChildModel)
 
     async def gen(self) -> list[EntChild]:
-        session = get_session()
-        result = await session.execute(self.query)
-        ents = await self._gen_ents(result)
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, self.limit_value)
+        else:
+            result = await self._get_session().execute(self.query)
+            rows = list(result.scalars().all())
+        ents = await self._gen_ents(rows)
         return list(filter(None, ents))
 
-    async def _gen_ents(
-        self, result: Result[tuple[EntChildModel]]
-    ) -> list[EntChild | None]:
-        models = result.scalars().all()
-        return [
-            await EntChild._gen_from_model(self.vc, model)  # noqa: SLF001
-            for model in models
-        ]
+    async def gen_stream(self, chunk_size: int = 1000) -> AsyncIterator[EntChild]:
+        session = self._get_session()
+        # Once a chunk is processed, the session can let go of the models it
+        # loaded (the rows, their implementations, the prefetched edges...)
+        loaded = LoadedModels(session)
+        try:
+            result = await session.stream_scalars(
+                self.query.execution_options(yield_per=chunk_size)
+            )
+        except BaseException:
+            loaded.close()
+            raise
+        try:
+            async for chunk in result.partitions():
+                ents = await self._gen_ents(chunk)
+                with loaded.paused():
+                    for ent in ents:
+                        if ent:
+                            yield ent
+                loaded.expunge()
+        finally:
+            loaded.close()
+            await result.close()
+
+    async def _gen_ents(self, models: Sequence[EntChildModel]) -> list[EntChild | None]:
+        with concurrent_privacy_evaluation(self.privacy_concurrency):
+            ents = await EntChild._gen_from_models(self.vc, models)  # noqa: SLF001
+        await gen_prefetch(self.vc, ents, self.prefetched_edges)
+        return ents
 
     async def gen_first(self) -> EntChild | None:
-        session = get_session()
-        result = await session.execute(self.query.limit(1))
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, 1)
+            return (await self._gen_ents(rows))[0] if rows else None
+        result = await self._get_session().execute(self.query.limit(1))
         return await self._gen_ent(result)
 
     async def _gen_ent(self, result: Result[tuple[EntChildModel]]) -> EntChild | None:
-        model = result.scalar_one_or_none()
-        return await EntChild._gen_from_model(self.vc, model)  # noqa: SLF001
+        row = result.scalar_one_or_none()
+        if not row:
+            return None
+        return (await self._gen_ents([row]))[0]
+
+    async def _gen_rows(
+        self, query: Select[Any]
+    ) -> list[tuple[EntChild | None, tuple[Any, ...]]]:
+        session = self._get_session()
+        rows = (await session.execute(query)).all()
+        ents = await self._gen_ents([row[0] for row in rows])
+        return [(ent, tuple(row[1:])) for ent, row in zip(ents, rows, strict=True)]
+
+    def _get_shard_session(self, shard_id: int | None) -> AsyncSession:
+        if shard_id is None:
+            return _get_read_session()
+        with use_shard(shard_id):
+            return _get_read_session()
+
+    def _get_dialect(self) -> Dialect:
+        return self._get_sessions()[0].get_bind().dialect
 
     async def genx_first(self) -> EntChild:
         ent = await self.gen_first()
@@ -175,23 +386,28 @@ class EntChildQuery(EntQuery[EntChild, EntChildModel]):
         return ent
 
     async def gen_count_NO_PRIVACY(self) -> int:
-        session = get_session()
-        count_query = self.query.with_only_columns(
-            func.count(), maintain_column_froms=True
-        ).order_by(None)
-        result = await session.execute(count_query)
-        count = result.scalar()
-        if count is None:
+        count_query = (
+            self.query.with_only_columns(func.count(), maintain_column_froms=True)
+            .order_by(None)
+            .limit(None)
+            .offset(None)
+        )
+        results = await asyncio.gather(
+            *[session.execute(count_query) for session in self._get_sessions()]
+        )
+        counts = [result.scalar() for result in results]
+        if None in counts:
             raise ExecutionError("Unable to get the count")
-        return count
+        return sum(count or 0 for count in counts)
+
+    def _get_id_column(self) -> QueryableAttribute[Any]:
+        return EntChildModel.id
 
     def order_by_id_asc(self) -> "EntChildQuery":
-        self.query = self.query.order_by(EntChildModel.id.asc())
-        return self
+        return self.order_by_key(EntChildModel.id)
 
     def order_by_id_desc(self) -> "EntChildQuery":
-        self.query = self.query.order_by(EntChildModel.id.desc())
-        return self
+        return self.order_by_key(EntChildModel.id, descending=True)
 
 
 class EntChildMutator:
@@ -214,6 +430,12 @@ class EntChildMutator:
             parent_id=parent_id,
         )
 
+    @classmethod
+    def create_many(
+        cls, vc: ExampleViewerContext, actions: Sequence[EntChildMutatorCreationAction]
+    ) -> EntChildMutatorBulkCreationAction:
+        return EntChildMutatorBulkCreationAction(vc=vc, actions=actions)
+
     @classmethod
     def update(
         cls, vc: ExampleViewerContext, ent: EntChild
@@ -250,19 +472,69 @@ class EntChildMutatorCreationAction:
         self.parent_id = parent_id
 
     async def gen_savex(self) -> EntChild:
-        session = get_session()
+        session = get_session_for_id(get_session, self.id)
+        self._validate()
+        model = self._build_model()
+        session.add(model)
+        await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntChildModel, self.id)
+        # TODO privacy checks
+        return await EntChild._genx_from_model(self.vc, model)  # noqa: SLF001
+
+    def _validate(self) -> None:
+        pass
 
-        model = EntChildModel(
+    def _build_model(self) -> EntChildModel:
+        return EntChildModel(
             id=self.id,
             updated_at=self.updated_at,
             created_at=self.created_at,
             name=self.name,
             parent_id=self.parent_id,
         )
-        session.add(model)
-        await session.flush()
-        # TODO privacy checks
-        return await EntChild._genx_from_model(self.vc, model)  # noqa: SLF001
+
+
+class EntChildMutatorBulkCreationAction:
+    vc: ExampleViewerContext
+    actions: list[EntChildMutatorCreationAction]
+
+    def __init__(
+        self, vc: ExampleViewerContext, actions: Sequence[EntChildMutatorCreationAction]
+    ) -> None:
+        self.vc = vc
+        self.actions = list(actions)
+
+    async def gen_save(self) -> None:
+        """Insert all the Ents with a single flush, without loading them back."""
+        await self._gen_insert()
+
+    async def gen_savex(self) -> list[EntChild]:
+        """Insert all the Ents with a single flush and return them, in order."""
+        models = await self._gen_insert()
+        ents = await EntChild._gen_from_models(self.vc, models)  # noqa: SLF001
+        for model, ent in zip(models, ents, strict=True):
+            if not ent:
+                raise EntNotFoundError(f"No EntChild found for ID {model.id}")
+        return [ent for ent in ents if ent]
+
+    async def _gen_insert(self) -> list[EntChildModel]:
+        # Validate everything before writing anything
+        for action in self.actions:
+            action._validate()  # noqa: SLF001
+        models = [action._build_model() for action in self.actions]  # noqa: SLF001
+        models_by_shard: dict[int, list[EntChildModel]] = {}
+        for model in models:
+            models_by_shard.setdefault(get_shard_id(model.id), []).append(model)
+        for shard_models in models_by_shard.values():
+            session = get_session_for_id(get_session, shard_models[0].id)
+            # The unit of work batches the rows into multi-row INSERT statements
+            session.add_all(shard_models)
+            await session.flush()
+        pin_to_primary()
+        for model in models:
+            invalidate_ent(EntChildModel, model.id)
+        return models
 
 
 class EntChildMutatorUpdateAction:
@@ -279,15 +551,25 @@ class EntChildMutatorUpdateAction:
         self.parent_id = ent.parent_id
 
     async def gen_savex(self) -> EntChild:
-        session = get_session()
-
-        model = self.ent.model
-        model.name = self.name
-        model.parent_id = self.parent_id
+        session = get_session_for_id(get_session, self.ent.id)
+
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
+        changed = False
+        if self.name != model.name:
+            model.name = self.name
+            changed = True
+        if self.parent_id != model.parent_id:
+            model.parent_id = self.parent_id
+            changed = True
+        if not changed:
+            # Nothing to write
+            return self.ent
         model.updated_at = datetime.now(tz=UTC)
         session.add(model)
         await session.flush()
-        await session.refresh(model)
+        pin_to_primary()
+        invalidate_ent(EntChildModel, model.id)
         # TODO privacy checks
         return await EntChild._genx_from_model(self.vc, model)  # noqa: SLF001
 
@@ -301,11 +583,14 @@ class EntChildMutatorDeletionAction:
         self.ent = ent
 
     async def gen_save(self) -> None:
-        session = get_session()
-        model = self.ent.model
+        session = get_session_for_id(get_session, self.ent.id)
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
         # TODO privacy checks
         await session.delete(model)
         await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntChildModel, model.id)
 
 
 class EntChildExample:
@@ -333,14 +618,24 @@ class EntChildExample:
 
 
 def _get_field(field_name: str) -> Field:
+    return get_descriptor_metadata(EntChildSchema).get_field(field_name)
+
+
+def _get_validators(field_name: str) -> tuple[FieldValidator[Any], ...]:
+    return get_descriptor_metadata(EntChildSchema).validators[field_name]
+
+
+register_ent(EntChild, EntChildSchema)
+
+
+@cache
+def _get_privacy_rules_table() -> Mapping[Action, tuple[PrivacyRule, ...]]:
+    # The rules never change at runtime, we only build them once
     schema = EntChildSchema()
-    fields = schema.get_all_fields()
-    field = next(
-        filter(
-            lambda field: field.name == field_name,
-            fields,
-        )
+    return MappingProxyType(
+        {action: tuple(schema.get_privacy_rules(action)) for action in Action}
     )
-    if not field:
-        raise ValueError(f"Unknown field: {field_name}")
-    return field
+
+
+def _get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+    return _get_privacy_rules_table()[action]
@@ -18,19 +18,51 @@ from evc import ExampleViewerContext
 from database import get_session
 from .ent_model import EntModel
 from .ent_query import EntQuery
+from collections.abc import AsyncIterator
+from collections.abc import Mapping, Sequence
+from database import get_replica_session
 from ent_parent_schema import EntParentSchema
 from entpy import Field
+from entpy import FieldValidator
+from entpy import PrivacyRule
+from entpy import concurrent_privacy_evaluation
+from entpy.framework.identity_map import gen_read_decisions
+from entpy.framework.identity_map import remember_models
+from entpy.framework.loader import LoadedModels
+from entpy.framework.loader import MAX_IDS_PER_QUERY
+from entpy.framework.loader import gen_model_by_id, gen_models_by_ids
+from entpy.framework.loader import invalidate_ent
+from entpy.framework.prefetch import gen_prefetch
+from entpy.framework.registry import get_descriptor_metadata
+from entpy.framework.registry import register_ent
+from entpy.framework.session import gen_attach, pin_to_primary
+from entpy.framework.session import get_read_session
+from entpy.framework.sharding import get_session_for_id, get_shard_id
+from entpy.framework.sharding import group_by_shard
+from entpy.framework.sharding import use_shard
+from functools import cache
 from sentinels import NOTHING, Sentinel  # type: ignore[import-untyped]
 from sqlalchemy import ForeignKey
 from sqlalchemy import String
 from sqlalchemy import UUID as DBUUID
-from sqlalchemy import select, func, Result
+from sqlalchemy import select, Select, func, Result, Dialect
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import QueryableAttribute
+from types import MappingProxyType
+from typing import Any
 from typing import TypeVar
 from typing import TYPE_CHECKING
+import asyncio
 
 if TYPE_CHECKING:
     from .ent_grand_parent import EntGrandParent
+    from .ent_child import EntChild, EntChildQuery
+
+
+def _get_read_session() -> AsyncSession:
+    """The read session, or the primary one once this context wrote something."""
+    return get_read_session(get_replica_session, get_session)
 
 
 class EntParentModel(EntModel):
@@ -40,6 +72,7 @@ class EntParentModel(EntModel):
         DBUUID(),
         ForeignKey("grand_parent.id", deferrable=True, initially="DEFERRED"),
         nullable=False,
+        index=True,
     )
     name: Mapped[str] = mapped_column(String(100), nullable=False)
 
@@ -51,6 +84,8 @@ class EntParent(Ent[ExampleViewerContext]):
     def __init__(self, vc: ExampleViewerContext, model: EntParentModel) -> None:
         self.vc = vc
         self.model = model
+        # The edges loaded by gen_prefetch, by edge name
+        self._prefetched_edges: dict[str, Ent[Any]] = {}
 
     @property
     def id(self) -> UUID:
@@ -71,23 +106,54 @@ class EntParent(Ent[ExampleViewerContext]):
     async def gen_grand_parent(self) -> EntGrandParent:
         from .ent_grand_parent import EntGrandParent
 
+        prefetched = self._prefetched_edges.get("grand_parent")
+        if (
+            isinstance(prefetched, EntGrandParent)
+            and prefetched.id == self.model.grand_parent_id
+        ):
+            return prefetched
         return await EntGrandParent.genx(self.vc, self.model.grand_parent_id)
 
     @property
     def name(self) -> str:
         return self.model.name
 
-    async def _gen_evaluate_privacy(
-        self, vc: ExampleViewerContext, action: Action
-    ) -> Decision:
-        rules = EntParentSchema().get_privacy_rules(action)
-        for rule in rules:
-            decision = await rule.gen_evaluate(vc, self)
-            # If we get an ALLOW or DENY, we return instantly. Else, we keep going.
-            if decision != Decision.PASS:
-                return decision
-        # We default to denying
-        return Decision.DENY
+    def query_children(self) -> EntChildQuery:
+        """
+        The EntChild whose parent is this EntParent.
+        Only the shard of this EntParent is queried, so when sharding,
+        create them within `use_shard(get_shard_id(parent.id))`.
+        """
+        from .ent_child import EntChild, EntChildModel
+
+        query = EntChild.query(self.vc).where(EntChildModel.parent_id == self.id)
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_children(self) -> list[EntChild]:
+        return await self.query_children().gen()
+
+    async def gen_children_count_NO_PRIVACY(self) -> int:
+        return await self.query_children().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_children_many(
+        cls, vc: ExampleViewerContext, ents: Sequence[EntParent]
+    ) -> dict[UUID, list[EntChild]]:
+        """Load the children of several EntParent in batch."""
+        from .ent_child import EntChild, EntChildModel
+
+        ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[EntChild]] = {ent_id: [] for ent_id in ent_ids}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = EntChild.query(vc).where(EntChildModel.parent_id.in_(chunk))
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.parent_id
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
 
     @classmethod
     async def genx(cls, vc: ExampleViewerContext, ent_id: UUID | str) -> EntParent:
@@ -107,19 +173,97 @@ class EntParent(Ent[ExampleViewerContext]):
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {ent_id}") from e
 
-        session = get_session()
-        model = await session.get(EntParentModel, ent_id)
+        session = get_session_for_id(_get_read_session, ent_id)
+        model = await gen_model_by_id(session, EntParentModel, ent_id)
         return await cls._gen_from_model(vc, model)  # noqa: SLF001
 
+    @classmethod
+    async def genx_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntParent]:
+        ents = await cls.gen_many(vc, ent_ids)
+        missing = [str(ent_id) for ent_id, ent in ents.items() if not ent]
+        if missing:
+            ids = ", ".join(missing)
+            raise EntNotFoundError(f"No EntParent found for IDs {ids}")
+        return {ent_id: ent for ent_id, ent in ents.items() if ent}
+
+    @classmethod
+    async def gen_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntParent | None]:
+        # Convert str to UUID if needed
+        uuids: list[UUID] = []
+        for ent_id in ent_ids:
+            try:
+                uuids.append(UUID(ent_id) if isinstance(ent_id, str) else ent_id)
+            except ValueError as e:
+                raise ValidationError(f"Invalid ID format for {ent_id}") from e
+        # Remove the duplicates but keep the order of the IDs
+        uuids = list(dict.fromkeys(uuids))
+
+        models: dict[UUID, EntParentModel] = {}
+        for shard_ids in group_by_shard(uuids).values():
+            session = get_session_for_id(_get_read_session, shard_ids[0])
+            models |= await gen_models_by_ids(session, EntParentModel, shard_ids)
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(ent_id) for ent_id in uuids]
+        )
+        return dict(zip(uuids, ents, strict=True))
+
+    @classmethod
+    async def gen_prefetch(
+        cls,
+        vc: ExampleViewerContext,
+        ents: Sequence[EntParent],
+        edge_names: Sequence[str],
+    ) -> None:
+        for edge_name in edge_names:
+            if edge_name == "grand_parent":
+                from .ent_grand_parent import EntGrandParent
+
+                grand_parent_targets = await EntGrandParent.gen_many(
+                    vc,
+                    [
+                        ent.model.grand_parent_id
+                        for ent in ents
+                        if ent.model.grand_parent_id
+                    ],
+                )
+                for ent in ents:
+                    grand_parent_target = (
+                        grand_parent_targets.get(ent.model.grand_parent_id)
+                        if ent.model.grand_parent_id
+                        else None
+                    )
+                    if grand_parent_target:
+                        ent._prefetched_edges[edge_name] = grand_parent_target  # noqa: SLF001
+                continue
+            raise ValidationError(f"Unknown edge for EntParent: {edge_name}")
+
     @classmethod
     async def _gen_from_model(
         cls, vc: ExampleViewerContext, model: EntParentModel | None
     ) -> EntParent | None:
         if not model:
             return None
-        ent = EntParent(vc=vc, model=model)
-        decision = await ent._gen_evaluate_privacy(vc=vc, action=Action.READ)
-        return ent if decision == Decision.ALLOW else None
+        ents = await cls._gen_from_models(vc, [model])
+        return ents[0]
+
+    @classmethod
+    async def _gen_from_models(
+        cls, vc: ExampleViewerContext, models: Sequence[EntParentModel | None]
+    ) -> list[EntParent | None]:
+        remember_models(models)
+        ents = [EntParent(vc=vc, model=model) if model else None for model in models]
+        rules = _get_privacy_rules(Action.READ)
+        decisions = iter(
+            await gen_read_decisions(vc, rules, [ent for ent in ents if ent])
+        )
+        # There is one decision for each loaded ent, in the same order
+        return [
+            ent if ent and next(decisions) == Decision.ALLOW else None for ent in ents
+        ]
 
     @classmethod
     async def _genx_from_model(
@@ -147,28 +291,75 @@ class EntParentQuery(EntQuery[EntParent, EntParentModel]):
         self.query = select(EntParentModel)
 
     async def gen(self) -> list[EntParent]:
-        session = get_session()
-        result = await session.execute(self.query)
-        ents = await self._gen_ents(result)
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, self.limit_value)
+        else:
+            result = await self._get_session().execute(self.query)
+            rows = list(result.scalars().all())
+        ents = await self._gen_ents(rows)
         return list(filter(None, ents))
 
+    async def gen_stream(self, chunk_size: int = 1000) -> AsyncIterator[EntParent]:
+        session = self._get_session()
+        # Once a chunk is processed, the session can let go of the models it
+        # loaded (the rows, their implementations, the prefetched edges...)
+        loaded = LoadedModels(session)
+        try:
+            result = await session.stream_scalars(
+                self.query.execution_options(yield_per=chunk_size)
+            )
+        except BaseException:
+            loaded.close()
+            raise
+        try:
+            async for chunk in result.partitions():
+                ents = await self._gen_ents(chunk)
+                with loaded.paused():
+                    for ent in ents:
+                        if ent:
+                            yield ent
+                loaded.expunge()
+        finally:
+            loaded.close()
+            await result.close()
+
     async def _gen_ents(
-        self, result: Result[tuple[EntParentModel]]
+        self, models: Sequence[EntParentModel]
     ) -> list[EntParent | None]:
-        models = result.scalars().all()
-        return [
-            await EntParent._gen_from_model(self.vc, model)  # noqa: SLF001
-            for model in models
-        ]
+        with concurrent_privacy_evaluation(self.privacy_concurrency):
+            ents = await EntParent._gen_from_models(self.vc, models)  # noqa: SLF001
+        await gen_prefetch(self.vc, ents, self.prefetched_edges)
+        return ents
 
     async def gen_first(self) -> EntParent | None:
-        session = get_session()
-        result = await session.execute(self.query.limit(1))
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, 1)
+            return (await self._gen_ents(rows))[0] if rows else None
+        result = await self._get_session().execute(self.query.limit(1))
         return await self._gen_ent(result)
 
     async def _gen_ent(self, result: Result[tuple[EntParentModel]]) -> EntParent | None:
-        model = result.scalar_one_or_none()
-        return await EntParent._gen_from_model(self.vc, model)  # noqa: SLF001
+        row = result.scalar_one_or_none()
+        if not row:
+            return None
+        return (await self._gen_ents([row]))[0]
+
+    async def _gen_rows(
+        self, query: Select[Any]
+    ) -> list[tuple[EntParent | None, tuple[Any, ...]]]:
+        session = self._get_session()
+        rows = (await session.execute(query)).all()
+        ents = await self._gen_ents([row[0] for row in rows])
+        return [(ent, tuple(row[1:])) for ent, row in zip(ents, rows, strict=True)]
+
+    def _get_shard_session(self, shard_id: int | None) -> AsyncSession:
+        if shard_id is None:
+            return _get_read_session()
+        with use_shard(shard_id):
+            return _get_read_session()
+
+    def _get_dialect(self) -> Dialect:
+        return self._get_sessions()[0].get_bind().dialect
 
     async def genx_first(self) -> EntParent:
         ent = await self.gen_first()
@@ -177,23 +368,28 @@ class EntParentQuery(EntQuery[EntParent, EntParentModel]):
         return ent
 
     async def gen_count_NO_PRIVACY(self) -> int:
-        session = get_session()
-        count_query = self.query.with_only_columns(
-            func.count(), maintain_column_froms=True
-        ).order_by(None)
-        result = await session.execute(count_query)
-        count = result.scalar()
-        if count is None:
+        count_query = (
+            self.query.with_only_columns(func.count(), maintain_column_froms=True)
+            .order_by(None)
+            .limit(None)
+            .offset(None)
+        )
+        results = await asyncio.gather(
+            *[session.execute(count_query) for session in self._get_sessions()]
+        )
+        counts = [result.scalar() for result in results]
+        if None in counts:
             raise ExecutionError("Unable to get the count")
-        return count
+        return sum(count or 0 for count in counts)
+
+    def _get_id_column(self) -> QueryableAttribute[Any]:
+        return EntParentModel.id
 
     def order_by_id_asc(self) -> "EntParentQuery":
-        self.query = self.query.order_by(EntParentModel.id.asc())
-        return self
+        return self.order_by_key(EntParentModel.id)
 
     def order_by_id_desc(self) -> "EntParentQuery":
-        self.query = self.query.order_by(EntParentModel.id.desc())
-        return self
+        return self.order_by_key(EntParentModel.id, descending=True)
 
 
 class EntParentMutator:
@@ -216,6 +412,12 @@ class EntParentMutator:
             name=name,
         )
 
+    @classmethod
+    def create_many(
+        cls, vc: ExampleViewerContext, actions: Sequence[EntParentMutatorCreationAction]
+    ) -> EntParentMutatorBulkCreationAction:
+        return EntParentMutatorBulkCreationAction(vc=vc, actions=actions)
+
     @classmethod
     def update(
         cls, vc: ExampleViewerContext, ent: EntParent
@@ -252,19 +454,71 @@ class EntParentMutatorCreationAction:
         self.name = name
 
     async def gen_savex(self) -> EntParent:
-        session = get_session()
+        session = get_session_for_id(get_session, self.id)
+        self._validate()
+        model = self._build_model()
+        session.add(model)
+        await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntParentModel, self.id)
+        # TODO privacy checks
+        return await EntParent._genx_from_model(self.vc, model)  # noqa: SLF001
+
+    def _validate(self) -> None:
+        pass
 
-        model = EntParentModel(
+    def _build_model(self) -> EntParentModel:
+        return EntParentModel(
             id=self.id,
             updated_at=self.updated_at,
             created_at=self.created_at,
             grand_parent_id=self.grand_parent_id,
             name=self.name,
         )
-        session.add(model)
-        await session.flush()
-        # TODO privacy checks
-        return await EntParent._genx_from_model(self.vc, model)  # noqa: SLF001
+
+
+class EntParentMutatorBulkCreationAction:
+    vc: ExampleViewerContext
+    actions: list[EntParentMutatorCreationAction]
+
+    def __init__(
+        self,
+        vc: ExampleViewerContext,
+        actions: Sequence[EntParentMutatorCreationAction],
+    ) -> None:
+        self.vc = vc
+        self.actions = list(actions)
+
+    async def gen_save(self) -> None:
+        """Insert all the Ents with a single flush, without loading them back."""
+        await self._gen_insert()
+
+    async def gen_savex(self) -> list[EntParent]:
+        """Insert all the Ents with a single flush and return them, in order."""
+        models = await self._gen_insert()
+        ents = await EntParent._gen_from_models(self.vc, models)  # noqa: SLF001
+        for model, ent in zip(models, ents, strict=True):
+            if not ent:
+                raise EntNotFoundError(f"No EntParent found for ID {model.id}")
+        return [ent for ent in ents if ent]
+
+    async def _gen_insert(self) -> list[EntParentModel]:
+        # Validate everything before writing anything
+        for action in self.actions:
+            action._validate()  # noqa: SLF001
+        models = [action._build_model() for action in self.actions]  # noqa: SLF001
+        models_by_shard: dict[int, list[EntParentModel]] = {}
+        for model in models:
+            models_by_shard.setdefault(get_shard_id(model.id), []).append(model)
+        for shard_models in models_by_shard.values():
+            session = get_session_for_id(get_session, shard_models[0].id)
+            # The unit of work batches the rows into multi-row INSERT statements
+            session.add_all(shard_models)
+            await session.flush()
+        pin_to_primary()
+        for model in models:
+            invalidate_ent(EntParentModel, model.id)
+        return models
 
 
 class EntParentMutatorUpdateAction:
@@ -281,15 +535,25 @@ class EntParentMutatorUpdateAction:
         self.name = ent.name
 
     async def gen_savex(self) -> EntParent:
-        session = get_session()
-
-        model = self.ent.model
-        model.grand_parent_id = self.grand_parent_id
-        model.name = self.name
+        session = get_session_for_id(get_session, self.ent.id)
+
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
+        changed = False
+        if self.grand_parent_id != model.grand_parent_id:
+            model.grand_parent_id = self.grand_parent_id
+            changed = True
+        if self.name != model.name:
+            model.name = self.name
+            changed = True
+        if not changed:
+            # Nothing to write
+            return self.ent
         model.updated_at = datetime.now(tz=UTC)
         session.add(model)
         await session.flush()
-        await session.refresh(model)
+        pin_to_primary()
+        invalidate_ent(EntParentModel, model.id)
         # TODO privacy checks
         return await EntParent._genx_from_model(self.vc, model)  # noqa: SLF001
 
@@ -303,11 +567,14 @@ class EntParentMutatorDeletionAction:
         self.ent = ent
 
     async def gen_save(self) -> None:
-        session = get_session()
-        model = self.ent.model
+        session = get_session_for_id(get_session, self.ent.id)
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
         # TODO privacy checks
         await session.delete(model)
         await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntParentModel, model.id)
 
 
 class EntParentExample:
@@ -334,14 +601,24 @@ class EntParentExample:
 
 
 def _get_field(field_name: str) -> Field:
+    return get_descriptor_metadata(EntParentSchema).get_field(field_name)
+
+
+def _get_validators(field_name: str) -> tuple[FieldValidator[Any], ...]:
+    return get_descriptor_metadata(EntParentSchema).validators[field_name]
+
+
+register_ent(EntParent, EntParentSchema)
+
+
+@cache
+def _get_privacy_rules_table() -> Mapping[Action, tuple[PrivacyRule, ...]]:
+    # The rules never change at runtime, we only build them once
     schema = EntParentSchema()
-    fields = schema.get_all_fields()
-    field = next(
-        filter(
-            lambda field: field.name == field_name,
-            fields,
-        )
+    return MappingProxyType(
+        {action: tuple(schema.get_privacy_rules(action)) for action in Action}
     )
-    if not field:
-        raise ValueError(f"Unknown field: {field_name}")
-    return field
+
+
+def _get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+    return _get_privacy_rules_table()[action]
@@ -21,12 +21,33 @@ from .ent_test_thing import EntTestThingModel
 from .ent_test_thing import IEntTestThing
 from .ent_test_thing import IEntTestThingMutatorDeletionAction
 from .ent_test_thing import IEntTestThingMutatorUpdateAction
+from collections.abc import AsyncIterator
+from collections.abc import Mapping, Sequence
+from database import get_replica_session
 from datetime import time
 from ent_test_object_schema import EntTestObjectSchema
 from ent_test_object_schema import Status
 from ent_test_thing_pattern import ThingStatus
 from entpy import Field, FieldWithDynamicExample
+from entpy import FieldValidator
+from entpy import PrivacyRule
+from entpy import concurrent_privacy_evaluation
+from entpy.framework.identity_map import gen_read_decisions
+from entpy.framework.identity_map import remember_models
+from entpy.framework.loader import LoadedModels
+from entpy.framework.loader import MAX_IDS_PER_QUERY
+from entpy.framework.loader import gen_model_by_id, gen_models_by_ids
+from entpy.framework.loader import invalidate_ent
+from entpy.framework.prefetch import gen_prefetch
+from entpy.framework.registry import get_descriptor_metadata
+from entpy.framework.registry import register_ent
+from entpy.framework.session import gen_attach, pin_to_primary
+from entpy.framework.session import get_read_session
+from entpy.framework.sharding import get_session_for_id, get_shard_id
+from entpy.framework.sharding import group_by_shard
+from entpy.framework.sharding import use_shard
 from entpy.types import DateTime
+from functools import cache
 from sentinels import NOTHING, Sentinel  # type: ignore[import-untyped]
 from sqlalchemy import Boolean
 from sqlalchemy import Enum as DBEnum
@@ -38,11 +59,16 @@ from sqlalchemy import Text
 from sqlalchemy import Time
 from sqlalchemy import UUID as DBUUID
 from sqlalchemy import select
-from sqlalchemy import func, Result
+from sqlalchemy import Select, func, Result, Dialect
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import QueryableAttribute
+from types import MappingProxyType
+from typing import Any
 from typing import TypeVar
 from typing import TYPE_CHECKING
+import asyncio
 
 if TYPE_CHECKING:
     from .ent_test_object5 import EntTestObject5
@@ -50,6 +76,11 @@ if TYPE_CHECKING:
     from .ent_test_thing import IEntTestThing
 
 
+def _get_read_session() -> AsyncSession:
+    """The read session, or the primary one once this context wrote something."""
+    return get_read_session(get_replica_session, get_session)
+
+
 class EntTestObjectModel(EntTestThingModel):
     __tablename__ = "test_object"
 
@@ -58,6 +89,7 @@ class EntTestObjectModel(EntTestThingModel):
         DBUUID(),
         ForeignKey("test_sub_object.id", deferrable=True, initially="DEFERRED"),
         nullable=False,
+        index=True,
     )
     username: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
     lastname: Mapped[str | None] = mapped_column(
@@ -75,16 +107,19 @@ class EntTestObjectModel(EntTestThingModel):
         DBUUID(),
         ForeignKey("test_sub_object.id", deferrable=True, initially="DEFERRED"),
         nullable=True,
+        index=True,
     )
     optional_sub_object_no_ex_id: Mapped[UUID | None] = mapped_column(
         DBUUID(),
         ForeignKey("test_sub_object.id", deferrable=True, initially="DEFERRED"),
         nullable=True,
+        index=True,
     )
     self_id: Mapped[UUID | None] = mapped_column(
         DBUUID(),
         ForeignKey("test_object.id", deferrable=True, initially="DEFERRED"),
         nullable=True,
+        index=True,
     )
     some_json: Mapped[list[str] | None] = mapped_column(
         JSON().with_variant(JSONB(), "postgresql"), nullable=True
@@ -111,6 +146,8 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
     def __init__(self, vc: ExampleViewerContext, model: EntTestObjectModel) -> None:
         self.vc = vc
         self.model = model
+        # The edges loaded by gen_prefetch, by edge name
+        self._prefetched_edges: dict[str, Ent[Any]] = {}
 
     @property
     def id(self) -> UUID:
@@ -139,6 +176,12 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
     async def gen_obj5(self) -> EntTestObject5:
         from .ent_test_object5 import EntTestObject5
 
+        prefetched = self._prefetched_edges.get("obj5")
+        if (
+            isinstance(prefetched, EntTestObject5)
+            and prefetched.id == self.model.obj5_id
+        ):
+            return prefetched
         return await EntTestObject5.genx(self.vc, self.model.obj5_id)
 
     @property
@@ -148,6 +191,12 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
     async def gen_required_sub_object(self) -> EntTestSubObject:
         from .ent_test_sub_object import EntTestSubObject
 
+        prefetched = self._prefetched_edges.get("required_sub_object")
+        if (
+            isinstance(prefetched, EntTestSubObject)
+            and prefetched.id == self.model.required_sub_object_id
+        ):
+            return prefetched
         return await EntTestSubObject.genx(self.vc, self.model.required_sub_object_id)
 
     @property
@@ -196,6 +245,12 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
     async def gen_obj5_opt(self) -> "EntTestObject5" | None:
         from .ent_test_object5 import EntTestObject5
 
+        prefetched = self._prefetched_edges.get("obj5_opt")
+        if (
+            isinstance(prefetched, EntTestObject5)
+            and prefetched.id == self.model.obj5_opt_id
+        ):
+            return prefetched
         if self.model.obj5_opt_id:
             return await EntTestObject5.gen(self.vc, self.model.obj5_opt_id)
         return None
@@ -207,6 +262,12 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
     async def gen_optional_sub_object(self) -> "EntTestSubObject" | None:
         from .ent_test_sub_object import EntTestSubObject
 
+        prefetched = self._prefetched_edges.get("optional_sub_object")
+        if (
+            isinstance(prefetched, EntTestSubObject)
+            and prefetched.id == self.model.optional_sub_object_id
+        ):
+            return prefetched
         if self.model.optional_sub_object_id:
             return await EntTestSubObject.gen(
                 self.vc, self.model.optional_sub_object_id
@@ -220,6 +281,12 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
     async def gen_optional_sub_object_no_ex(self) -> "EntTestSubObject" | None:
         from .ent_test_sub_object import EntTestSubObject
 
+        prefetched = self._prefetched_edges.get("optional_sub_object_no_ex")
+        if (
+            isinstance(prefetched, EntTestSubObject)
+            and prefetched.id == self.model.optional_sub_object_no_ex_id
+        ):
+            return prefetched
         if self.model.optional_sub_object_no_ex_id:
             return await EntTestSubObject.gen(
                 self.vc, self.model.optional_sub_object_no_ex_id
@@ -231,7 +298,12 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
         return self.model.self_id
 
     async def gen_self(self) -> "EntTestObject" | None:
-
+        prefetched = self._prefetched_edges.get("self")
+        if (
+            isinstance(prefetched, EntTestObject)
+            and prefetched.id == self.model.self_id
+        ):
+            return prefetched
         if self.model.self_id:
             return await EntTestObject.gen(self.vc, self.model.self_id)
         return None
@@ -247,6 +319,12 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
     async def gen_some_pattern(self) -> "IEntTestThing" | None:
         from .ent_test_thing import IEntTestThing
 
+        prefetched = self._prefetched_edges.get("some_pattern")
+        if (
+            isinstance(prefetched, IEntTestThing)
+            and prefetched.id == self.model.some_pattern_id
+        ):
+            return prefetched
         if self.model.some_pattern_id:
             return await IEntTestThing.gen(self.vc, self.model.some_pattern_id)
         return None
@@ -279,17 +357,42 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
     def when_is_it_cool(self) -> datetime | None:
         return self.model.when_is_it_cool
 
-    async def _gen_evaluate_privacy(
-        self, vc: ExampleViewerContext, action: Action
-    ) -> Decision:
-        rules = EntTestObjectSchema().get_privacy_rules(action)
-        for rule in rules:
-            decision = await rule.gen_evaluate(vc, self)
-            # If we get an ALLOW or DENY, we return instantly. Else, we keep going.
-            if decision != Decision.PASS:
-                return decision
-        # We default to denying
-        return Decision.DENY
+    def query_test_objects(self) -> EntTestObjectQuery:
+        """
+        The EntTestObject whose self is this EntTestObject.
+        Only the shard of this EntTestObject is queried, so when sharding,
+        create them within `use_shard(get_shard_id(test_object.id))`.
+        """
+        query = EntTestObject.query(self.vc).where(
+            EntTestObjectModel.self_id == self.id
+        )
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_test_objects(self) -> list[EntTestObject]:
+        return await self.query_test_objects().gen()
+
+    async def gen_test_objects_count_NO_PRIVACY(self) -> int:
+        return await self.query_test_objects().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_test_objects_many(
+        cls, vc: ExampleViewerContext, ents: Sequence[EntTestObject]
+    ) -> dict[UUID, list[EntTestObject]]:
+        """Load the test_objects of several EntTestObject in batch."""
+        ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[EntTestObject]] = {ent_id: [] for ent_id in ent_ids}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = EntTestObject.query(vc).where(
+                    EntTestObjectModel.self_id.in_(chunk)
+                )
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.self_id
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
 
     @classmethod
     async def genx(cls, vc: ExampleViewerContext, ent_id: UUID | str) -> EntTestObject:
@@ -309,15 +412,49 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {ent_id}") from e
 
-        session = get_session()
-        model = await session.get(EntTestObjectModel, ent_id)
+        session = get_session_for_id(_get_read_session, ent_id)
+        model = await gen_model_by_id(session, EntTestObjectModel, ent_id)
         return await cls._gen_from_model(vc, model)  # noqa: SLF001
 
+    @classmethod
+    async def genx_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntTestObject]:
+        ents = await cls.gen_many(vc, ent_ids)
+        missing = [str(ent_id) for ent_id, ent in ents.items() if not ent]
+        if missing:
+            ids = ", ".join(missing)
+            raise EntNotFoundError(f"No EntTestObject found for IDs {ids}")
+        return {ent_id: ent for ent_id, ent in ents.items() if ent}
+
+    @classmethod
+    async def gen_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntTestObject | None]:
+        # Convert str to UUID if needed
+        uuids: list[UUID] = []
+        for ent_id in ent_ids:
+            try:
+                uuids.append(UUID(ent_id) if isinstance(ent_id, str) else ent_id)
+            except ValueError as e:
+                raise ValidationError(f"Invalid ID format for {ent_id}") from e
+        # Remove the duplicates but keep the order of the IDs
+        uuids = list(dict.fromkeys(uuids))
+
+        models: dict[UUID, EntTestObjectModel] = {}
+        for shard_ids in group_by_shard(uuids).values():
+            session = get_session_for_id(_get_read_session, shard_ids[0])
+            models |= await gen_models_by_ids(session, EntTestObjectModel, shard_ids)
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(ent_id) for ent_id in uuids]
+        )
+        return dict(zip(uuids, ents, strict=True))
+
     @classmethod
     async def gen_from_username(
         cls, vc: ExampleViewerContext, username: str
     ) -> EntTestObject | None:
-        session = get_session()
+        session = _get_read_session()
         result = await session.execute(
             select(EntTestObjectModel).where(EntTestObjectModel.username == username)
         )
@@ -333,15 +470,204 @@ class EntTestObject(IEntTestThing, Ent[ExampleViewerContext]):
             raise EntNotFoundError(f"No EntTestObject found for username {username}")
         return result
 
+    @classmethod
+    async def gen_many_from_username(
+        cls, vc: ExampleViewerContext, values: Sequence[str]
+    ) -> dict[str, EntTestObject | None]:
+        """Load the EntTestObject for each username, in chunks of `MAX_IDS_PER_QUERY`."""
+        # Remove the duplicates but keep the order of the values
+        keys = list(dict.fromkeys(values))
+        session = _get_read_session()
+        models: dict[str, EntTestObjectModel] = {}
+        for i in range(0, len(keys), MAX_IDS_PER_QUERY):
+            chunk = keys[i : i + MAX_IDS_PER_QUERY]
+            result = await session.execute(
+                select(EntTestObjectModel).where(EntTestObjectModel.username.in_(chunk))
+            )
+            for model in result.scalars():
+                models[model.username] = model
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(key) for key in keys]
+        )
+        return dict(zip(keys, ents, strict=True))
+
+    @classmethod
+    async def genx_many_from_username(
+        cls, vc: ExampleViewerContext, values: Sequence[str]
+    ) -> dict[str, EntTestObject]:
+        ents = await cls.gen_many_from_username(vc, values)
+        missing = [str(key) for key, ent in ents.items() if not ent]
+        if missing:
+            keys = ", ".join(missing)
+            raise EntNotFoundError(f"No EntTestObject found for username {keys}")
+        return {key: ent for key, ent in ents.items() if ent}
+
+    @classmethod
+    async def gen_prefetch(
+        cls,
+        vc: ExampleViewerContext,
+        ents: Sequence[EntTestObject],
+        edge_names: Sequence[str],
+    ) -> None:
+        for edge_name in edge_names:
+            if edge_name == "obj5":
+                from .ent_test_object5 import EntTestObject5
+
+                obj5_targets = await EntTestObject5.gen_many(
+                    vc, [ent.model.obj5_id for ent in ents if ent.model.obj5_id]
+                )
+                for ent in ents:
+                    obj5_target = (
+                        obj5_targets.get(ent.model.obj5_id)
+                        if ent.model.obj5_id
+                        else None
+                    )
+                    if obj5_target:
+                        ent._prefetched_edges[edge_name] = obj5_target  # noqa: SLF001
+                continue
+            if edge_name == "required_sub_object":
+                from .ent_test_sub_object import EntTestSubObject
+
+                required_sub_object_targets = await EntTestSubObject.gen_many(
+                    vc,
+                    [
+                        ent.model.required_sub_object_id
+                        for ent in ents
+                        if ent.model.required_sub_object_id
+                    ],
+                )
+                for ent in ents:
+                    required_sub_object_target = (
+                        required_sub_object_targets.get(
+                            ent.model.required_sub_object_id
+                        )
+                        if ent.model.required_sub_object_id
+                        else None
+                    )
+                    if required_sub_object_target:
+                        ent._prefetched_edges[edge_name] = required_sub_object_target  # noqa: SLF001
+                continue
+            if edge_name == "obj5_opt":
+                from .ent_test_object5 import EntTestObject5
+
+                obj5_opt_targets = await EntTestObject5.gen_many(
+                    vc, [ent.model.obj5_opt_id for ent in ents if ent.model.obj5_opt_id]
+                )
+                for ent in ents:
+                    obj5_opt_target = (
+                        obj5_opt_targets.get(ent.model.obj5_opt_id)
+                        if ent.model.obj5_opt_id
+                        else None
+                    )
+                    if obj5_opt_target:
+                        ent._prefetched_edges[edge_name] = obj5_opt_target  # noqa: SLF001
+                continue
+            if edge_name == "optional_sub_object":
+                from .ent_test_sub_object import EntTestSubObject
+
+                optional_sub_object_targets = await EntTestSubObject.gen_many(
+                    vc,
+                    [
+                        ent.model.optional_sub_object_id
+                        for ent in ents
+                        if ent.model.optional_sub_object_id
+                    ],
+                )
+                for ent in ents:
+                    optional_sub_object_target = (
+                        optional_sub_object_targets.get(
+                            ent.model.optional_sub_object_id
+                        )
+                        if ent.model.optional_sub_object_id
+                        else None
+                    )
+                    if optional_sub_object_target:
+                        ent._prefetched_edges[edge_name] = optional_sub_object_target  # noqa: SLF001
+                continue
+            if edge_name == "optional_sub_object_no_ex":
+                from .ent_test_sub_object import EntTestSubObject
+
+                optional_sub_object_no_ex_targets = await EntTestSubObject.gen_many(
+                    vc,
+                    [
+                        ent.model.optional_sub_object_no_ex_id
+                        for ent in ents
+                        if ent.model.optional_sub_object_no_ex_id
+                    ],
+                )
+                for ent in ents:
+                    optional_sub_object_no_ex_target = (
+                        optional_sub_object_no_ex_targets.get(
+                            ent.model.optional_sub_object_no_ex_id
+                        )
+                        if ent.model.optional_sub_object_no_ex_id
+                        else None
+                    )
+                    if optional_sub_object_no_ex_target:
+                        ent._prefetched_edges[edge_name] = (
+                            optional_sub_object_no_ex_target  # noqa: SLF001
+                        )
+                continue
+            if edge_name == "self":
+                self_targets = await EntTestObject.gen_many(
+                    vc, [ent.model.self_id for ent in ents if ent.model.self_id]
+                )
+                for ent in ents:
+                    self_target = (
+                        self_targets.get(ent.model.self_id)
+                        if ent.model.self_id
+                        else None
+                    )
+                    if self_target:
+                        ent._prefetched_edges[edge_name] = self_target  # noqa: SLF001
+                continue
+            if edge_name == "some_pattern":
+                from .ent_test_thing import IEntTestThing
+
+                some_pattern_targets = await IEntTestThing.gen_many(
+                    vc,
+                    [
+                        ent.model.some_pattern_id
+                        for ent in ents
+                        if ent.model.some_pattern_id
+                    ],
+                )
+                for ent in ents:
+                    some_pattern_target = (
+                        some_pattern_targets.get(ent.model.some_pattern_id)
+                        if ent.model.some_pattern_id
+                        else None
+                    )
+                    if some_pattern_target:
+                        ent._prefetched_edges[edge_name] = some_pattern_target  # noqa: SLF001
+                continue
+            raise ValidationError(f"Unknown edge for EntTestObject: {edge_name}")
+
     @classmethod
     async def _gen_from_model(
         cls, vc: ExampleViewerContext, model: EntTestObjectModel | None
     ) -> EntTestObject | None:
         if not model:
             return None
-        ent = EntTestObject(vc=vc, model=model)
-        decision = await ent._gen_evaluate_privacy(vc=vc, action=Action.READ)
-        return ent if decision == Decision.ALLOW else None
+        ents = await cls._gen_from_models(vc, [model])
+        return ents[0]
+
+    @classmethod
+    async def _gen_from_models(
+        cls, vc: ExampleViewerContext, models: Sequence[EntTestObjectModel | None]
+    ) -> list[EntTestObject | None]:
+        remember_models(models)
+        ents = [
+            EntTestObject(vc=vc, model=model) if model else None for model in models
+        ]
+        rules = _get_privacy_rules(Action.READ)
+        decisions = iter(
+            await gen_read_decisions(vc, rules, [ent for ent in ents if ent])
+        )
+        # There is one decision for each loaded ent, in the same order
+        return [
+            ent if ent and next(decisions) == Decision.ALLOW else None for ent in ents
+        ]
 
     @classmethod
     async def _genx_from_model(
@@ -369,30 +695,77 @@ class EntTestObjectQuery(EntQuery[EntTestObject, EntTestObjectModel]):
         self.query = select(EntTestObjectModel)
 
     async def gen(self) -> list[EntTestObject]:
-        session = get_session()
-        result = await session.execute(self.query)
-        ents = await self._gen_ents(result)
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, self.limit_value)
+        else:
+            result = await self._get_session().execute(self.query)
+            rows = list(result.scalars().all())
+        ents = await self._gen_ents(rows)
         return list(filter(None, ents))
 
+    async def gen_stream(self, chunk_size: int = 1000) -> AsyncIterator[EntTestObject]:
+        session = self._get_session()
+        # Once a chunk is processed, the session can let go of the models it
+        # loaded (the rows, their implementations, the prefetched edges...)
+        loaded = LoadedModels(session)
+        try:
+            result = await session.stream_scalars(
+                self.query.execution_options(yield_per=chunk_size)
+            )
+        except BaseException:
+            loaded.close()
+            raise
+        try:
+            async for chunk in result.partitions():
+                ents = await self._gen_ents(chunk)
+                with loaded.paused():
+                    for ent in ents:
+                        if ent:
+                            yield ent
+                loaded.expunge()
+        finally:
+            loaded.close()
+            await result.close()
+
     async def _gen_ents(
-        self, result: Result[tuple[EntTestObjectModel]]
+        self, models: Sequence[EntTestObjectModel]
     ) -> list[EntTestObject | None]:
-        models = result.scalars().all()
-        return [
-            await EntTestObject._gen_from_model(self.vc, model)  # noqa: SLF001
-            for model in models
-        ]
+        with concurrent_privacy_evaluation(self.privacy_concurrency):
+            ents = await EntTestObject._gen_from_models(self.vc, models)  # noqa: SLF001
+        await gen_prefetch(self.vc, ents, self.prefetched_edges)
+        return ents
 
     async def gen_first(self) -> EntTestObject | None:
-        session = get_session()
-        result = await session.execute(self.query.limit(1))
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, 1)
+            return (await self._gen_ents(rows))[0] if rows else None
+        result = await self._get_session().execute(self.query.limit(1))
         return await self._gen_ent(result)
 
     async def _gen_ent(
         self, result: Result[tuple[EntTestObjectModel]]
     ) -> EntTestObject | None:
-        model = result.scalar_one_or_none()
-        return await EntTestObject._gen_from_model(self.vc, model)  # noqa: SLF001
+        row = result.scalar_one_or_none()
+        if not row:
+            return None
+        return (await self._gen_ents([row]))[0]
+
+    async def _gen_rows(
+        self, query: Select[Any]
+    ) -> list[tuple[EntTestObject | None, tuple[Any, ...]]]:
+        session = self._get_session()
+        rows = (await session.execute(query)).all()
+        ents = await self._gen_ents([row[0] for row in rows])
+        return [(ent, tuple(row[1:])) for ent, row in zip(ents, rows, strict=True)]
+
+    def _get_shard_session(self, shard_id: int | None) -> AsyncSession:
+        if shard_id is None:
+            return _get_read_session()
+        with use_shard(shard_id):
+            return _get_read_session()
+
+    def _get_dialect(self) -> Dialect:
+        return self._get_sessions()[0].get_bind().dialect
 
     async def genx_first(self) -> EntTestObject:
         ent = await self.gen_first()
@@ -401,23 +774,40 @@ class EntTestObjectQuery(EntQuery[EntTestObject, EntTestObjectModel]):
         return ent
 
     async def gen_count_NO_PRIVACY(self) -> int:
-        session = get_session()
-        count_query = self.query.with_only_columns(
-            func.count(), maintain_column_froms=True
-        ).order_by(None)
-        result = await session.execute(count_query)
-        count = result.scalar()
-        if count is None:
+        count_query = (
+            self.query.with_only_columns(func.count(), maintain_column_froms=True)
+            .order_by(None)
+            .limit(None)
+            .offset(None)
+        )
+        results = await asyncio.gather(
+            *[session.execute(count_query) for session in self._get_sessions()]
+        )
+        counts = [result.scalar() for result in results]
+        if None in counts:
             raise ExecutionError("Unable to get the count")
-        return count
+        return sum(count or 0 for count in counts)
+
+    def _get_id_column(self) -> QueryableAttribute[Any]:
+        return EntTestObjectModel.id
 
     def order_by_id_asc(self) -> "EntTestObjectQuery":
-        self.query = self.query.order_by(EntTestObjectModel.id.asc())
-        return self
+        return self.order_by_key(EntTestObjectModel.id)
 
     def order_by_id_desc(self) -> "EntTestObjectQuery":
-        self.query = self.query.order_by(EntTestObjectModel.id.desc())
-        return self
+        return self.order_by_key(EntTestObjectModel.id, descending=True)
+
+    def order_by_firstname_asc(self) -> "EntTestObjectQuery":
+        return self.order_by_key(EntTestObjectModel.firstname)
+
+    def order_by_firstname_desc(self) -> "EntTestObjectQuery":
+        return self.order_by_key(EntTestObjectModel.firstname, descending=True)
+
+    def order_by_username_asc(self) -> "EntTestObjectQuery":
+        return self.order_by_key(EntTestObjectModel.username)
+
+    def order_by_username_desc(self) -> "EntTestObjectQuery":
+        return self.order_by_key(EntTestObjectModel.username, descending=True)
 
 
 class EntTestObjectMutator:
@@ -488,6 +878,14 @@ class EntTestObjectMutator:
             when_is_it_cool=when_is_it_cool,
         )
 
+    @classmethod
+    def create_many(
+        cls,
+        vc: ExampleViewerContext,
+        actions: Sequence[EntTestObjectMutatorCreationAction],
+    ) -> EntTestObjectMutatorBulkCreationAction:
+        return EntTestObjectMutatorBulkCreationAction(vc=vc, actions=actions)
+
     @classmethod
     def update(
         cls, vc: ExampleViewerContext, ent: EntTestObject
@@ -596,23 +994,29 @@ class EntTestObjectMutatorCreationAction:
         self.when_is_it_cool = when_is_it_cool
 
     async def gen_savex(self) -> EntTestObject:
-        session = get_session()
+        session = get_session_for_id(get_session, self.id)
+        self._validate()
+        model = self._build_model()
+        session.add(model)
+        await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntTestObjectModel, self.id)
+        # TODO privacy checks
+        return await EntTestObject._genx_from_model(self.vc, model)  # noqa: SLF001
 
-        a_pattern_validated_field_validators = _get_field(
-            "a_pattern_validated_field"
-        )._validators  # noqa: SLF001
-        for validator in a_pattern_validated_field_validators:
+    def _validate(self) -> None:
+        for validator in _get_validators("a_pattern_validated_field"):
             if not validator.validate(self.a_pattern_validated_field):
                 raise ValidationError(
                     "Invalid value for EntTestObject.a_pattern_validated_field"
                 )
 
-        validated_field_validators = _get_field("validated_field")._validators  # noqa: SLF001
-        for validator in validated_field_validators:
+        for validator in _get_validators("validated_field"):
             if not validator.validate(self.validated_field):
                 raise ValidationError("Invalid value for EntTestObject.validated_field")
 
-        model = EntTestObjectModel(
+    def _build_model(self) -> EntTestObjectModel:
+        return EntTestObjectModel(
             id=self.id,
             updated_at=self.updated_at,
             created_at=self.created_at,
@@ -643,10 +1047,50 @@ class EntTestObjectMutatorCreationAction:
             validated_field=self.validated_field,
             when_is_it_cool=self.when_is_it_cool,
         )
-        session.add(model)
-        await session.flush()
-        # TODO privacy checks
-        return await EntTestObject._genx_from_model(self.vc, model)  # noqa: SLF001
+
+
+class EntTestObjectMutatorBulkCreationAction:
+    vc: ExampleViewerContext
+    actions: list[EntTestObjectMutatorCreationAction]
+
+    def __init__(
+        self,
+        vc: ExampleViewerContext,
+        actions: Sequence[EntTestObjectMutatorCreationAction],
+    ) -> None:
+        self.vc = vc
+        self.actions = list(actions)
+
+    async def gen_save(self) -> None:
+        """Insert all the Ents with a single flush, without loading them back."""
+        await self._gen_insert()
+
+    async def gen_savex(self) -> list[EntTestObject]:
+        """Insert all the Ents with a single flush and return them, in order."""
+        models = await self._gen_insert()
+        ents = await EntTestObject._gen_from_models(self.vc, models)  # noqa: SLF001
+        for model, ent in zip(models, ents, strict=True):
+            if not ent:
+                raise EntNotFoundError(f"No EntTestObject found for ID {model.id}")
+        return [ent for ent in ents if ent]
+
+    async def _gen_insert(self) -> list[EntTestObjectModel]:
+        # Validate everything before writing anything
+        for action in self.actions:
+            action._validate()  # noqa: SLF001
+        models = [action._build_model() for action in self.actions]  # noqa: SLF001
+        models_by_shard: dict[int, list[EntTestObjectModel]] = {}
+        for model in models:
+            models_by_shard.setdefault(get_shard_id(model.id), []).append(model)
+        for shard_models in models_by_shard.values():
+            session = get_session_for_id(get_session, shard_models[0].id)
+            # The unit of work batches the rows into multi-row INSERT statements
+            session.add_all(shard_models)
+            await session.flush()
+        pin_to_primary()
+        for model in models:
+            invalidate_ent(EntTestObjectModel, model.id)
+        return models
 
 
 class EntTestObjectMutatorUpdateAction(IEntTestThingMutatorUpdateAction):
@@ -709,52 +1153,104 @@ class EntTestObjectMutatorUpdateAction(IEntTestThingMutatorUpdateAction):
         self.when_is_it_cool = ent.when_is_it_cool
 
     async def gen_savex(self) -> EntTestObject:
-        session = get_session()
+        session = get_session_for_id(get_session, self.ent.id)
 
-        a_pattern_validated_field_validators = _get_field(
-            "a_pattern_validated_field"
-        )._validators  # noqa: SLF001
-        for validator in a_pattern_validated_field_validators:
+        for validator in _get_validators("a_pattern_validated_field"):
             if not validator.validate(self.a_pattern_validated_field):
                 raise ValidationError(
                     "Invalid value for EntTestObject.a_pattern_validated_field"
                 )
 
-        validated_field_validators = _get_field("validated_field")._validators  # noqa: SLF001
-        for validator in validated_field_validators:
+        for validator in _get_validators("validated_field"):
             if not validator.validate(self.validated_field):
                 raise ValidationError("Invalid value for EntTestObject.validated_field")
 
-        model = self.ent.model
-        model.a_good_thing = self.a_good_thing
-        model.firstname = self.firstname
-        model.obj5_id = self.obj5_id
-        model.required_sub_object_id = self.required_sub_object_id
-        model.username = self.username
-        model.lastname = self.lastname
-        model.sadness = self.sadness
-        model.a_pattern_validated_field = self.a_pattern_validated_field
-        model.city = self.city
-        model.correlation_id = self.correlation_id
-        model.end_time = self.end_time
-        model.is_it_true = self.is_it_true
-        model.obj5_opt_id = self.obj5_opt_id
-        model.optional_sub_object_id = self.optional_sub_object_id
-        model.optional_sub_object_no_ex_id = self.optional_sub_object_no_ex_id
-        model.self_id = self.self_id
-        model.some_json = self.some_json
-        model.some_pattern_id = self.some_pattern_id
-        model.start_time = self.start_time
-        model.status = self.status
-        model.status_code = self.status_code
-        model.thing_status = self.thing_status
-        model.trace_id = self.trace_id
-        model.validated_field = self.validated_field
-        model.when_is_it_cool = self.when_is_it_cool
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
+        changed = False
+        if self.a_good_thing != model.a_good_thing:
+            model.a_good_thing = self.a_good_thing
+            changed = True
+        if self.firstname != model.firstname:
+            model.firstname = self.firstname
+            changed = True
+        if self.obj5_id != model.obj5_id:
+            model.obj5_id = self.obj5_id
+            changed = True
+        if self.required_sub_object_id != model.required_sub_object_id:
+            model.required_sub_object_id = self.required_sub_object_id
+            changed = True
+        if self.username != model.username:
+            model.username = self.username
+            changed = True
+        if self.lastname != model.lastname:
+            model.lastname = self.lastname
+            changed = True
+        if self.sadness != model.sadness:
+            model.sadness = self.sadness
+            changed = True
+        if self.a_pattern_validated_field != model.a_pattern_validated_field:
+            model.a_pattern_validated_field = self.a_pattern_validated_field
+            changed = True
+        if self.city != model.city:
+            model.city = self.city
+            changed = True
+        if self.correlation_id != model.correlation_id:
+            model.correlation_id = self.correlation_id
+            changed = True
+        if self.end_time != model.end_time:
+            model.end_time = self.end_time
+            changed = True
+        if self.is_it_true != model.is_it_true:
+            model.is_it_true = self.is_it_true
+            changed = True
+        if self.obj5_opt_id != model.obj5_opt_id:
+            model.obj5_opt_id = self.obj5_opt_id
+            changed = True
+        if self.optional_sub_object_id != model.optional_sub_object_id:
+            model.optional_sub_object_id = self.optional_sub_object_id
+            changed = True
+        if self.optional_sub_object_no_ex_id != model.optional_sub_object_no_ex_id:
+            model.optional_sub_object_no_ex_id = self.optional_sub_object_no_ex_id
+            changed = True
+        if self.self_id != model.self_id:
+            model.self_id = self.self_id
+            changed = True
+        if self.some_json != model.some_json:
+            model.some_json = self.some_json
+            changed = True
+        if self.some_pattern_id != model.some_pattern_id:
+            model.some_pattern_id = self.some_pattern_id
+            changed = True
+        if self.start_time != model.start_time:
+            model.start_time = self.start_time
+            changed = True
+        if self.status != model.status:
+            model.status = self.status
+            changed = True
+        if self.status_code != model.status_code:
+            model.status_code = self.status_code
+            changed = True
+        if self.thing_status != model.thing_status:
+            model.thing_status = self.thing_status
+            changed = True
+        if self.trace_id != model.trace_id:
+            model.trace_id = self.trace_id
+            changed = True
+        if self.validated_field != model.validated_field:
+            model.validated_field = self.validated_field
+            changed = True
+        if self.when_is_it_cool != model.when_is_it_cool:
+            model.when_is_it_cool = self.when_is_it_cool
+            changed = True
+        if not changed:
+            # Nothing to write
+            return self.ent
         model.updated_at = datetime.now(tz=UTC)
         session.add(model)
         await session.flush()
-        await session.refresh(model)
+        pin_to_primary()
+        invalidate_ent(EntTestObjectModel, model.id)
         # TODO privacy checks
         return await EntTestObject._genx_from_model(self.vc, model)  # noqa: SLF001
 
@@ -768,11 +1264,14 @@ class EntTestObjectMutatorDeletionAction(IEntTestThingMutatorDeletionAction):
         self.ent = ent
 
     async def gen_save(self) -> None:
-        session = get_session()
-        model = self.ent.model
+        session = get_session_for_id(get_session, self.ent.id)
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
         # TODO privacy checks
         await session.delete(model)
         await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntTestObjectModel, model.id)
 
 
 class EntTestObjectExample:
@@ -954,14 +1453,24 @@ class EntTestObjectExample:
 
 
 def _get_field(field_name: str) -> Field:
+    return get_descriptor_metadata(EntTestObjectSchema).get_field(field_name)
+
+
+def _get_validators(field_name: str) -> tuple[FieldValidator[Any], ...]:
+    return get_descriptor_metadata(EntTestObjectSchema).validators[field_name]
+
+
+register_ent(EntTestObject, EntTestObjectSchema)
+
+
+@cache
+def _get_privacy_rules_table() -> Mapping[Action, tuple[PrivacyRule, ...]]:
+    # The rules never change at runtime, we only build them once
     schema = EntTestObjectSchema()
-    fields = schema.get_all_fields()
-    field = next(
-        filter(
-            lambda field: field.name == field_name,
-            fields,
-        )
+    return MappingProxyType(
+        {action: tuple(schema.get_privacy_rules(action)) for action in Action}
     )
-    if not field:
-        raise ValueError(f"Unknown field: {field_name}")
-    return field
+
+
+def _get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+    return _get_privacy_rules_table()[action]
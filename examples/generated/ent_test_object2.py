@@ -21,20 +21,50 @@ from .ent_test_thing import EntTestThingModel
 from .ent_test_thing import IEntTestThing
 from .ent_test_thing import IEntTestThingMutatorDeletionAction
 from .ent_test_thing import IEntTestThingMutatorUpdateAction
+from collections.abc import AsyncIterator
+from collections.abc import Mapping, Sequence
+from database import get_replica_session
 from ent_test_object2_schema import EntTestObject2Schema
 from ent_test_thing_pattern import ThingStatus
 from entpy import Field
+from entpy import FieldValidator
+from entpy import PrivacyRule
+from entpy import concurrent_privacy_evaluation
+from entpy.framework.identity_map import gen_read_decisions
+from entpy.framework.identity_map import remember_models
+from entpy.framework.loader import LoadedModels
+from entpy.framework.loader import gen_model_by_id, gen_models_by_ids
+from entpy.framework.loader import invalidate_ent
+from entpy.framework.prefetch import gen_prefetch
+from entpy.framework.registry import get_descriptor_metadata
+from entpy.framework.registry import register_ent
+from entpy.framework.session import gen_attach, pin_to_primary
+from entpy.framework.session import get_read_session
+from entpy.framework.sharding import get_session_for_id, get_shard_id
+from entpy.framework.sharding import group_by_shard
+from entpy.framework.sharding import use_shard
+from functools import cache
 from sentinels import NOTHING, Sentinel  # type: ignore[import-untyped]
 from sqlalchemy import String
-from sqlalchemy import select, func, Result
+from sqlalchemy import select, Select, func, Result, Dialect
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import QueryableAttribute
+from types import MappingProxyType
+from typing import Any
 from typing import TypeVar
 from typing import TYPE_CHECKING
+import asyncio
 
 if TYPE_CHECKING:
     from .ent_test_object5 import EntTestObject5
 
 
+def _get_read_session() -> AsyncSession:
+    """The read session, or the primary one once this context wrote something."""
+    return get_read_session(get_replica_session, get_session)
+
+
 class EntTestObject2Model(EntTestThingModel):
     __tablename__ = "test_object2"
 
@@ -48,6 +78,8 @@ class EntTestObject2(IEntTestThing, Ent[ExampleViewerContext]):
     def __init__(self, vc: ExampleViewerContext, model: EntTestObject2Model) -> None:
         self.vc = vc
         self.model = model
+        # The edges loaded by gen_prefetch, by edge name
+        self._prefetched_edges: dict[str, Ent[Any]] = {}
 
     @property
     def id(self) -> UUID:
@@ -72,6 +104,12 @@ class EntTestObject2(IEntTestThing, Ent[ExampleViewerContext]):
     async def gen_obj5(self) -> EntTestObject5:
         from .ent_test_object5 import EntTestObject5
 
+        prefetched = self._prefetched_edges.get("obj5")
+        if (
+            isinstance(prefetched, EntTestObject5)
+            and prefetched.id == self.model.obj5_id
+        ):
+            return prefetched
         return await EntTestObject5.genx(self.vc, self.model.obj5_id)
 
     @property
@@ -85,6 +123,12 @@ class EntTestObject2(IEntTestThing, Ent[ExampleViewerContext]):
     async def gen_obj5_opt(self) -> "EntTestObject5" | None:
         from .ent_test_object5 import EntTestObject5
 
+        prefetched = self._prefetched_edges.get("obj5_opt")
+        if (
+            isinstance(prefetched, EntTestObject5)
+            and prefetched.id == self.model.obj5_opt_id
+        ):
+            return prefetched
         if self.model.obj5_opt_id:
             return await EntTestObject5.gen(self.vc, self.model.obj5_opt_id)
         return None
@@ -97,18 +141,6 @@ class EntTestObject2(IEntTestThing, Ent[ExampleViewerContext]):
     def thing_status(self) -> ThingStatus | None:
         return self.model.thing_status
 
-    async def _gen_evaluate_privacy(
-        self, vc: ExampleViewerContext, action: Action
-    ) -> Decision:
-        rules = EntTestObject2Schema().get_privacy_rules(action)
-        for rule in rules:
-            decision = await rule.gen_evaluate(vc, self)
-            # If we get an ALLOW or DENY, we return instantly. Else, we keep going.
-            if decision != Decision.PASS:
-                return decision
-        # We default to denying
-        return Decision.DENY
-
     @classmethod
     async def genx(cls, vc: ExampleViewerContext, ent_id: UUID | str) -> EntTestObject2:
         ent = await cls.gen(vc, ent_id)
@@ -127,19 +159,109 @@ class EntTestObject2(IEntTestThing, Ent[ExampleViewerContext]):
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {ent_id}") from e
 
-        session = get_session()
-        model = await session.get(EntTestObject2Model, ent_id)
+        session = get_session_for_id(_get_read_session, ent_id)
+        model = await gen_model_by_id(session, EntTestObject2Model, ent_id)
         return await cls._gen_from_model(vc, model)  # noqa: SLF001
 
+    @classmethod
+    async def genx_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntTestObject2]:
+        ents = await cls.gen_many(vc, ent_ids)
+        missing = [str(ent_id) for ent_id, ent in ents.items() if not ent]
+        if missing:
+            ids = ", ".join(missing)
+            raise EntNotFoundError(f"No EntTestObject2 found for IDs {ids}")
+        return {ent_id: ent for ent_id, ent in ents.items() if ent}
+
+    @classmethod
+    async def gen_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntTestObject2 | None]:
+        # Convert str to UUID if needed
+        uuids: list[UUID] = []
+        for ent_id in ent_ids:
+            try:
+                uuids.append(UUID(ent_id) if isinstance(ent_id, str) else ent_id)
+            except ValueError as e:
+                raise ValidationError(f"Invalid ID format for {ent_id}") from e
+        # Remove the duplicates but keep the order of the IDs
+        uuids = list(dict.fromkeys(uuids))
+
+        models: dict[UUID, EntTestObject2Model] = {}
+        for shard_ids in group_by_shard(uuids).values():
+            session = get_session_for_id(_get_read_session, shard_ids[0])
+            models |= await gen_models_by_ids(session, EntTestObject2Model, shard_ids)
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(ent_id) for ent_id in uuids]
+        )
+        return dict(zip(uuids, ents, strict=True))
+
+    @classmethod
+    async def gen_prefetch(
+        cls,
+        vc: ExampleViewerContext,
+        ents: Sequence[EntTestObject2],
+        edge_names: Sequence[str],
+    ) -> None:
+        for edge_name in edge_names:
+            if edge_name == "obj5":
+                from .ent_test_object5 import EntTestObject5
+
+                obj5_targets = await EntTestObject5.gen_many(
+                    vc, [ent.model.obj5_id for ent in ents if ent.model.obj5_id]
+                )
+                for ent in ents:
+                    obj5_target = (
+                        obj5_targets.get(ent.model.obj5_id)
+                        if ent.model.obj5_id
+                        else None
+                    )
+                    if obj5_target:
+                        ent._prefetched_edges[edge_name] = obj5_target  # noqa: SLF001
+                continue
+            if edge_name == "obj5_opt":
+                from .ent_test_object5 import EntTestObject5
+
+                obj5_opt_targets = await EntTestObject5.gen_many(
+                    vc, [ent.model.obj5_opt_id for ent in ents if ent.model.obj5_opt_id]
+                )
+                for ent in ents:
+                    obj5_opt_target = (
+                        obj5_opt_targets.get(ent.model.obj5_opt_id)
+                        if ent.model.obj5_opt_id
+                        else None
+                    )
+                    if obj5_opt_target:
+                        ent._prefetched_edges[edge_name] = obj5_opt_target  # noqa: SLF001
+                continue
+            raise ValidationError(f"Unknown edge for EntTestObject2: {edge_name}")
+
     @classmethod
     async def _gen_from_model(
         cls, vc: ExampleViewerContext, model: EntTestObject2Model | None
     ) -> EntTestObject2 | None:
         if not model:
             return None
-        ent = EntTestObject2(vc=vc, model=model)
-        decision = await ent._gen_evaluate_privacy(vc=vc, action=Action.READ)
-        return ent if decision == Decision.ALLOW else None
+        ents = await cls._gen_from_models(vc, [model])
+        return ents[0]
+
+    @classmethod
+    async def _gen_from_models(
+        cls, vc: ExampleViewerContext, models: Sequence[EntTestObject2Model | None]
+    ) -> list[EntTestObject2 | None]:
+        remember_models(models)
+        ents = [
+            EntTestObject2(vc=vc, model=model) if model else None for model in models
+        ]
+        rules = _get_privacy_rules(Action.READ)
+        decisions = iter(
+            await gen_read_decisions(vc, rules, [ent for ent in ents if ent])
+        )
+        # There is one decision for each loaded ent, in the same order
+        return [
+            ent if ent and next(decisions) == Decision.ALLOW else None for ent in ents
+        ]
 
     @classmethod
     async def _genx_from_model(
@@ -167,30 +289,77 @@ class EntTestObject2Query(EntQuery[EntTestObject2, EntTestObject2Model]):
         self.query = select(EntTestObject2Model)
 
     async def gen(self) -> list[EntTestObject2]:
-        session = get_session()
-        result = await session.execute(self.query)
-        ents = await self._gen_ents(result)
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, self.limit_value)
+        else:
+            result = await self._get_session().execute(self.query)
+            rows = list(result.scalars().all())
+        ents = await self._gen_ents(rows)
         return list(filter(None, ents))
 
+    async def gen_stream(self, chunk_size: int = 1000) -> AsyncIterator[EntTestObject2]:
+        session = self._get_session()
+        # Once a chunk is processed, the session can let go of the models it
+        # loaded (the rows, their implementations, the prefetched edges...)
+        loaded = LoadedModels(session)
+        try:
+            result = await session.stream_scalars(
+                self.query.execution_options(yield_per=chunk_size)
+            )
+        except BaseException:
+            loaded.close()
+            raise
+        try:
+            async for chunk in result.partitions():
+                ents = await self._gen_ents(chunk)
+                with loaded.paused():
+                    for ent in ents:
+                        if ent:
+                            yield ent
+                loaded.expunge()
+        finally:
+            loaded.close()
+            await result.close()
+
     async def _gen_ents(
-        self, result: Result[tuple[EntTestObject2Model]]
+        self, models: Sequence[EntTestObject2Model]
     ) -> list[EntTestObject2 | None]:
-        models = result.scalars().all()
-        return [
-            await EntTestObject2._gen_from_model(self.vc, model)  # noqa: SLF001
-            for model in models
-        ]
+        with concurrent_privacy_evaluation(self.privacy_concurrency):
+            ents = await EntTestObject2._gen_from_models(self.vc, models)  # noqa: SLF001
+        await gen_prefetch(self.vc, ents, self.prefetched_edges)
+        return ents
 
     async def gen_first(self) -> EntTestObject2 | None:
-        session = get_session()
-        result = await session.execute(self.query.limit(1))
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, 1)
+            return (await self._gen_ents(rows))[0] if rows else None
+        result = await self._get_session().execute(self.query.limit(1))
         return await self._gen_ent(result)
 
     async def _gen_ent(
         self, result: Result[tuple[EntTestObject2Model]]
     ) -> EntTestObject2 | None:
-        model = result.scalar_one_or_none()
-        return await EntTestObject2._gen_from_model(self.vc, model)  # noqa: SLF001
+        row = result.scalar_one_or_none()
+        if not row:
+            return None
+        return (await self._gen_ents([row]))[0]
+
+    async def _gen_rows(
+        self, query: Select[Any]
+    ) -> list[tuple[EntTestObject2 | None, tuple[Any, ...]]]:
+        session = self._get_session()
+        rows = (await session.execute(query)).all()
+        ents = await self._gen_ents([row[0] for row in rows])
+        return [(ent, tuple(row[1:])) for ent, row in zip(ents, rows, strict=True)]
+
+    def _get_shard_session(self, shard_id: int | None) -> AsyncSession:
+        if shard_id is None:
+            return _get_read_session()
+        with use_shard(shard_id):
+            return _get_read_session()
+
+    def _get_dialect(self) -> Dialect:
+        return self._get_sessions()[0].get_bind().dialect
 
     async def genx_first(self) -> EntTestObject2:
         ent = await self.gen_first()
@@ -199,23 +368,28 @@ class EntTestObject2Query(EntQuery[EntTestObject2, EntTestObject2Model]):
         return ent
 
     async def gen_count_NO_PRIVACY(self) -> int:
-        session = get_session()
-        count_query = self.query.with_only_columns(
-            func.count(), maintain_column_froms=True
-        ).order_by(None)
-        result = await session.execute(count_query)
-        count = result.scalar()
-        if count is None:
+        count_query = (
+            self.query.with_only_columns(func.count(), maintain_column_froms=True)
+            .order_by(None)
+            .limit(None)
+            .offset(None)
+        )
+        results = await asyncio.gather(
+            *[session.execute(count_query) for session in self._get_sessions()]
+        )
+        counts = [result.scalar() for result in results]
+        if None in counts:
             raise ExecutionError("Unable to get the count")
-        return count
+        return sum(count or 0 for count in counts)
+
+    def _get_id_column(self) -> QueryableAttribute[Any]:
+        return EntTestObject2Model.id
 
     def order_by_id_asc(self) -> "EntTestObject2Query":
-        self.query = self.query.order_by(EntTestObject2Model.id.asc())
-        return self
+        return self.order_by_key(EntTestObject2Model.id)
 
     def order_by_id_desc(self) -> "EntTestObject2Query":
-        self.query = self.query.order_by(EntTestObject2Model.id.desc())
-        return self
+        return self.order_by_key(EntTestObject2Model.id, descending=True)
 
 
 class EntTestObject2Mutator:
@@ -246,6 +420,14 @@ class EntTestObject2Mutator:
             thing_status=thing_status,
         )
 
+    @classmethod
+    def create_many(
+        cls,
+        vc: ExampleViewerContext,
+        actions: Sequence[EntTestObject2MutatorCreationAction],
+    ) -> EntTestObject2MutatorBulkCreationAction:
+        return EntTestObject2MutatorBulkCreationAction(vc=vc, actions=actions)
+
     @classmethod
     def update(
         cls, vc: ExampleViewerContext, ent: EntTestObject2
@@ -294,18 +476,25 @@ class EntTestObject2MutatorCreationAction:
         self.thing_status = thing_status
 
     async def gen_savex(self) -> EntTestObject2:
-        session = get_session()
+        session = get_session_for_id(get_session, self.id)
+        self._validate()
+        model = self._build_model()
+        session.add(model)
+        await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntTestObject2Model, self.id)
+        # TODO privacy checks
+        return await EntTestObject2._genx_from_model(self.vc, model)  # noqa: SLF001
 
-        a_pattern_validated_field_validators = _get_field(
-            "a_pattern_validated_field"
-        )._validators  # noqa: SLF001
-        for validator in a_pattern_validated_field_validators:
+    def _validate(self) -> None:
+        for validator in _get_validators("a_pattern_validated_field"):
             if not validator.validate(self.a_pattern_validated_field):
                 raise ValidationError(
                     "Invalid value for EntTestObject2.a_pattern_validated_field"
                 )
 
-        model = EntTestObject2Model(
+    def _build_model(self) -> EntTestObject2Model:
+        return EntTestObject2Model(
             id=self.id,
             updated_at=self.updated_at,
             created_at=self.created_at,
@@ -316,10 +505,50 @@ class EntTestObject2MutatorCreationAction:
             some_field=self.some_field,
             thing_status=self.thing_status,
         )
-        session.add(model)
-        await session.flush()
-        # TODO privacy checks
-        return await EntTestObject2._genx_from_model(self.vc, model)  # noqa: SLF001
+
+
+class EntTestObject2MutatorBulkCreationAction:
+    vc: ExampleViewerContext
+    actions: list[EntTestObject2MutatorCreationAction]
+
+    def __init__(
+        self,
+        vc: ExampleViewerContext,
+        actions: Sequence[EntTestObject2MutatorCreationAction],
+    ) -> None:
+        self.vc = vc
+        self.actions = list(actions)
+
+    async def gen_save(self) -> None:
+        """Insert all the Ents with a single flush, without loading them back."""
+        await self._gen_insert()
+
+    async def gen_savex(self) -> list[EntTestObject2]:
+        """Insert all the Ents with a single flush and return them, in order."""
+        models = await self._gen_insert()
+        ents = await EntTestObject2._gen_from_models(self.vc, models)  # noqa: SLF001
+        for model, ent in zip(models, ents, strict=True):
+            if not ent:
+                raise EntNotFoundError(f"No EntTestObject2 found for ID {model.id}")
+        return [ent for ent in ents if ent]
+
+    async def _gen_insert(self) -> list[EntTestObject2Model]:
+        # Validate everything before writing anything
+        for action in self.actions:
+            action._validate()  # noqa: SLF001
+        models = [action._build_model() for action in self.actions]  # noqa: SLF001
+        models_by_shard: dict[int, list[EntTestObject2Model]] = {}
+        for model in models:
+            models_by_shard.setdefault(get_shard_id(model.id), []).append(model)
+        for shard_models in models_by_shard.values():
+            session = get_session_for_id(get_session, shard_models[0].id)
+            # The unit of work batches the rows into multi-row INSERT statements
+            session.add_all(shard_models)
+            await session.flush()
+        pin_to_primary()
+        for model in models:
+            invalidate_ent(EntTestObject2Model, model.id)
+        return models
 
 
 class EntTestObject2MutatorUpdateAction(IEntTestThingMutatorUpdateAction):
@@ -344,28 +573,43 @@ class EntTestObject2MutatorUpdateAction(IEntTestThingMutatorUpdateAction):
         self.thing_status = ent.thing_status
 
     async def gen_savex(self) -> EntTestObject2:
-        session = get_session()
+        session = get_session_for_id(get_session, self.ent.id)
 
-        a_pattern_validated_field_validators = _get_field(
-            "a_pattern_validated_field"
-        )._validators  # noqa: SLF001
-        for validator in a_pattern_validated_field_validators:
+        for validator in _get_validators("a_pattern_validated_field"):
             if not validator.validate(self.a_pattern_validated_field):
                 raise ValidationError(
                     "Invalid value for EntTestObject2.a_pattern_validated_field"
                 )
 
-        model = self.ent.model
-        model.a_good_thing = self.a_good_thing
-        model.obj5_id = self.obj5_id
-        model.a_pattern_validated_field = self.a_pattern_validated_field
-        model.obj5_opt_id = self.obj5_opt_id
-        model.some_field = self.some_field
-        model.thing_status = self.thing_status
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
+        changed = False
+        if self.a_good_thing != model.a_good_thing:
+            model.a_good_thing = self.a_good_thing
+            changed = True
+        if self.obj5_id != model.obj5_id:
+            model.obj5_id = self.obj5_id
+            changed = True
+        if self.a_pattern_validated_field != model.a_pattern_validated_field:
+            model.a_pattern_validated_field = self.a_pattern_validated_field
+            changed = True
+        if self.obj5_opt_id != model.obj5_opt_id:
+            model.obj5_opt_id = self.obj5_opt_id
+            changed = True
+        if self.some_field != model.some_field:
+            model.some_field = self.some_field
+            changed = True
+        if self.thing_status != model.thing_status:
+            model.thing_status = self.thing_status
+            changed = True
+        if not changed:
+            # Nothing to write
+            return self.ent
         model.updated_at = datetime.now(tz=UTC)
         session.add(model)
         await session.flush()
-        await session.refresh(model)
+        pin_to_primary()
+        invalidate_ent(EntTestObject2Model, model.id)
         # TODO privacy checks
         return await EntTestObject2._genx_from_model(self.vc, model)  # noqa: SLF001
 
@@ -379,11 +623,14 @@ class EntTestObject2MutatorDeletionAction(IEntTestThingMutatorDeletionAction):
         self.ent = ent
 
     async def gen_save(self) -> None:
-        session = get_session()
-        model = self.ent.model
+        session = get_session_for_id(get_session, self.ent.id)
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
         # TODO privacy checks
         await session.delete(model)
         await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntTestObject2Model, model.id)
 
 
 class EntTestObject2Example:
@@ -435,14 +682,24 @@ class EntTestObject2Example:
 
 
 def _get_field(field_name: str) -> Field:
+    return get_descriptor_metadata(EntTestObject2Schema).get_field(field_name)
+
+
+def _get_validators(field_name: str) -> tuple[FieldValidator[Any], ...]:
+    return get_descriptor_metadata(EntTestObject2Schema).validators[field_name]
+
+
+register_ent(EntTestObject2, EntTestObject2Schema)
+
+
+@cache
+def _get_privacy_rules_table() -> Mapping[Action, tuple[PrivacyRule, ...]]:
+    # The rules never change at runtime, we only build them once
     schema = EntTestObject2Schema()
-    fields = schema.get_all_fields()
-    field = next(
-        filter(
-            lambda field: field.name == field_name,
-            fields,
-        )
+    return MappingProxyType(
+        {action: tuple(schema.get_privacy_rules(action)) for action in Action}
     )
-    if not field:
-        raise ValueError(f"Unknown field: {field_name}")
-    return field
+
+
+def _get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+    return _get_privacy_rules_table()[action]
@@ -18,14 +18,51 @@ from evc import ExampleViewerContext
 from database import get_session
 from .ent_model import EntModel
 from .ent_query import EntQuery
+from collections.abc import AsyncIterator
+from collections.abc import Mapping, Sequence
+from database import get_replica_session
 from ent_test_object5_schema import EntTestObject5Schema
 from entpy import Field
+from entpy import FieldValidator
+from entpy import PrivacyRule
+from entpy import concurrent_privacy_evaluation
+from entpy.framework.ent_cache import configure_ent_cache
+from entpy.framework.identity_map import gen_read_decisions
+from entpy.framework.identity_map import remember_models
+from entpy.framework.loader import LoadedModels
+from entpy.framework.loader import MAX_IDS_PER_QUERY
+from entpy.framework.loader import gen_model_by_id, gen_models_by_ids
+from entpy.framework.loader import invalidate_ent
+from entpy.framework.prefetch import gen_prefetch
+from entpy.framework.registry import get_descriptor_metadata
+from entpy.framework.registry import register_ent
+from entpy.framework.session import gen_attach, pin_to_primary
+from entpy.framework.session import get_read_session
+from entpy.framework.sharding import get_session_for_id, get_shard_id
+from entpy.framework.sharding import group_by_shard
+from entpy.framework.sharding import use_shard
+from functools import cache
 from sentinels import NOTHING, Sentinel  # type: ignore[import-untyped]
 from sqlalchemy import Boolean
 from sqlalchemy import String
-from sqlalchemy import select, func, Result
+from sqlalchemy import select, Select, func, Result, Dialect
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import QueryableAttribute
+from types import MappingProxyType
+from typing import Any
 from typing import TypeVar
+from typing import TYPE_CHECKING
+import asyncio
+
+if TYPE_CHECKING:
+    from .ent_test_object2 import EntTestObject2, EntTestObject2Query
+    from .ent_test_object import EntTestObject, EntTestObjectQuery
+
+
+def _get_read_session() -> AsyncSession:
+    """The read session, or the primary one once this context wrote something."""
+    return get_read_session(get_replica_session, get_session)
 
 
 class EntTestObject5Model(EntModel):
@@ -44,6 +81,8 @@ class EntTestObject5(Ent[ExampleViewerContext]):
     def __init__(self, vc: ExampleViewerContext, model: EntTestObject5Model) -> None:
         self.vc = vc
         self.model = model
+        # The edges loaded by gen_prefetch, by edge name
+        self._prefetched_edges: dict[str, Ent[Any]] = {}
 
     @property
     def id(self) -> UUID:
@@ -65,17 +104,169 @@ class EntTestObject5(Ent[ExampleViewerContext]):
     def is_it_true(self) -> bool:
         return self.model.is_it_true
 
-    async def _gen_evaluate_privacy(
-        self, vc: ExampleViewerContext, action: Action
-    ) -> Decision:
-        rules = EntTestObject5Schema().get_privacy_rules(action)
-        for rule in rules:
-            decision = await rule.gen_evaluate(vc, self)
-            # If we get an ALLOW or DENY, we return instantly. Else, we keep going.
-            if decision != Decision.PASS:
-                return decision
-        # We default to denying
-        return Decision.DENY
+    def query_test_object2s_by_obj5(self) -> EntTestObject2Query:
+        """
+        The EntTestObject2 whose obj5 is this EntTestObject5.
+        Only the shard of this EntTestObject5 is queried, so when sharding,
+        create them within `use_shard(get_shard_id(test_object5.id))`.
+        """
+        from .ent_test_object2 import EntTestObject2, EntTestObject2Model
+
+        query = EntTestObject2.query(self.vc).where(
+            EntTestObject2Model.obj5_id == self.id
+        )
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_test_object2s_by_obj5(self) -> list[EntTestObject2]:
+        return await self.query_test_object2s_by_obj5().gen()
+
+    async def gen_test_object2s_by_obj5_count_NO_PRIVACY(self) -> int:
+        return await self.query_test_object2s_by_obj5().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_test_object2s_by_obj5_many(
+        cls, vc: ExampleViewerContext, ents: Sequence[EntTestObject5]
+    ) -> dict[UUID, list[EntTestObject2]]:
+        """Load the test_object2s_by_obj5 of several EntTestObject5 in batch."""
+        from .ent_test_object2 import EntTestObject2, EntTestObject2Model
+
+        ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[EntTestObject2]] = {ent_id: [] for ent_id in ent_ids}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = EntTestObject2.query(vc).where(
+                    EntTestObject2Model.obj5_id.in_(chunk)
+                )
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.obj5_id
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
+
+    def query_test_object2s_by_obj5_opt(self) -> EntTestObject2Query:
+        """
+        The EntTestObject2 whose obj5_opt is this EntTestObject5.
+        Only the shard of this EntTestObject5 is queried, so when sharding,
+        create them within `use_shard(get_shard_id(test_object5.id))`.
+        """
+        from .ent_test_object2 import EntTestObject2, EntTestObject2Model
+
+        query = EntTestObject2.query(self.vc).where(
+            EntTestObject2Model.obj5_opt_id == self.id
+        )
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_test_object2s_by_obj5_opt(self) -> list[EntTestObject2]:
+        return await self.query_test_object2s_by_obj5_opt().gen()
+
+    async def gen_test_object2s_by_obj5_opt_count_NO_PRIVACY(self) -> int:
+        return await self.query_test_object2s_by_obj5_opt().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_test_object2s_by_obj5_opt_many(
+        cls, vc: ExampleViewerContext, ents: Sequence[EntTestObject5]
+    ) -> dict[UUID, list[EntTestObject2]]:
+        """Load the test_object2s_by_obj5_opt of several EntTestObject5 in batch."""
+        from .ent_test_object2 import EntTestObject2, EntTestObject2Model
+
+        ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[EntTestObject2]] = {ent_id: [] for ent_id in ent_ids}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = EntTestObject2.query(vc).where(
+                    EntTestObject2Model.obj5_opt_id.in_(chunk)
+                )
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.obj5_opt_id
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
+
+    def query_test_objects_by_obj5(self) -> EntTestObjectQuery:
+        """
+        The EntTestObject whose obj5 is this EntTestObject5.
+        Only the shard of this EntTestObject5 is queried, so when sharding,
+        create them within `use_shard(get_shard_id(test_object5.id))`.
+        """
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        query = EntTestObject.query(self.vc).where(
+            EntTestObjectModel.obj5_id == self.id
+        )
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_test_objects_by_obj5(self) -> list[EntTestObject]:
+        return await self.query_test_objects_by_obj5().gen()
+
+    async def gen_test_objects_by_obj5_count_NO_PRIVACY(self) -> int:
+        return await self.query_test_objects_by_obj5().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_test_objects_by_obj5_many(
+        cls, vc: ExampleViewerContext, ents: Sequence[EntTestObject5]
+    ) -> dict[UUID, list[EntTestObject]]:
+        """Load the test_objects_by_obj5 of several EntTestObject5 in batch."""
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[EntTestObject]] = {ent_id: [] for ent_id in ent_ids}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = EntTestObject.query(vc).where(
+                    EntTestObjectModel.obj5_id.in_(chunk)
+                )
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.obj5_id
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
+
+    def query_test_objects_by_obj5_opt(self) -> EntTestObjectQuery:
+        """
+        The EntTestObject whose obj5_opt is this EntTestObject5.
+        Only the shard of this EntTestObject5 is queried, so when sharding,
+        create them within `use_shard(get_shard_id(test_object5.id))`.
+        """
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        query = EntTestObject.query(self.vc).where(
+            EntTestObjectModel.obj5_opt_id == self.id
+        )
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_test_objects_by_obj5_opt(self) -> list[EntTestObject]:
+        return await self.query_test_objects_by_obj5_opt().gen()
+
+    async def gen_test_objects_by_obj5_opt_count_NO_PRIVACY(self) -> int:
+        return await self.query_test_objects_by_obj5_opt().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_test_objects_by_obj5_opt_many(
+        cls, vc: ExampleViewerContext, ents: Sequence[EntTestObject5]
+    ) -> dict[UUID, list[EntTestObject]]:
+        """Load the test_objects_by_obj5_opt of several EntTestObject5 in batch."""
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[EntTestObject]] = {ent_id: [] for ent_id in ent_ids}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = EntTestObject.query(vc).where(
+                    EntTestObjectModel.obj5_opt_id.in_(chunk)
+                )
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.obj5_opt_id
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
 
     @classmethod
     async def genx(cls, vc: ExampleViewerContext, ent_id: UUID | str) -> EntTestObject5:
@@ -95,19 +286,79 @@ class EntTestObject5(Ent[ExampleViewerContext]):
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {ent_id}") from e
 
-        session = get_session()
-        model = await session.get(EntTestObject5Model, ent_id)
+        session = get_session_for_id(_get_read_session, ent_id)
+        model = await gen_model_by_id(session, EntTestObject5Model, ent_id)
         return await cls._gen_from_model(vc, model)  # noqa: SLF001
 
+    @classmethod
+    async def genx_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntTestObject5]:
+        ents = await cls.gen_many(vc, ent_ids)
+        missing = [str(ent_id) for ent_id, ent in ents.items() if not ent]
+        if missing:
+            ids = ", ".join(missing)
+            raise EntNotFoundError(f"No EntTestObject5 found for IDs {ids}")
+        return {ent_id: ent for ent_id, ent in ents.items() if ent}
+
+    @classmethod
+    async def gen_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntTestObject5 | None]:
+        # Convert str to UUID if needed
+        uuids: list[UUID] = []
+        for ent_id in ent_ids:
+            try:
+                uuids.append(UUID(ent_id) if isinstance(ent_id, str) else ent_id)
+            except ValueError as e:
+                raise ValidationError(f"Invalid ID format for {ent_id}") from e
+        # Remove the duplicates but keep the order of the IDs
+        uuids = list(dict.fromkeys(uuids))
+
+        models: dict[UUID, EntTestObject5Model] = {}
+        for shard_ids in group_by_shard(uuids).values():
+            session = get_session_for_id(_get_read_session, shard_ids[0])
+            models |= await gen_models_by_ids(session, EntTestObject5Model, shard_ids)
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(ent_id) for ent_id in uuids]
+        )
+        return dict(zip(uuids, ents, strict=True))
+
+    @classmethod
+    async def gen_prefetch(
+        cls,
+        vc: ExampleViewerContext,
+        ents: Sequence[EntTestObject5],
+        edge_names: Sequence[str],
+    ) -> None:
+        for edge_name in edge_names:
+            raise ValidationError(f"Unknown edge for EntTestObject5: {edge_name}")
+
     @classmethod
     async def _gen_from_model(
         cls, vc: ExampleViewerContext, model: EntTestObject5Model | None
     ) -> EntTestObject5 | None:
         if not model:
             return None
-        ent = EntTestObject5(vc=vc, model=model)
-        decision = await ent._gen_evaluate_privacy(vc=vc, action=Action.READ)
-        return ent if decision == Decision.ALLOW else None
+        ents = await cls._gen_from_models(vc, [model])
+        return ents[0]
+
+    @classmethod
+    async def _gen_from_models(
+        cls, vc: ExampleViewerContext, models: Sequence[EntTestObject5Model | None]
+    ) -> list[EntTestObject5 | None]:
+        remember_models(models)
+        ents = [
+            EntTestObject5(vc=vc, model=model) if model else None for model in models
+        ]
+        rules = _get_privacy_rules(Action.READ)
+        decisions = iter(
+            await gen_read_decisions(vc, rules, [ent for ent in ents if ent])
+        )
+        # There is one decision for each loaded ent, in the same order
+        return [
+            ent if ent and next(decisions) == Decision.ALLOW else None for ent in ents
+        ]
 
     @classmethod
     async def _genx_from_model(
@@ -135,30 +386,77 @@ class EntTestObject5Query(EntQuery[EntTestObject5, EntTestObject5Model]):
         self.query = select(EntTestObject5Model)
 
     async def gen(self) -> list[EntTestObject5]:
-        session = get_session()
-        result = await session.execute(self.query)
-        ents = await self._gen_ents(result)
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, self.limit_value)
+        else:
+            result = await self._get_session().execute(self.query)
+            rows = list(result.scalars().all())
+        ents = await self._gen_ents(rows)
         return list(filter(None, ents))
 
+    async def gen_stream(self, chunk_size: int = 1000) -> AsyncIterator[EntTestObject5]:
+        session = self._get_session()
+        # Once a chunk is processed, the session can let go of the models it
+        # loaded (the rows, their implementations, the prefetched edges...)
+        loaded = LoadedModels(session)
+        try:
+            result = await session.stream_scalars(
+                self.query.execution_options(yield_per=chunk_size)
+            )
+        except BaseException:
+            loaded.close()
+            raise
+        try:
+            async for chunk in result.partitions():
+                ents = await self._gen_ents(chunk)
+                with loaded.paused():
+                    for ent in ents:
+                        if ent:
+                            yield ent
+                loaded.expunge()
+        finally:
+            loaded.close()
+            await result.close()
+
     async def _gen_ents(
-        self, result: Result[tuple[EntTestObject5Model]]
+        self, models: Sequence[EntTestObject5Model]
     ) -> list[EntTestObject5 | None]:
-        models = result.scalars().all()
-        return [
-            await EntTestObject5._gen_from_model(self.vc, model)  # noqa: SLF001
-            for model in models
-        ]
+        with concurrent_privacy_evaluation(self.privacy_concurrency):
+            ents = await EntTestObject5._gen_from_models(self.vc, models)  # noqa: SLF001
+        await gen_prefetch(self.vc, ents, self.prefetched_edges)
+        return ents
 
     async def gen_first(self) -> EntTestObject5 | None:
-        session = get_session()
-        result = await session.execute(self.query.limit(1))
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, 1)
+            return (await self._gen_ents(rows))[0] if rows else None
+        result = await self._get_session().execute(self.query.limit(1))
         return await self._gen_ent(result)
 
     async def _gen_ent(
         self, result: Result[tuple[EntTestObject5Model]]
     ) -> EntTestObject5 | None:
-        model = result.scalar_one_or_none()
-        return await EntTestObject5._gen_from_model(self.vc, model)  # noqa: SLF001
+        row = result.scalar_one_or_none()
+        if not row:
+            return None
+        return (await self._gen_ents([row]))[0]
+
+    async def _gen_rows(
+        self, query: Select[Any]
+    ) -> list[tuple[EntTestObject5 | None, tuple[Any, ...]]]:
+        session = self._get_session()
+        rows = (await session.execute(query)).all()
+        ents = await self._gen_ents([row[0] for row in rows])
+        return [(ent, tuple(row[1:])) for ent, row in zip(ents, rows, strict=True)]
+
+    def _get_shard_session(self, shard_id: int | None) -> AsyncSession:
+        if shard_id is None:
+            return _get_read_session()
+        with use_shard(shard_id):
+            return _get_read_session()
+
+    def _get_dialect(self) -> Dialect:
+        return self._get_sessions()[0].get_bind().dialect
 
     async def genx_first(self) -> EntTestObject5:
         ent = await self.gen_first()
@@ -167,23 +465,28 @@ class EntTestObject5Query(EntQuery[EntTestObject5, EntTestObject5Model]):
         return ent
 
     async def gen_count_NO_PRIVACY(self) -> int:
-        session = get_session()
-        count_query = self.query.with_only_columns(
-            func.count(), maintain_column_froms=True
-        ).order_by(None)
-        result = await session.execute(count_query)
-        count = result.scalar()
-        if count is None:
+        count_query = (
+            self.query.with_only_columns(func.count(), maintain_column_froms=True)
+            .order_by(None)
+            .limit(None)
+            .offset(None)
+        )
+        results = await asyncio.gather(
+            *[session.execute(count_query) for session in self._get_sessions()]
+        )
+        counts = [result.scalar() for result in results]
+        if None in counts:
             raise ExecutionError("Unable to get the count")
-        return count
+        return sum(count or 0 for count in counts)
+
+    def _get_id_column(self) -> QueryableAttribute[Any]:
+        return EntTestObject5Model.id
 
     def order_by_id_asc(self) -> "EntTestObject5Query":
-        self.query = self.query.order_by(EntTestObject5Model.id.asc())
-        return self
+        return self.order_by_key(EntTestObject5Model.id)
 
     def order_by_id_desc(self) -> "EntTestObject5Query":
-        self.query = self.query.order_by(EntTestObject5Model.id.desc())
-        return self
+        return self.order_by_key(EntTestObject5Model.id, descending=True)
 
 
 class EntTestObject5Mutator:
@@ -206,6 +509,14 @@ class EntTestObject5Mutator:
             is_it_true=is_it_true,
         )
 
+    @classmethod
+    def create_many(
+        cls,
+        vc: ExampleViewerContext,
+        actions: Sequence[EntTestObject5MutatorCreationAction],
+    ) -> EntTestObject5MutatorBulkCreationAction:
+        return EntTestObject5MutatorBulkCreationAction(vc=vc, actions=actions)
+
     @classmethod
     def update(
         cls, vc: ExampleViewerContext, ent: EntTestObject5
@@ -242,19 +553,71 @@ class EntTestObject5MutatorCreationAction:
         self.is_it_true = is_it_true
 
     async def gen_savex(self) -> EntTestObject5:
-        session = get_session()
+        session = get_session_for_id(get_session, self.id)
+        self._validate()
+        model = self._build_model()
+        session.add(model)
+        await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntTestObject5Model, self.id)
+        # TODO privacy checks
+        return await EntTestObject5._genx_from_model(self.vc, model)  # noqa: SLF001
+
+    def _validate(self) -> None:
+        pass
 
-        model = EntTestObject5Model(
+    def _build_model(self) -> EntTestObject5Model:
+        return EntTestObject5Model(
             id=self.id,
             updated_at=self.updated_at,
             created_at=self.created_at,
             obj5_field=self.obj5_field,
             is_it_true=self.is_it_true,
         )
-        session.add(model)
-        await session.flush()
-        # TODO privacy checks
-        return await EntTestObject5._genx_from_model(self.vc, model)  # noqa: SLF001
+
+
+class EntTestObject5MutatorBulkCreationAction:
+    vc: ExampleViewerContext
+    actions: list[EntTestObject5MutatorCreationAction]
+
+    def __init__(
+        self,
+        vc: ExampleViewerContext,
+        actions: Sequence[EntTestObject5MutatorCreationAction],
+    ) -> None:
+        self.vc = vc
+        self.actions = list(actions)
+
+    async def gen_save(self) -> None:
+        """Insert all the Ents with a single flush, without loading them back."""
+        await self._gen_insert()
+
+    async def gen_savex(self) -> list[EntTestObject5]:
+        """Insert all the Ents with a single flush and return them, in order."""
+        models = await self._gen_insert()
+        ents = await EntTestObject5._gen_from_models(self.vc, models)  # noqa: SLF001
+        for model, ent in zip(models, ents, strict=True):
+            if not ent:
+                raise EntNotFoundError(f"No EntTestObject5 found for ID {model.id}")
+        return [ent for ent in ents if ent]
+
+    async def _gen_insert(self) -> list[EntTestObject5Model]:
+        # Validate everything before writing anything
+        for action in self.actions:
+            action._validate()  # noqa: SLF001
+        models = [action._build_model() for action in self.actions]  # noqa: SLF001
+        models_by_shard: dict[int, list[EntTestObject5Model]] = {}
+        for model in models:
+            models_by_shard.setdefault(get_shard_id(model.id), []).append(model)
+        for shard_models in models_by_shard.values():
+            session = get_session_for_id(get_session, shard_models[0].id)
+            # The unit of work batches the rows into multi-row INSERT statements
+            session.add_all(shard_models)
+            await session.flush()
+        pin_to_primary()
+        for model in models:
+            invalidate_ent(EntTestObject5Model, model.id)
+        return models
 
 
 class EntTestObject5MutatorUpdateAction:
@@ -271,15 +634,25 @@ class EntTestObject5MutatorUpdateAction:
         self.is_it_true = ent.is_it_true
 
     async def gen_savex(self) -> EntTestObject5:
-        session = get_session()
-
-        model = self.ent.model
-        model.obj5_field = self.obj5_field
-        model.is_it_true = self.is_it_true
+        session = get_session_for_id(get_session, self.ent.id)
+
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
+        changed = False
+        if self.obj5_field != model.obj5_field:
+            model.obj5_field = self.obj5_field
+            changed = True
+        if self.is_it_true != model.is_it_true:
+            model.is_it_true = self.is_it_true
+            changed = True
+        if not changed:
+            # Nothing to write
+            return self.ent
         model.updated_at = datetime.now(tz=UTC)
         session.add(model)
         await session.flush()
-        await session.refresh(model)
+        pin_to_primary()
+        invalidate_ent(EntTestObject5Model, model.id)
         # TODO privacy checks
         return await EntTestObject5._genx_from_model(self.vc, model)  # noqa: SLF001
 
@@ -293,11 +666,14 @@ class EntTestObject5MutatorDeletionAction:
         self.ent = ent
 
     async def gen_save(self) -> None:
-        session = get_session()
-        model = self.ent.model
+        session = get_session_for_id(get_session, self.ent.id)
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
         # TODO privacy checks
         await session.delete(model)
         await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntTestObject5Model, model.id)
 
 
 class EntTestObject5Example:
@@ -321,14 +697,26 @@ class EntTestObject5Example:
 
 
 def _get_field(field_name: str) -> Field:
+    return get_descriptor_metadata(EntTestObject5Schema).get_field(field_name)
+
+
+def _get_validators(field_name: str) -> tuple[FieldValidator[Any], ...]:
+    return get_descriptor_metadata(EntTestObject5Schema).validators[field_name]
+
+
+register_ent(EntTestObject5, EntTestObject5Schema)
+_cache_policy = EntTestObject5Schema().get_cache_policy()
+configure_ent_cache(EntTestObject5Model, _cache_policy)
+
+
+@cache
+def _get_privacy_rules_table() -> Mapping[Action, tuple[PrivacyRule, ...]]:
+    # The rules never change at runtime, we only build them once
     schema = EntTestObject5Schema()
-    fields = schema.get_all_fields()
-    field = next(
-        filter(
-            lambda field: field.name == field_name,
-            fields,
-        )
+    return MappingProxyType(
+        {action: tuple(schema.get_privacy_rules(action)) for action in Action}
     )
-    if not field:
-        raise ValueError(f"Unknown field: {field_name}")
-    return field
+
+
+def _get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+    return _get_privacy_rules_table()[action]
@@ -18,13 +18,48 @@ from evc import ExampleViewerContext
 from database import get_session
 from .ent_model import EntModel
 from .ent_query import EntQuery
+from collections.abc import AsyncIterator
+from collections.abc import Mapping, Sequence
+from database import get_replica_session
 from ent_test_sub_object_schema import EntTestSubObjectSchema
 from entpy import Field
+from entpy import FieldValidator
+from entpy import PrivacyRule
+from entpy import concurrent_privacy_evaluation
+from entpy.framework.identity_map import gen_read_decisions
+from entpy.framework.identity_map import remember_models
+from entpy.framework.loader import LoadedModels
+from entpy.framework.loader import MAX_IDS_PER_QUERY
+from entpy.framework.loader import gen_model_by_id, gen_models_by_ids
+from entpy.framework.loader import invalidate_ent
+from entpy.framework.prefetch import gen_prefetch
+from entpy.framework.registry import get_descriptor_metadata
+from entpy.framework.registry import register_ent
+from entpy.framework.session import gen_attach, pin_to_primary
+from entpy.framework.session import get_read_session
+from entpy.framework.sharding import get_session_for_id, get_shard_id
+from entpy.framework.sharding import group_by_shard
+from entpy.framework.sharding import use_shard
+from functools import cache
 from sentinels import NOTHING, Sentinel  # type: ignore[import-untyped]
 from sqlalchemy import String
-from sqlalchemy import select, func, Result
+from sqlalchemy import select, Select, func, Result, Dialect
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.orm import QueryableAttribute
+from types import MappingProxyType
+from typing import Any
 from typing import TypeVar
+from typing import TYPE_CHECKING
+import asyncio
+
+if TYPE_CHECKING:
+    from .ent_test_object import EntTestObject, EntTestObjectQuery
+
+
+def _get_read_session() -> AsyncSession:
+    """The read session, or the primary one once this context wrote something."""
+    return get_read_session(get_replica_session, get_session)
 
 
 class EntTestSubObjectModel(EntModel):
@@ -40,6 +75,8 @@ class EntTestSubObject(Ent[ExampleViewerContext]):
     def __init__(self, vc: ExampleViewerContext, model: EntTestSubObjectModel) -> None:
         self.vc = vc
         self.model = model
+        # The edges loaded by gen_prefetch, by edge name
+        self._prefetched_edges: dict[str, Ent[Any]] = {}
 
     @property
     def id(self) -> UUID:
@@ -57,17 +94,132 @@ class EntTestSubObject(Ent[ExampleViewerContext]):
     def email(self) -> str:
         return self.model.email
 
-    async def _gen_evaluate_privacy(
-        self, vc: ExampleViewerContext, action: Action
-    ) -> Decision:
-        rules = EntTestSubObjectSchema().get_privacy_rules(action)
-        for rule in rules:
-            decision = await rule.gen_evaluate(vc, self)
-            # If we get an ALLOW or DENY, we return instantly. Else, we keep going.
-            if decision != Decision.PASS:
-                return decision
-        # We default to denying
-        return Decision.DENY
+    def query_test_objects_by_required_sub_object(self) -> EntTestObjectQuery:
+        """
+        The EntTestObject whose required_sub_object is this EntTestSubObject.
+        Only the shard of this EntTestSubObject is queried, so when sharding,
+        create them within `use_shard(get_shard_id(test_sub_object.id))`.
+        """
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        query = EntTestObject.query(self.vc).where(
+            EntTestObjectModel.required_sub_object_id == self.id
+        )
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_test_objects_by_required_sub_object(self) -> list[EntTestObject]:
+        return await self.query_test_objects_by_required_sub_object().gen()
+
+    async def gen_test_objects_by_required_sub_object_count_NO_PRIVACY(self) -> int:
+        return await self.query_test_objects_by_required_sub_object().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_test_objects_by_required_sub_object_many(
+        cls, vc: ExampleViewerContext, ents: Sequence[EntTestSubObject]
+    ) -> dict[UUID, list[EntTestObject]]:
+        """Load the test_objects_by_required_sub_object of several EntTestSubObject in batch."""
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[EntTestObject]] = {ent_id: [] for ent_id in ent_ids}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = EntTestObject.query(vc).where(
+                    EntTestObjectModel.required_sub_object_id.in_(chunk)
+                )
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.required_sub_object_id
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
+
+    def query_test_objects_by_optional_sub_object(self) -> EntTestObjectQuery:
+        """
+        The EntTestObject whose optional_sub_object is this EntTestSubObject.
+        Only the shard of this EntTestSubObject is queried, so when sharding,
+        create them within `use_shard(get_shard_id(test_sub_object.id))`.
+        """
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        query = EntTestObject.query(self.vc).where(
+            EntTestObjectModel.optional_sub_object_id == self.id
+        )
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_test_objects_by_optional_sub_object(self) -> list[EntTestObject]:
+        return await self.query_test_objects_by_optional_sub_object().gen()
+
+    async def gen_test_objects_by_optional_sub_object_count_NO_PRIVACY(self) -> int:
+        return await self.query_test_objects_by_optional_sub_object().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_test_objects_by_optional_sub_object_many(
+        cls, vc: ExampleViewerContext, ents: Sequence[EntTestSubObject]
+    ) -> dict[UUID, list[EntTestObject]]:
+        """Load the test_objects_by_optional_sub_object of several EntTestSubObject in batch."""
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[EntTestObject]] = {ent_id: [] for ent_id in ent_ids}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = EntTestObject.query(vc).where(
+                    EntTestObjectModel.optional_sub_object_id.in_(chunk)
+                )
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.optional_sub_object_id
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
+
+    def query_test_objects_by_optional_sub_object_no_ex(self) -> EntTestObjectQuery:
+        """
+        The EntTestObject whose optional_sub_object_no_ex is this EntTestSubObject.
+        Only the shard of this EntTestSubObject is queried, so when sharding,
+        create them within `use_shard(get_shard_id(test_sub_object.id))`.
+        """
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        query = EntTestObject.query(self.vc).where(
+            EntTestObjectModel.optional_sub_object_no_ex_id == self.id
+        )
+        # The Ents that point at this one live on the same shard
+        return query.on_shard(get_shard_id(self.id))
+
+    async def gen_test_objects_by_optional_sub_object_no_ex(
+        self,
+    ) -> list[EntTestObject]:
+        return await self.query_test_objects_by_optional_sub_object_no_ex().gen()
+
+    async def gen_test_objects_by_optional_sub_object_no_ex_count_NO_PRIVACY(
+        self,
+    ) -> int:
+        return await self.query_test_objects_by_optional_sub_object_no_ex().gen_count_NO_PRIVACY()
+
+    @classmethod
+    async def gen_test_objects_by_optional_sub_object_no_ex_many(
+        cls, vc: ExampleViewerContext, ents: Sequence[EntTestSubObject]
+    ) -> dict[UUID, list[EntTestObject]]:
+        """Load the test_objects_by_optional_sub_object_no_ex of several EntTestSubObject in batch."""
+        from .ent_test_object import EntTestObject, EntTestObjectModel
+
+        ent_ids = [ent.id for ent in ents]
+        sources: dict[UUID, list[EntTestObject]] = {ent_id: [] for ent_id in ent_ids}
+        for shard_id, shard_ent_ids in group_by_shard(ent_ids).items():
+            for i in range(0, len(shard_ent_ids), MAX_IDS_PER_QUERY):
+                chunk = shard_ent_ids[i : i + MAX_IDS_PER_QUERY]
+                query = EntTestObject.query(vc).where(
+                    EntTestObjectModel.optional_sub_object_no_ex_id.in_(chunk)
+                )
+                for source in await query.on_shard(shard_id).gen():
+                    ent_id = source.optional_sub_object_no_ex_id
+                    if ent_id:
+                        sources[ent_id].append(source)
+        return sources
 
     @classmethod
     async def genx(
@@ -89,19 +241,79 @@ class EntTestSubObject(Ent[ExampleViewerContext]):
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {ent_id}") from e
 
-        session = get_session()
-        model = await session.get(EntTestSubObjectModel, ent_id)
+        session = get_session_for_id(_get_read_session, ent_id)
+        model = await gen_model_by_id(session, EntTestSubObjectModel, ent_id)
         return await cls._gen_from_model(vc, model)  # noqa: SLF001
 
+    @classmethod
+    async def genx_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntTestSubObject]:
+        ents = await cls.gen_many(vc, ent_ids)
+        missing = [str(ent_id) for ent_id, ent in ents.items() if not ent]
+        if missing:
+            ids = ", ".join(missing)
+            raise EntNotFoundError(f"No EntTestSubObject found for IDs {ids}")
+        return {ent_id: ent for ent_id, ent in ents.items() if ent}
+
+    @classmethod
+    async def gen_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> dict[UUID, EntTestSubObject | None]:
+        # Convert str to UUID if needed
+        uuids: list[UUID] = []
+        for ent_id in ent_ids:
+            try:
+                uuids.append(UUID(ent_id) if isinstance(ent_id, str) else ent_id)
+            except ValueError as e:
+                raise ValidationError(f"Invalid ID format for {ent_id}") from e
+        # Remove the duplicates but keep the order of the IDs
+        uuids = list(dict.fromkeys(uuids))
+
+        models: dict[UUID, EntTestSubObjectModel] = {}
+        for shard_ids in group_by_shard(uuids).values():
+            session = get_session_for_id(_get_read_session, shard_ids[0])
+            models |= await gen_models_by_ids(session, EntTestSubObjectModel, shard_ids)
+        ents = await cls._gen_from_models(  # noqa: SLF001
+            vc, [models.get(ent_id) for ent_id in uuids]
+        )
+        return dict(zip(uuids, ents, strict=True))
+
+    @classmethod
+    async def gen_prefetch(
+        cls,
+        vc: ExampleViewerContext,
+        ents: Sequence[EntTestSubObject],
+        edge_names: Sequence[str],
+    ) -> None:
+        for edge_name in edge_names:
+            raise ValidationError(f"Unknown edge for EntTestSubObject: {edge_name}")
+
     @classmethod
     async def _gen_from_model(
         cls, vc: ExampleViewerContext, model: EntTestSubObjectModel | None
     ) -> EntTestSubObject | None:
         if not model:
             return None
-        ent = EntTestSubObject(vc=vc, model=model)
-        decision = await ent._gen_evaluate_privacy(vc=vc, action=Action.READ)
-        return ent if decision == Decision.ALLOW else None
+        ents = await cls._gen_from_models(vc, [model])
+        return ents[0]
+
+    @classmethod
+    async def _gen_from_models(
+        cls, vc: ExampleViewerContext, models: Sequence[EntTestSubObjectModel | None]
+    ) -> list[EntTestSubObject | None]:
+        remember_models(models)
+        ents = [
+            EntTestSubObject(vc=vc, model=model) if model else None for model in models
+        ]
+        rules = _get_privacy_rules(Action.READ)
+        decisions = iter(
+            await gen_read_decisions(vc, rules, [ent for ent in ents if ent])
+        )
+        # There is one decision for each loaded ent, in the same order
+        return [
+            ent if ent and next(decisions) == Decision.ALLOW else None for ent in ents
+        ]
 
     @classmethod
     async def _genx_from_model(
@@ -129,30 +341,79 @@ class EntTestSubObjectQuery(EntQuery[EntTestSubObject, EntTestSubObjectModel]):
         self.query = select(EntTestSubObjectModel)
 
     async def gen(self) -> list[EntTestSubObject]:
-        session = get_session()
-        result = await session.execute(self.query)
-        ents = await self._gen_ents(result)
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, self.limit_value)
+        else:
+            result = await self._get_session().execute(self.query)
+            rows = list(result.scalars().all())
+        ents = await self._gen_ents(rows)
         return list(filter(None, ents))
 
+    async def gen_stream(
+        self, chunk_size: int = 1000
+    ) -> AsyncIterator[EntTestSubObject]:
+        session = self._get_session()
+        # Once a chunk is processed, the session can let go of the models it
+        # loaded (the rows, their implementations, the prefetched edges...)
+        loaded = LoadedModels(session)
+        try:
+            result = await session.stream_scalars(
+                self.query.execution_options(yield_per=chunk_size)
+            )
+        except BaseException:
+            loaded.close()
+            raise
+        try:
+            async for chunk in result.partitions():
+                ents = await self._gen_ents(chunk)
+                with loaded.paused():
+                    for ent in ents:
+                        if ent:
+                            yield ent
+                loaded.expunge()
+        finally:
+            loaded.close()
+            await result.close()
+
     async def _gen_ents(
-        self, result: Result[tuple[EntTestSubObjectModel]]
+        self, models: Sequence[EntTestSubObjectModel]
     ) -> list[EntTestSubObject | None]:
-        models = result.scalars().all()
-        return [
-            await EntTestSubObject._gen_from_model(self.vc, model)  # noqa: SLF001
-            for model in models
-        ]
+        with concurrent_privacy_evaluation(self.privacy_concurrency):
+            ents = await EntTestSubObject._gen_from_models(self.vc, models)  # noqa: SLF001
+        await gen_prefetch(self.vc, ents, self.prefetched_edges)
+        return ents
 
     async def gen_first(self) -> EntTestSubObject | None:
-        session = get_session()
-        result = await session.execute(self.query.limit(1))
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, 1)
+            return (await self._gen_ents(rows))[0] if rows else None
+        result = await self._get_session().execute(self.query.limit(1))
         return await self._gen_ent(result)
 
     async def _gen_ent(
         self, result: Result[tuple[EntTestSubObjectModel]]
     ) -> EntTestSubObject | None:
-        model = result.scalar_one_or_none()
-        return await EntTestSubObject._gen_from_model(self.vc, model)  # noqa: SLF001
+        row = result.scalar_one_or_none()
+        if not row:
+            return None
+        return (await self._gen_ents([row]))[0]
+
+    async def _gen_rows(
+        self, query: Select[Any]
+    ) -> list[tuple[EntTestSubObject | None, tuple[Any, ...]]]:
+        session = self._get_session()
+        rows = (await session.execute(query)).all()
+        ents = await self._gen_ents([row[0] for row in rows])
+        return [(ent, tuple(row[1:])) for ent, row in zip(ents, rows, strict=True)]
+
+    def _get_shard_session(self, shard_id: int | None) -> AsyncSession:
+        if shard_id is None:
+            return _get_read_session()
+        with use_shard(shard_id):
+            return _get_read_session()
+
+    def _get_dialect(self) -> Dialect:
+        return self._get_sessions()[0].get_bind().dialect
 
     async def genx_first(self) -> EntTestSubObject:
         ent = await self.gen_first()
@@ -161,23 +422,28 @@ class EntTestSubObjectQuery(EntQuery[EntTestSubObject, EntTestSubObjectModel]):
         return ent
 
     async def gen_count_NO_PRIVACY(self) -> int:
-        session = get_session()
-        count_query = self.query.with_only_columns(
-            func.count(), maintain_column_froms=True
-        ).order_by(None)
-        result = await session.execute(count_query)
-        count = result.scalar()
-        if count is None:
+        count_query = (
+            self.query.with_only_columns(func.count(), maintain_column_froms=True)
+            .order_by(None)
+            .limit(None)
+            .offset(None)
+        )
+        results = await asyncio.gather(
+            *[session.execute(count_query) for session in self._get_sessions()]
+        )
+        counts = [result.scalar() for result in results]
+        if None in counts:
             raise ExecutionError("Unable to get the count")
-        return count
+        return sum(count or 0 for count in counts)
+
+    def _get_id_column(self) -> QueryableAttribute[Any]:
+        return EntTestSubObjectModel.id
 
     def order_by_id_asc(self) -> "EntTestSubObjectQuery":
-        self.query = self.query.order_by(EntTestSubObjectModel.id.asc())
-        return self
+        return self.order_by_key(EntTestSubObjectModel.id)
 
     def order_by_id_desc(self) -> "EntTestSubObjectQuery":
-        self.query = self.query.order_by(EntTestSubObjectModel.id.desc())
-        return self
+        return self.order_by_key(EntTestSubObjectModel.id, descending=True)
 
 
 class EntTestSubObjectMutator:
@@ -194,6 +460,14 @@ class EntTestSubObjectMutator:
             vc=vc, id=id, created_at=created_at, updated_at=updated_at, email=email
         )
 
+    @classmethod
+    def create_many(
+        cls,
+        vc: ExampleViewerContext,
+        actions: Sequence[EntTestSubObjectMutatorCreationAction],
+    ) -> EntTestSubObjectMutatorBulkCreationAction:
+        return EntTestSubObjectMutatorBulkCreationAction(vc=vc, actions=actions)
+
     @classmethod
     def update(
         cls, vc: ExampleViewerContext, ent: EntTestSubObject
@@ -227,18 +501,70 @@ class EntTestSubObjectMutatorCreationAction:
         self.email = email
 
     async def gen_savex(self) -> EntTestSubObject:
-        session = get_session()
+        session = get_session_for_id(get_session, self.id)
+        self._validate()
+        model = self._build_model()
+        session.add(model)
+        await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntTestSubObjectModel, self.id)
+        # TODO privacy checks
+        return await EntTestSubObject._genx_from_model(self.vc, model)  # noqa: SLF001
 
-        model = EntTestSubObjectModel(
+    def _validate(self) -> None:
+        pass
+
+    def _build_model(self) -> EntTestSubObjectModel:
+        return EntTestSubObjectModel(
             id=self.id,
             updated_at=self.updated_at,
             created_at=self.created_at,
             email=self.email,
         )
-        session.add(model)
-        await session.flush()
-        # TODO privacy checks
-        return await EntTestSubObject._genx_from_model(self.vc, model)  # noqa: SLF001
+
+
+class EntTestSubObjectMutatorBulkCreationAction:
+    vc: ExampleViewerContext
+    actions: list[EntTestSubObjectMutatorCreationAction]
+
+    def __init__(
+        self,
+        vc: ExampleViewerContext,
+        actions: Sequence[EntTestSubObjectMutatorCreationAction],
+    ) -> None:
+        self.vc = vc
+        self.actions = list(actions)
+
+    async def gen_save(self) -> None:
+        """Insert all the Ents with a single flush, without loading them back."""
+        await self._gen_insert()
+
+    async def gen_savex(self) -> list[EntTestSubObject]:
+        """Insert all the Ents with a single flush and return them, in order."""
+        models = await self._gen_insert()
+        ents = await EntTestSubObject._gen_from_models(self.vc, models)  # noqa: SLF001
+        for model, ent in zip(models, ents, strict=True):
+            if not ent:
+                raise EntNotFoundError(f"No EntTestSubObject found for ID {model.id}")
+        return [ent for ent in ents if ent]
+
+    async def _gen_insert(self) -> list[EntTestSubObjectModel]:
+        # Validate everything before writing anything
+        for action in self.actions:
+            action._validate()  # noqa: SLF001
+        models = [action._build_model() for action in self.actions]  # noqa: SLF001
+        models_by_shard: dict[int, list[EntTestSubObjectModel]] = {}
+        for model in models:
+            models_by_shard.setdefault(get_shard_id(model.id), []).append(model)
+        for shard_models in models_by_shard.values():
+            session = get_session_for_id(get_session, shard_models[0].id)
+            # The unit of work batches the rows into multi-row INSERT statements
+            session.add_all(shard_models)
+            await session.flush()
+        pin_to_primary()
+        for model in models:
+            invalidate_ent(EntTestSubObjectModel, model.id)
+        return models
 
 
 class EntTestSubObjectMutatorUpdateAction:
@@ -253,14 +579,22 @@ class EntTestSubObjectMutatorUpdateAction:
         self.email = ent.email
 
     async def gen_savex(self) -> EntTestSubObject:
-        session = get_session()
-
-        model = self.ent.model
-        model.email = self.email
+        session = get_session_for_id(get_session, self.ent.id)
+
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
+        changed = False
+        if self.email != model.email:
+            model.email = self.email
+            changed = True
+        if not changed:
+            # Nothing to write
+            return self.ent
         model.updated_at = datetime.now(tz=UTC)
         session.add(model)
         await session.flush()
-        await session.refresh(model)
+        pin_to_primary()
+        invalidate_ent(EntTestSubObjectModel, model.id)
         # TODO privacy checks
         return await EntTestSubObject._genx_from_model(self.vc, model)  # noqa: SLF001
 
@@ -274,11 +608,14 @@ class EntTestSubObjectMutatorDeletionAction:
         self.ent = ent
 
     async def gen_save(self) -> None:
-        session = get_session()
-        model = self.ent.model
+        session = get_session_for_id(get_session, self.ent.id)
+        # The Ent may have been loaded from a read session
+        model = await gen_attach(session, self.ent.model)
         # TODO privacy checks
         await session.delete(model)
         await session.flush()
+        pin_to_primary()
+        invalidate_ent(EntTestSubObjectModel, model.id)
 
 
 class EntTestSubObjectExample:
@@ -299,14 +636,24 @@ class EntTestSubObjectExample:
 
 
 def _get_field(field_name: str) -> Field:
+    return get_descriptor_metadata(EntTestSubObjectSchema).get_field(field_name)
+
+
+def _get_validators(field_name: str) -> tuple[FieldValidator[Any], ...]:
+    return get_descriptor_metadata(EntTestSubObjectSchema).validators[field_name]
+
+
+register_ent(EntTestSubObject, EntTestSubObjectSchema)
+
+
+@cache
+def _get_privacy_rules_table() -> Mapping[Action, tuple[PrivacyRule, ...]]:
+    # The rules never change at runtime, we only build them once
     schema = EntTestSubObjectSchema()
-    fields = schema.get_all_fields()
-    field = next(
-        filter(
-            lambda field: field.name == field_name,
-            fields,
-        )
+    return MappingProxyType(
+        {action: tuple(schema.get_privacy_rules(action)) for action in Action}
     )
-    if not field:
-        raise ValueError(f"Unknown field: {field_name}")
-    return field
+
+
+def _get_privacy_rules(action: Action) -> Sequence[PrivacyRule]:
+    return _get_privacy_rules_table()[action]
@@ -5,23 +5,33 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from uuid import UUID
-from entpy import Ent, ValidationError
+from collections.abc import Mapping, Sequence
+from entpy import Ent, EntNotFoundError, ValidationError
 from datetime import datetime
 from sentinels import Sentinel, NOTHING  # type: ignore[import-untyped]
 from .ent_model import EntModel
 from .ent_query import EntQuery
+from collections.abc import AsyncIterator
+from database import get_replica_session
 from database import get_session
 from ent_test_thing_pattern import ThingStatus
-from entpy import EntNotFoundError, ExecutionError
+from entpy import ExecutionError
+from entpy import concurrent_privacy_evaluation
+from entpy.framework.loader import LoadedModels
+from entpy.framework.prefetch import gen_prefetch
+from entpy.framework.session import get_read_session
+from entpy.framework.sharding import use_shard
 from evc import ExampleViewerContext
 from sqlalchemy import Enum as DBEnum
 from sqlalchemy import ForeignKey
 from sqlalchemy import String
 from sqlalchemy import UUID as DBUUID
-from sqlalchemy import select, func, Result
+from sqlalchemy import select, Select, func, Result, Dialect
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
-from typing import TypeVar
-from typing import cast
+from sqlalchemy.orm import QueryableAttribute
+from typing import Any, TypeVar
+import asyncio
 
 from typing import TYPE_CHECKING
 
@@ -29,6 +39,11 @@ if TYPE_CHECKING:
     from .ent_test_object5 import EntTestObject5
 
 
+def _get_read_session() -> AsyncSession:
+    """The read session, or the primary one once this context wrote something."""
+    return get_read_session(get_replica_session, get_session)
+
+
 class EntTestThingModel(EntModel):
     __abstract__ = True
 
@@ -37,6 +52,7 @@ class EntTestThingModel(EntModel):
         DBUUID(),
         ForeignKey("test_object5.id", deferrable=True, initially="DEFERRED"),
         nullable=False,
+        index=True,
     )
     a_pattern_validated_field: Mapped[str | None] = mapped_column(
         String(100), nullable=True
@@ -45,6 +61,7 @@ class EntTestThingModel(EntModel):
         DBUUID(),
         ForeignKey("test_object5.id", deferrable=True, initially="DEFERRED"),
         nullable=True,
+        index=True,
     )
     thing_status: Mapped[ThingStatus | None] = mapped_column(
         DBEnum(ThingStatus, native_enum=True), nullable=True
@@ -96,46 +113,59 @@ class IEntTestThing(Ent):
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {ent_id}") from e
 
-        # TODO refactor this to read the bytes from the UUID
-
-        from .ent_test_object2 import EntTestObject2
-
-        ent_test_object2 = await EntTestObject2.gen(vc, ent_id)
-        if ent_test_object2:
-            return ent_test_object2
+        # The type of the ent is encoded in the UUID, no need to try every
+        # implementation
+        from .all_models import UUID_TO_ENT
 
-        from .ent_test_object import EntTestObject
+        ent_class = UUID_TO_ENT.get(ent_id.bytes[6:8])
+        if ent_class is None or not issubclass(ent_class, IEntTestThing):
+            return None
+        return await ent_class.gen(vc, ent_id)
 
-        ent_test_object = await EntTestObject.gen(vc, ent_id)
-        if ent_test_object:
-            return ent_test_object
+    @classmethod
+    async def genx(cls, vc: ExampleViewerContext, ent_id: UUID | str) -> IEntTestThing:
+        ent = await cls.gen(vc, ent_id)
+        if not ent:
+            raise ValueError(f"No EntTestThing found for ID {ent_id}")
+        return ent
 
-        return None
+    @classmethod
+    async def genx_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> Mapping[UUID, IEntTestThing]:
+        ents = await cls.gen_many(vc, ent_ids)
+        missing = [str(ent_id) for ent_id, ent in ents.items() if not ent]
+        if missing:
+            ids = ", ".join(missing)
+            raise EntNotFoundError(f"No EntTestThing found for IDs {ids}")
+        return {ent_id: ent for ent_id, ent in ents.items() if ent}
 
     @classmethod
-    async def genx(cls, vc: ExampleViewerContext, ent_id: UUID | str) -> IEntTestThing:
+    async def gen_many(
+        cls, vc: ExampleViewerContext, ent_ids: Sequence[UUID | str]
+    ) -> Mapping[UUID, IEntTestThing | None]:
         # Convert str to UUID if needed
-        if isinstance(ent_id, str):
+        uuids: list[UUID] = []
+        for ent_id in ent_ids:
             try:
-                ent_id = UUID(ent_id)
+                uuids.append(UUID(ent_id) if isinstance(ent_id, str) else ent_id)
             except ValueError as e:
                 raise ValidationError(f"Invalid ID format for {ent_id}") from e
+        # Remove the duplicates but keep the order of the IDs
+        uuids = list(dict.fromkeys(uuids))
 
-        # TODO refactor this to read the bytes from the UUID
-
-        from .ent_test_object2 import EntTestObject2
-
-        ent_test_object2 = await EntTestObject2.gen(vc, ent_id)
-        if ent_test_object2:
-            return ent_test_object2
-
-        from .ent_test_object import EntTestObject
-
-        ent_test_object = await EntTestObject.gen(vc, ent_id)
-        if ent_test_object:
-            return ent_test_object
+        # Group the IDs by implementation to load each type with one query
+        from .all_models import UUID_TO_ENT
 
-        raise ValueError(f"No EntTestThing found for ID {ent_id}")
+        ids_by_class: dict[type[IEntTestThing], list[UUID]] = {}
+        for ent_id in uuids:
+            ent_class = UUID_TO_ENT.get(ent_id.bytes[6:8])
+            if ent_class is not None and issubclass(ent_class, IEntTestThing):
+                ids_by_class.setdefault(ent_class, []).append(ent_id)
+        ents: dict[UUID, IEntTestThing | None] = {}
+        for ent_class, ids in ids_by_class.items():
+            ents.update(await ent_class.gen_many(vc, ids))
+        return {ent_id: ents.get(ent_id) for ent_id in uuids}
 
     @classmethod
     def query_ent_test_thing(cls, vc: ExampleViewerContext) -> IEntTestThingQuery:
@@ -155,35 +185,75 @@ class IEntTestThingQuery(EntQuery[IEntTestThing, UUID]):
         self.query = select(EntTestThingView.id)
 
     async def gen(self) -> list[IEntTestThing]:
-        session = get_session()
-        result = await session.execute(self.query)
-        ents = await self._gen_ents(result)
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, self.limit_value)
+        else:
+            result = await self._get_session().execute(self.query)
+            rows = list(result.scalars().all())
+        ents = await self._gen_ents(rows)
         return list(filter(None, ents))
 
-    async def _gen_ents(
-        self, result: Result[tuple[UUID]]
-    ) -> list[IEntTestThing | None]:
-        ent_ids = result.scalars().all()
-        return [await self._gen_single_ent(ent_id) for ent_id in ent_ids]
+    async def gen_stream(self, chunk_size: int = 1000) -> AsyncIterator[IEntTestThing]:
+        session = self._get_session()
+        # Once a chunk is processed, the session can let go of the models it
+        # loaded (the rows, their implementations, the prefetched edges...)
+        loaded = LoadedModels(session)
+        try:
+            result = await session.stream_scalars(
+                self.query.execution_options(yield_per=chunk_size)
+            )
+        except BaseException:
+            loaded.close()
+            raise
+        try:
+            async for chunk in result.partitions():
+                ents = await self._gen_ents(chunk)
+                with loaded.paused():
+                    for ent in ents:
+                        if ent:
+                            yield ent
+                loaded.expunge()
+        finally:
+            loaded.close()
+            await result.close()
+
+    async def _gen_ents(self, ent_ids: Sequence[UUID]) -> list[IEntTestThing | None]:
+        with concurrent_privacy_evaluation(self.privacy_concurrency):
+            # One query per implementation, whatever the number of rows
+            ents_by_id = await IEntTestThing.gen_many(self.vc, ent_ids)
+        ents = [ents_by_id[ent_id] for ent_id in ent_ids]
+        await gen_prefetch(self.vc, ents, self.prefetched_edges)
+        return ents
 
     async def gen_first(self) -> IEntTestThing | None:
-        session = get_session()
-        result = await session.execute(self.query.limit(1))
+        if len(self.shard_ids) > 1:
+            rows = await self._gen_scattered_rows(self.query, 1)
+            return (await self._gen_ents(rows))[0] if rows else None
+        result = await self._get_session().execute(self.query.limit(1))
         return await self._gen_ent(result)
 
     async def _gen_ent(self, result: Result[tuple[UUID]]) -> IEntTestThing | None:
-        ent_id = result.scalar_one_or_none()
-        if not ent_id:
+        row = result.scalar_one_or_none()
+        if not row:
             return None
-        return await self._gen_single_ent(ent_id)
+        return (await self._gen_ents([row]))[0]
 
-    async def _gen_single_ent(self, ent_id: UUID) -> IEntTestThing | None:
-        from .all_models import UUID_TO_ENT
+    async def _gen_rows(
+        self, query: Select[Any]
+    ) -> list[tuple[IEntTestThing | None, tuple[Any, ...]]]:
+        session = self._get_session()
+        rows = (await session.execute(query)).all()
+        ents = await self._gen_ents([row[0] for row in rows])
+        return [(ent, tuple(row[1:])) for ent, row in zip(ents, rows, strict=True)]
+
+    def _get_shard_session(self, shard_id: int | None) -> AsyncSession:
+        if shard_id is None:
+            return _get_read_session()
+        with use_shard(shard_id):
+            return _get_read_session()
 
-        uuid_type = ent_id.bytes[6:8]
-        ent_type = UUID_TO_ENT[uuid_type]
-        # Casting is ok here, the id always inherits IEntTestThing
-        return await cast(type[IEntTestThing], ent_type).gen(self.vc, ent_id)
+    def _get_dialect(self) -> Dialect:
+        return self._get_sessions()[0].get_bind().dialect
 
     async def genx_first(self) -> IEntTestThing:
         ent = await self.gen_first()
@@ -192,27 +262,34 @@ class IEntTestThingQuery(EntQuery[IEntTestThing, UUID]):
         return ent
 
     async def gen_count_NO_PRIVACY(self) -> int:
-        session = get_session()
-        count_query = self.query.with_only_columns(
-            func.count(), maintain_column_froms=True
-        ).order_by(None)
-        result = await session.execute(count_query)
-        count = result.scalar()
-        if count is None:
+        count_query = (
+            self.query.with_only_columns(func.count(), maintain_column_froms=True)
+            .order_by(None)
+            .limit(None)
+            .offset(None)
+        )
+        results = await asyncio.gather(
+            *[session.execute(count_query) for session in self._get_sessions()]
+        )
+        counts = [result.scalar() for result in results]
+        if None in counts:
             raise ExecutionError("Unable to get the count")
-        return count
+        return sum(count or 0 for count in counts)
+
+    def _get_id_column(self) -> QueryableAttribute[Any]:
+        from .ent_test_thing_view import EntTestThingView
+
+        return EntTestThingView.id
 
     def order_by_id_asc(self) -> "IEntTestThingQuery":
         from .ent_test_thing_view import EntTestThingView
 
-        self.query = self.query.order_by(EntTestThingView.id.asc())
-        return self
+        return self.order_by_key(EntTestThingView.id)
 
     def order_by_id_desc(self) -> "IEntTestThingQuery":
         from .ent_test_thing_view import EntTestThingView
 
-        self.query = self.query.order_by(EntTestThingView.id.desc())
-        return self
+        return self.order_by_key(EntTestThingView.id, descending=True)
 
 
 class IEntTestThingMutator:
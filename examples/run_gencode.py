@@ -9,6 +9,8 @@ if __name__ == "__main__":
         base_import="from database import Base",
         session_getter_import="from database import get_session",
         session_getter_fn_name="get_session",
+        read_session_getter_import="from database import get_replica_session",
+        read_session_getter_fn_name="get_replica_session",
         vc_import="from evc import ExampleViewerContext",
         vc_name="ExampleViewerContext",
     )